@@ -9,13 +9,20 @@ import openpyxl
 from pathlib import Path
 import json
 from datetime import datetime
+from excel_analyzer import (
+    DEFAULT_TEMPLATE_REGISTRY, HEADER_SCAN_ROWS, HeaderClassifier, LayoutMap, PREVIEW_ROWS,
+    TemplateRegistry, ValidationCatalog, _count_formulas, _detect_header_row, _sheet_layouts
+)
 
-def analyze_cet_file(file_path: str):
-    """Analyze the CET v22 Excel file"""
+FORMULA_PREVIEW_ROWS = 8
+
+def analyze_cet_file(file_path: str, registry: TemplateRegistry = None):
+    """Analyze the CET v22 Excel file, naming its purpose from the registry when it matches a known template"""
     print(f"🔍 Analyzing {file_path}...")
     
-    # Load workbook
+    # Load workbook (cached values), plus a streamed formula-preserving copy for the formula preview
     wb = openpyxl.load_workbook(file_path, data_only=True)
+    formula_wb = openpyxl.load_workbook(file_path, read_only=True)
     
     analysis = {
         "file_info": {
@@ -29,13 +36,17 @@ def analyze_cet_file(file_path: str):
     }
     
     print(f"📊 Found {len(wb.sheetnames)} sheets: {wb.sheetnames}")
+    layouts = _sheet_layouts(file_path)
+    formula_counts = _count_formulas(file_path)
+    catalog = ValidationCatalog(file_path).build()
     
     # Analyze each sheet
     for sheet_name in wb.sheetnames:
         print(f"  📋 Analyzing sheet: {sheet_name}")
         sheet = wb[sheet_name]
         
-        sheet_analysis = analyze_sheet(sheet, sheet_name)
+        sheet_analysis = analyze_sheet(sheet, sheet_name, layouts.get(sheet_name),
+                                       formula_wb[sheet_name], formula_counts.get(sheet_name, 0), catalog)
         analysis["sheets"][sheet_name] = sheet_analysis
         
         # Print summary for this sheet
@@ -46,18 +57,26 @@ def analyze_cet_file(file_path: str):
         else:
             print(f"    ⚠️  No data found")
     
+    formula_wb.close()
+    
     # Generate summary
-    analysis["summary"] = generate_summary(analysis["sheets"])
+    matched = registry.match(file_path) if registry else None
+    if matched:
+        analysis["template"] = TemplateRegistry.describe(matched)
+        print(f"🧩 Matched template: {matched['template']['name']} ({matched['match']})")
+    analysis["summary"] = generate_summary(analysis["sheets"], analysis.get("template"))
     
     return analysis
 
-def analyze_sheet(sheet, sheet_name: str):
+def analyze_sheet(sheet, sheet_name: str, layout: LayoutMap = None, formula_sheet=None, formula_count: int = None,
+                  catalog: dict = None):
     """Analyze individual sheet content"""
     sheet_analysis = {
         "sheet_name": sheet_name,
         "has_data": False,
         "row_count": 0,
         "col_count": 0,
+        "header_row": 0,
         "key_fields": [],
         "data_preview": [],
         "structure": {}
@@ -72,34 +91,49 @@ def analyze_sheet(sheet, sheet_name: str):
         sheet_analysis["row_count"] = max_row
         sheet_analysis["col_count"] = max_col
         
-        # Get headers (first row)
+        # Get headers (first row, or the detected header row read through merged cells)
+        layout = layout or LayoutMap()
+        header_row = 1
+        header_values = [sheet.cell(row=1, column=col).value for col in range(1, max_col + 1)]
+        rows = sheet.iter_rows(max_row=min(HEADER_SCAN_ROWS, max_row), max_col=max_col, values_only=True)
+        detected_row, detected = _detect_header_row(rows, layout)
+        if detected_row:
+            header_row, header_values = detected_row, detected
+        
         headers = []
         for col in range(1, max_col + 1):
-            cell_value = sheet.cell(row=1, column=col).value
+            cell_value = header_values[col - 1] if col <= len(header_values) else None
             if cell_value:
                 headers.append(str(cell_value).strip())
             else:
                 headers.append(f"Column_{col}")
         
+        sheet_analysis["header_row"] = header_row
         sheet_analysis["key_fields"] = headers
         
-        # Get data preview (first few rows)
+        # Get data preview (first visible rows below the header and any merges hanging off it)
         preview_data = []
-        for row in range(2, min(6, max_row + 1)):  # First 5 data rows
-            row_data = []
-            for col in range(1, max_col + 1):
-                cell_value = sheet.cell(row=row, column=col).value
-                row_data.append(str(cell_value) if cell_value is not None else "")
-            preview_data.append(row_data)
+        row = max([header_row] + [m[3] for m in layout.row_merges(header_row)]) + 1
+        while row <= max_row and len(preview_data) < PREVIEW_ROWS:
+            if not layout.is_row_hidden(row):
+                row_data = []
+                for col in range(1, max_col + 1):
+                    anchor_row, anchor_col = layout.anchor(row, col)
+                    cell_value = sheet.cell(row=anchor_row, column=anchor_col).value
+                    row_data.append(str(cell_value) if cell_value is not None else "")
+                preview_data.append(row_data)
+            row += 1
         
         sheet_analysis["data_preview"] = preview_data
         
         # Analyze structure patterns
-        sheet_analysis["structure"] = analyze_sheet_structure(sheet, headers, max_row, max_col)
+        sheet_analysis["structure"] = analyze_sheet_structure(sheet, headers, max_row, max_col,
+                                                              formula_sheet, formula_count, catalog)
     
     return sheet_analysis
 
-def analyze_sheet_structure(sheet, headers, max_row, max_col):
+def analyze_sheet_structure(sheet, headers, max_row, max_col, formula_sheet=None, formula_count: int = None,
+                            catalog: dict = None):
     """Analyze the structure and patterns in the sheet"""
     structure = {
         "header_patterns": {},
@@ -108,34 +142,45 @@ def analyze_sheet_structure(sheet, headers, max_row, max_col):
         "validation_rules": []
     }
     
-    # Analyze header patterns
-    for i, header in enumerate(headers):
-        if header:
-            # Check for common patterns
-            if "id" in header.lower():
-                structure["header_patterns"]["id_fields"] = structure["header_patterns"].get("id_fields", []) + [i]
-            if "name" in header.lower():
-                structure["header_patterns"]["name_fields"] = structure["header_patterns"].get("name_fields", []) + [i]
-            if "date" in header.lower():
-                structure["header_patterns"]["date_fields"] = structure["header_patterns"].get("date_fields", []) + [i]
-            if "cost" in header.lower() or "price" in header.lower() or "amount" in header.lower():
-                structure["header_patterns"]["financial_fields"] = structure["header_patterns"].get("financial_fields", []) + [i]
-            if "status" in header.lower():
-                structure["header_patterns"]["status_fields"] = structure["header_patterns"].get("status_fields", []) + [i]
-    
-    # Check for formulas
-    for row in range(2, min(10, max_row + 1)):  # Check first 10 data rows
-        for col in range(1, max_col + 1):
-            cell = sheet.cell(row=row, column=col)
+    # Analyze header patterns with the shared (memoized) header classifier
+    classifier = HeaderClassifier.default()
+    structure["header_patterns"] = classifier.classify_headers(headers)
+    structure["field_mapping"] = {}
+    for header in headers:
+        result = classifier.classify(header)
+        if result["known"] or result["tmf"]:
+            structure["field_mapping"][header] = {"known": result["known"], "tmf": result["tmf"]}
+    
+    # Check for formulas in the first data rows (a data_only sheet has none, so read the formula copy)
+    source = formula_sheet if formula_sheet is not None else sheet
+    for row in source.iter_rows(min_row=2, max_row=min(FORMULA_PREVIEW_ROWS + 1, max_row), max_col=max_col):
+        for cell in row:
             if cell.data_type == 'f':  # Formula
                 structure["formulas"].append({
-                    "cell": f"{cell.column_letter}{row}",
+                    "cell": cell.coordinate,
                     "formula": cell.value
                 })
     
+    # Exact sheet-wide count, streamed from the sheet XML by the caller
+    structure["formula_count"] = formula_count if formula_count is not None else len(structure["formulas"])
+
+    # Collect data validation rules (dropdown sources, numeric limits) from the workbook's validation catalog,
+    # which also covers cross-sheet x14 rules and resolves list sources to their values
+    if catalog is not None:
+        for rule_id in catalog["index"]["sheets"].get(sheet.title, []):
+            rule = catalog["validations"][rule_id]
+            structure["validation_rules"].append({
+                "type": rule["type"],
+                "cells": rule["sqref"],
+                "formula1": rule["formula1"],
+                "formula2": rule["formula2"],
+                "allow_blank": rule["allow_blank"],
+                "values": catalog["lists"][rule["list_id"]]["values"] if "list_id" in rule else None
+            })
+
     return structure
 
-def generate_summary(sheets_analysis):
+def generate_summary(sheets_analysis, template=None):
     """Generate overall summary of the CET file"""
     summary = {
         "total_sheets": len(sheets_analysis),
@@ -162,8 +207,10 @@ def generate_summary(sheets_analysis):
                     "key_fields": analysis["key_fields"][:5]  # First 5 key fields
                 })
     
-    # Estimate purpose based on content
-    if "cost" in str(sheets_analysis).lower() or "estimate" in str(sheets_analysis).lower():
+    # Take the purpose from a matched template, otherwise estimate it based on content
+    if template and template.get("purpose"):
+        summary["estimated_purpose"] = template["purpose"]
+    elif "cost" in str(sheets_analysis).lower() or "estimate" in str(sheets_analysis).lower():
         summary["estimated_purpose"] = "Cost Estimation Template"
     elif "requirement" in str(sheets_analysis).lower():
         summary["estimated_purpose"] = "Requirements Management"
@@ -194,7 +241,8 @@ def main():
     
     try:
         # Perform analysis
-        analysis = analyze_cet_file(file_path)
+        registry = TemplateRegistry() if Path(DEFAULT_TEMPLATE_REGISTRY).exists() else None
+        analysis = analyze_cet_file(file_path, registry=registry)
         
         # Save results
         output_file = "CET_v22_analysis.json"
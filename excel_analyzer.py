@@ -12,34 +12,679 @@ This tool provides deep analysis of Excel files including:
 Usage:
     python excel_analyzer.py analyze file.xlsx
     python excel_analyzer.py analyze file.xlsm --include-vba --output-format markdown
+    python excel_analyzer.py analyze file.xlsx --concurrent
+    python excel_analyzer.py analyze file.xlsx --budget 2s
+    python excel_analyzer.py analyze file.xlsx --max-memory 512M
+    python excel_analyzer.py analyze file.xlsx --registry excel_templates.json
+    python excel_analyzer.py duplicates file1.xlsx file2.xlsx
+    python excel_analyzer.py load file.xlsx --database sqlite:///excel.db
+    python excel_analyzer.py extract-set "SET Test Loader CUT.xlsx"
+    python excel_analyzer.py watch ./workbooks --output-dir ./reports
+    python excel_analyzer.py query file.xlsx --sheet JobProfiles --where "Project Role=Team Architect"
+    python excel_analyzer.py catalog file.xlsm
+    python excel_analyzer.py fields file1.xlsx file2.xlsm
+    python excel_analyzer.py history ingest v1.xlsx v2.xlsx --store ./history/cet
     python excel_analyzer.py compare file1.xlsx file2.xlsm
 """
 
 import os
+import io
+import re
+import csv
 import sys
 import json
+import time
+import queue
+import pickle
+import sqlite3
+import threading
+import zipfile
+import zlib
+import tempfile
+import asyncio
+import hashlib
 import argparse
 from pathlib import Path
+from bisect import bisect_left, bisect_right
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from xml.etree import ElementTree
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from statistics import NormalDist
+from typing import Dict, List, Any, Optional, AsyncIterator, Iterator, Tuple
 import warnings
 
 # Core libraries
 import openpyxl
+from openpyxl.utils.cell import coordinate_to_tuple, get_column_letter, range_boundaries
+import numpy as np
 import pandas as pd
+from pandas.io.parsers import TextParser
 from oletools.olevba import VBA_Parser
 
 # Suppress openpyxl warnings for cleaner output
 warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
 
+HEADER_SCAN_ROWS = 20
+PREVIEW_ROWS = 5
+DEFAULT_TEMPLATE_REGISTRY = "excel_templates.json"
+
+def _detect_header_row(rows, layout: Optional["LayoutMap"] = None) -> Tuple[int, List[str]]:
+    """Pick the row with the most text cells among the leading rows as the header row
+
+    Returns the 1-based row index and the stripped header values, or (0, []) when
+    no row has at least two text cells. With a layout map, cells under a vertical
+    merge take the merge's value, hidden rows and rows that only label column
+    groups are never picked, and headers under a group label are prefixed with it ("Group / Header").
+    """
+    best_idx, best_headers, best_count = 0, [], 1
+    anchors: Dict[Tuple[int, int], Any] = {}
+    groups: Dict[int, str] = {}
+    best_groups: Dict[int, str] = {}
+    rows = list(rows)
+    for row_idx, values in enumerate(rows, start=1):
+        # Labels merged across columns group the headers of the rows below, not their own row
+        row_groups: Dict[int, str] = {}
+        if layout is not None:
+            below = rows[row_idx] if row_idx < len(rows) else ()
+            group_band = layout.is_group_band(row_idx, values, below)
+            for min_col, min_row, max_col, _ in layout.row_merges(row_idx):
+                label = values[min_col - 1] if min_row == row_idx and min_col <= len(values) else None
+                if max_col > min_col and isinstance(label, str) and label.strip():
+                    row_groups.update({col: label.strip() for col in range(min_col, max_col + 1)})
+            values = layout.fill_row(row_idx, values, anchors, horizontal=False)
+            if group_band or layout.is_row_hidden(row_idx):
+                groups.update(row_groups)
+                continue
+        text_count = sum(1 for v in values if isinstance(v, str) and v.strip())
+        if text_count > best_count:
+            headers = [str(v).strip() if v is not None else "" for v in values]
+            while headers and not headers[-1]:
+                headers.pop()
+            best_idx, best_headers, best_count = row_idx, headers, text_count
+            best_groups = {col: label for col, label in groups.items()}
+        groups.update(row_groups)
+    if best_groups:
+        best_headers = [
+            f"{best_groups[col]} / {header}" if header and col in best_groups and best_groups[col] != header
+            else header or best_groups.get(col, "")
+            for col, header in enumerate(best_headers, start=1)
+        ]
+    return best_idx, best_headers
+
+def _unique_headers(headers: List[str]) -> List[str]:
+    """Fill blank headers with Column_N and suffix repeated ones so they can key records"""
+    seen: Dict[str, int] = {}
+    unique = []
+    for col, header in enumerate(headers, start=1):
+        name = header or f"Column_{col}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        else:
+            seen[name] = 1
+        unique.append(name)
+    return unique
+
+def _iter_region_records(ws, header_row: int, headers: List[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield (row, record) for the non-empty rows below a header row, keyed by header"""
+    rows = ws.iter_rows(min_row=header_row + 1, max_col=len(headers), values_only=True)
+    for row_idx, values in enumerate(rows, start=header_row + 1):
+        if all(v is None for v in values):
+            continue
+        yield row_idx, dict(zip(headers, values))
+
+def _normalize_cell(value: Any) -> str:
+    """Normalize a cell value so equivalent entries compare equal across sheets"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return " ".join(str(value).lower().split())
+
+EMPTY_SHEET_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData/></worksheet>'
+)
+WORKSHEET_PART_PREFIX = "xl/worksheets/"
+# Parts that can change on every save without affecting any per-sheet result
+VOLATILE_PARTS = {
+    "[Content_Types].xml", "_rels/.rels", "xl/workbook.xml", "xl/_rels/workbook.xml.rels",
+    "xl/sharedStrings.xml", "xl/calcChain.xml", "docProps/core.xml", "docProps/app.xml",
+    "docProps/custom.xml",
+}
+# Part prefixes with the same property, e.g. the SharePoint metadata rewritten on every upload
+VOLATILE_PREFIXES = ("customXml/",)
+
+def _zip_part_checksums(file_path) -> Dict[str, int]:
+    """Read the CRC-32 of every part from the zip directory without decompressing anything"""
+    with zipfile.ZipFile(file_path) as zf:
+        return {info.filename: info.CRC for info in zf.infolist()}
+
+def _sheet_parts(file_path) -> Dict[str, str]:
+    """Map sheet names to their worksheet part paths using workbook.xml and its rels"""
+    ns = {
+        "main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+        "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+    }
+    rid_attr = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+    with zipfile.ZipFile(file_path) as zf:
+        workbook = ElementTree.fromstring(zf.read("xl/workbook.xml"))
+        rels = ElementTree.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+
+    targets = {}
+    for rel in rels.findall("rel:Relationship", ns):
+        target = rel.get("Target", "")
+        targets[rel.get("Id")] = target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+
+    return {
+        sheet.get("name"): targets.get(sheet.get(rid_attr), "")
+        for sheet in workbook.findall("main:sheets/main:sheet", ns)
+    }
+
+def _coalesce(indexes) -> List[Tuple[int, int]]:
+    """Collapse sorted 1-based indexes into inclusive (start, end) runs"""
+    runs: List[Tuple[int, int]] = []
+    for idx in sorted(set(indexes)):
+        if runs and idx == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], idx)
+        else:
+            runs.append((idx, idx))
+    return runs
+
+class LayoutMap:
+    """Merged ranges, hidden rows/columns and frozen panes of one sheet, indexed for point lookups
+
+    Merged ranges never overlap, so the rows are cut into bands at every merge
+    boundary and each band keeps its merges sorted by first column. A cell lookup
+    is then two binary searches: band by row, merge by column.
+    """
+
+    def __init__(self, merges: Optional[List[Tuple[int, int, int, int]]] = None,
+                 hidden_rows: Optional[List[int]] = None, hidden_cols: Optional[List[int]] = None,
+                 frozen: Optional[Dict[str, Any]] = None):
+        # Merges are (min_col, min_row, max_col, max_row), as openpyxl's range_boundaries returns them
+        self.merges = sorted(merges or [], key=lambda m: (m[1], m[0]))
+        self.hidden_rows = _coalesce(hidden_rows or [])
+        self.hidden_cols = _coalesce(hidden_cols or [])
+        self.frozen = frozen
+
+        self._band_starts = sorted({m[1] for m in self.merges} | {m[3] + 1 for m in self.merges})
+        self._bands: List[List[Tuple[int, int, int, int]]] = [[] for _ in self._band_starts]
+        for merge in self.merges:
+            first = bisect_left(self._band_starts, merge[1])
+            last = bisect_left(self._band_starts, merge[3] + 1)
+            for band in range(first, last):
+                self._bands[band].append(merge)
+        for band in self._bands:
+            band.sort()
+        self._band_cols = [[m[0] for m in band] for band in self._bands]
+
+    def _band(self, row: int) -> int:
+        return bisect_right(self._band_starts, row) - 1
+
+    def merge_at(self, row: int, col: int) -> Optional[Tuple[int, int, int, int]]:
+        """The merged range covering a cell, or None"""
+        band = self._band(row)
+        if band < 0:
+            return None
+        idx = bisect_right(self._band_cols[band], col) - 1
+        if idx >= 0:
+            merge = self._bands[band][idx]
+            if col <= merge[2]:
+                return merge
+        return None
+
+    def anchor(self, row: int, col: int) -> Tuple[int, int]:
+        """(row, col) of the cell holding the value shown at a cell"""
+        merge = self.merge_at(row, col)
+        return (merge[1], merge[0]) if merge else (row, col)
+
+    def row_merges(self, row: int) -> List[Tuple[int, int, int, int]]:
+        """Merged ranges that cross a row, ordered by column"""
+        band = self._band(row)
+        return self._bands[band] if band >= 0 else []
+
+    @staticmethod
+    def _in_runs(runs: List[Tuple[int, int]], idx: int) -> bool:
+        pos = bisect_right(runs, (idx, float("inf"))) - 1
+        return pos >= 0 and runs[pos][0] <= idx <= runs[pos][1]
+
+    def is_row_hidden(self, row: int) -> bool:
+        return self._in_runs(self.hidden_rows, row)
+
+    def is_col_hidden(self, col: int) -> bool:
+        return self._in_runs(self.hidden_cols, col)
+
+    def is_group_band(self, row: int, values, below=()) -> bool:
+        """True when a row only labels column groups for the sub-headers in the row below it
+
+        Every text cell must anchor a horizontal merge, and the row below must hold at
+        least two distinct labels under each of those merges; a header whose labels are
+        merged across columns, with data underneath, is not a band.
+        """
+        spans = {m[0]: m[2] for m in self.row_merges(row) if m[1] == row and m[2] > m[0]}
+        text_cols = [col for col, v in enumerate(values, start=1) if isinstance(v, str) and v.strip()]
+        if not spans or not all(col in spans for col in text_cols):
+            return False
+        below = list(below)
+        for min_col, max_col in spans.items():
+            labels = {str(v).strip() for v in below[min_col - 1:max_col] if isinstance(v, str) and v.strip()}
+            if len(labels) < 2:
+                return False
+        return True
+
+    def fill_row(self, row: int, values, anchors: Dict[Tuple[int, int], Any],
+                 horizontal: bool = True) -> List[Any]:
+        """Copy merge anchor values into the cells each merge covers
+
+        ``anchors`` carries anchor values between calls, so feed rows top to bottom
+        to fill merges that span several rows. With ``horizontal=False`` only the
+        anchor column is filled, which keeps a merged header from repeating.
+        """
+        filled = list(values)
+        for min_col, min_row, max_col, _ in self.row_merges(row):
+            if min_row == row and min_col <= len(filled):
+                anchors[(min_row, min_col)] = filled[min_col - 1]
+            value = anchors.get((min_row, min_col))
+            if value is None:
+                continue
+            last_col = max_col if horizontal else min_col
+            if len(filled) < last_col:
+                filled.extend([None] * (last_col - len(filled)))
+            for col in range(min_col, last_col + 1):
+                filled[col - 1] = value
+        return filled
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "merged_ranges": [
+                f"{get_column_letter(m[0])}{m[1]}:{get_column_letter(m[2])}{m[3]}" for m in self.merges
+            ],
+            "hidden_rows": self.hidden_rows,
+            "hidden_columns": [(get_column_letter(a), get_column_letter(b)) for a, b in self.hidden_cols],
+            "frozen_panes": self.frozen,
+        }
+
+    @classmethod
+    def from_sheet_xml(cls, stream) -> "LayoutMap":
+        """Build a layout map from a worksheet part in one streaming pass"""
+        ns = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+        merges, hidden_rows, hidden_cols, frozen = [], [], [], None
+        for _, elem in ElementTree.iterparse(stream, events=("end",)):
+            tag = elem.tag
+            if tag == f"{ns}row":
+                if elem.get("hidden") in ("1", "true") and elem.get("r"):
+                    hidden_rows.append(int(elem.get("r")))
+                elem.clear()
+            elif tag == f"{ns}mergeCell":
+                merges.append(range_boundaries(elem.get("ref")))
+            elif tag == f"{ns}col":
+                if elem.get("hidden") in ("1", "true"):
+                    hidden_cols.extend(range(int(elem.get("min")), int(elem.get("max")) + 1))
+            elif tag == f"{ns}pane" and elem.get("state") in ("frozen", "frozenSplit") and frozen is None:
+                frozen = {
+                    "top_left_cell": elem.get("topLeftCell"),
+                    "rows": int(float(elem.get("ySplit", 0))),
+                    "columns": int(float(elem.get("xSplit", 0))),
+                }
+        return cls(merges, hidden_rows, hidden_cols, frozen)
+
+def _sheet_layouts(source, sheets: Optional[List[str]] = None) -> Dict[str, LayoutMap]:
+    """Build a LayoutMap for every worksheet (or the named ones) straight from the package XML"""
+    parts = _sheet_parts(source)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    layouts = {}
+    with zipfile.ZipFile(source) as zf:
+        names = set(zf.namelist())
+        for sheet_name, part in parts.items():
+            if (sheets and sheet_name not in sheets) or part not in names:
+                continue
+            with zf.open(part) as stream:
+                layouts[sheet_name] = LayoutMap.from_sheet_xml(stream)
+    return layouts
+
+DEFAULT_SAMPLE_CELLS = 10000
+SAMPLE_BLOCK_ROWS = 25
+
+CONTENT_CHUNK_ROWS = 2000
+
+def _parse_size(text: str) -> int:
+    """Parse a --max-memory value such as 512M, 2G, 1.5GB or a plain byte count"""
+    value = text.strip().upper().rstrip("B")
+    multiplier = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}.get(value[-1:], 1)
+    digits = value[:-1] if multiplier > 1 else value
+    try:
+        size = int(float(digits) * multiplier)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size '{text}' (use e.g. 512M or 2G)")
+    if size <= 0:
+        raise argparse.ArgumentTypeError(f"invalid size '{text}' (must be positive)")
+    return size
+
+class MemoryGuard:
+    """Account for the bytes one bounded stage holds in memory, against a byte limit
+
+    The stage reports what it buffers (add) and frees (release), so only its own
+    data counts: memory used by other stages or threads in the same process does
+    not, and freeing a spilled chunk is seen immediately. Sizes come from
+    sys.getsizeof plus one reference per value, a close approximation for the
+    cell values buffered here.
+    """
+
+    def __init__(self, limit_bytes: int):
+        self.limit = limit_bytes
+        self.used = 0
+        self.peak_bytes = 0
+
+    @staticmethod
+    def sizeof(values) -> int:
+        return sum(sys.getsizeof(v) + 8 for v in values)
+
+    def add(self, nbytes: int):
+        self.used += nbytes
+        self.peak_bytes = max(self.peak_bytes, self.used)
+
+    def release(self, nbytes: int):
+        self.used = max(0, self.used - nbytes)
+
+    def exceeded(self, fraction: float = 1.0) -> bool:
+        return self.used > self.limit * fraction
+
+    def available(self) -> int:
+        return max(0, self.limit - self.used)
+
+def _count_formulas(source) -> Dict[str, int]:
+    """Count formula cells per sheet by streaming each worksheet part's <f> elements"""
+    formula_tag = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}f"
+    row_tag = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}row"
+    parts = _sheet_parts(source)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    counts = {}
+    with zipfile.ZipFile(source) as zf:
+        names = set(zf.namelist())
+        for sheet_name, part in parts.items():
+            if part not in names:
+                continue
+            count = 0
+            with zf.open(part) as stream:
+                for _, elem in ElementTree.iterparse(stream, events=("end",)):
+                    if elem.tag == formula_tag:
+                        count += 1
+                    elif elem.tag == row_tag:
+                        elem.clear()
+            counts[sheet_name] = count
+    return counts
+
+def _pandas_cell(cell) -> Any:
+    """Convert a read-only openpyxl cell the way pandas' openpyxl reader does"""
+    if cell.value is None:
+        return ""
+    if cell.data_type == "e":
+        return np.nan
+    if cell.data_type == "n" and isinstance(cell.value, float) and cell.value.is_integer():
+        return int(cell.value)
+    return cell.value
+
+class SamplingBudget:
+    """How much of a sheet a sampled statistic may look at: a cell count, a time limit or both"""
+
+    def __init__(self, cells: Optional[int] = None, seconds: Optional[float] = None):
+        if cells is None and seconds is None:
+            cells = DEFAULT_SAMPLE_CELLS
+        if (cells is not None and cells <= 0) or (seconds is not None and seconds <= 0):
+            raise ValueError("sampling budget must be positive")
+        self.cells = cells
+        self.seconds = seconds
+
+    @classmethod
+    def parse(cls, text: str) -> "SamplingBudget":
+        """Parse a --budget value such as 50000, 200k, 2s or 500ms"""
+        value = text.strip().lower()
+        try:
+            if value.endswith("ms"):
+                cells, seconds = None, float(value[:-2]) / 1000
+            elif value.endswith("s"):
+                cells, seconds = None, float(value[:-1])
+            else:
+                multiplier = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+                digits = value[:-1] if multiplier > 1 else value
+                cells, seconds = int(float(digits) * multiplier), None
+        except ValueError:
+            raise argparse.ArgumentTypeError(
+                f"invalid budget '{text}' (use a cell count like 50000 or 200k, or a time like 2s or 500ms)")
+        if (cells if cells is not None else seconds) <= 0:
+            raise argparse.ArgumentTypeError(f"invalid budget '{text}' (must be positive)")
+        return cls(cells=cells, seconds=seconds)
+
+    def __repr__(self) -> str:
+        return f"SamplingBudget(cells={self.cells}, seconds={self.seconds})"
+
+class SheetSample:
+    """Per-block tallies for one sheet, scaled up to whole-sheet estimates with confidence bounds
+
+    Blocks are treated as a sample without replacement and totals use a ratio
+    estimator over rows, so the last, shorter block does not skew the result.
+    """
+
+    def __init__(self, total_rows: int, total_blocks: int, confidence: float = 0.95):
+        self.total_rows = total_rows
+        self.total_blocks = total_blocks
+        self.confidence = confidence
+        self.blocks: List[Tuple[int, Dict[str, float]]] = []
+        self.cells_scanned = 0
+
+    def add_block(self, rows: int, cells: int, tallies: Dict[str, float]):
+        self.blocks.append((rows, tallies))
+        self.cells_scanned += cells
+
+    @property
+    def rows_scanned(self) -> int:
+        return sum(rows for rows, _ in self.blocks)
+
+    @property
+    def exact(self) -> bool:
+        return len(self.blocks) >= self.total_blocks
+
+    def observed(self, name: str) -> float:
+        return sum(tallies.get(name, 0) for _, tallies in self.blocks)
+
+    def estimate(self, name: str) -> Dict[str, Any]:
+        """Estimated sheet total for a tallied statistic with its confidence interval"""
+        observed = self.observed(name)
+        if self.exact or not self.blocks:
+            return {"estimate": observed, "low": observed, "high": observed, "exact": self.exact}
+
+        n = len(self.blocks)
+        rows = self.rows_scanned
+        ratio = observed / rows
+        estimate = ratio * self.total_rows
+        if n < 2:
+            return {"estimate": round(estimate, 2), "low": observed, "high": None, "exact": False}
+
+        mean_rows = rows / n
+        residuals = sum((tallies.get(name, 0) - ratio * block_rows) ** 2 for block_rows, tallies in self.blocks)
+        finite_correction = 1 - n / self.total_blocks
+        std_error = self.total_rows * (finite_correction * residuals / (n - 1) / n) ** 0.5 / mean_rows
+        margin = NormalDist().inv_cdf(0.5 + self.confidence / 2) * std_error
+        return {
+            "estimate": round(estimate, 2),
+            "low": round(max(observed, estimate - margin), 2),
+            "high": round(estimate + margin, 2),
+            "exact": False,
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "exact": self.exact,
+            "rows_scanned": self.rows_scanned,
+            "cells_scanned": self.cells_scanned,
+            "blocks_scanned": len(self.blocks),
+            "total_blocks": self.total_blocks,
+            "confidence": self.confidence,
+        }
+
+class AdaptiveSampler:
+    """Pick stratified row blocks across a sheet until a sampling budget is spent
+
+    Blocks are visited in bit-reversed order, so any prefix of the visit order is
+    spread evenly over the whole sheet (first, middle, quarters, eighths, ...).
+    A sheet that fits in the cell budget is planned as an exact full scan, and a
+    time budget that outlasts the sheet ends in one as well. Under a cell budget
+    blocks shrink on wide sheets so at least MIN_BLOCKS of them fit, which keeps
+    the confidence bounds meaningful.
+    """
+
+    MIN_BLOCKS = 8
+
+    def __init__(self, budget: Optional[SamplingBudget] = None, block_rows: int = SAMPLE_BLOCK_ROWS,
+                 confidence: float = 0.95):
+        self.budget = budget or SamplingBudget()
+        self.block_rows = block_rows
+        self.confidence = confidence
+
+    @staticmethod
+    def _stratified_order(count: int) -> List[int]:
+        bits = max(1, (count - 1).bit_length())
+        order = (int(format(i, f"0{bits}b")[::-1], 2) for i in range(1 << bits))
+        return [i for i in order if i < count]
+
+    def scan(self, ws, tally, min_row: int = 1, max_row: Optional[int] = None,
+             max_col: Optional[int] = None) -> SheetSample:
+        """Call ``tally(rows)`` on each chosen block of openpyxl cell rows and collect the results
+
+        ``tally`` returns a dict of counts for the block. Sheets are expected to be
+        loaded in normal (not read-only) mode so blocks can be visited in any order.
+        """
+        max_row = ws.max_row if max_row is None else max_row
+        max_col = ws.max_column if max_col is None else max_col
+        total_rows = max(0, max_row - min_row + 1)
+        cell_limit = self.budget.cells
+        fits = cell_limit is not None and total_rows * max_col <= cell_limit
+
+        block_rows = self.block_rows
+        if cell_limit is not None and not fits and max_col:
+            block_rows = max(1, min(block_rows, cell_limit // (max_col * self.MIN_BLOCKS)))
+        total_blocks = -(-total_rows // block_rows)
+        sample = SheetSample(total_rows, total_blocks, self.confidence)
+        if not total_blocks or not max_col:
+            return sample
+
+        order = list(range(total_blocks)) if fits else self._stratified_order(total_blocks)
+
+        deadline = time.perf_counter() + self.budget.seconds if self.budget.seconds is not None else None
+        for block in order:
+            start = min_row + block * block_rows
+            end = min(max_row, start + block_rows - 1)
+            cells = (end - start + 1) * max_col
+            if sample.blocks:
+                if cell_limit is not None and sample.cells_scanned + cells > cell_limit:
+                    break
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+            rows = ws.iter_rows(min_row=start, max_row=end, max_col=max_col)
+            sample.add_block(end - start + 1, cells, tally(rows))
+        return sample
+
+def _changed_sheets(old_checksums: Dict[str, int], checksums: Dict[str, int],
+                    sheet_parts: Dict[str, str]) -> Optional[List[str]]:
+    """Sheets whose parts changed between two part-checksum maps of the same sheet layout
+
+    Returns None when a shared part (styles, theme, external links, ...) changed,
+    since that can affect every sheet.
+    """
+    changed_parts = {
+        part for part in set(checksums) | set(old_checksums)
+        if checksums.get(part) != old_checksums.get(part)
+    }
+    sheet_by_part = {part: name for name, part in sheet_parts.items()}
+    shared = {
+        part for part in changed_parts
+        if part not in VOLATILE_PARTS and not part.startswith(VOLATILE_PREFIXES) and part not in sheet_by_part
+        and not part.startswith(WORKSHEET_PART_PREFIX + "_rels/") and part != "xl/vbaProject.bin"
+    }
+    if shared:
+        return None
+
+    changed = {sheet_by_part[p] for p in changed_parts if p in sheet_by_part}
+    for part in changed_parts:
+        if part.startswith(WORKSHEET_PART_PREFIX + "_rels/"):
+            rels_target = WORKSHEET_PART_PREFIX + Path(part).name[:-len(".rels")]
+            if rels_target in sheet_by_part:
+                changed.add(sheet_by_part[rels_target])
+    return sorted(changed)
+
+def _shared_string_digests(file_path) -> List[bytes]:
+    """Digest of every shared string, in table order"""
+    tag = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}si"
+    digests = []
+    with zipfile.ZipFile(file_path) as zf:
+        if "xl/sharedStrings.xml" not in zf.namelist():
+            return digests
+        with zf.open("xl/sharedStrings.xml") as stream:
+            for _, elem in ElementTree.iterparse(stream, events=("end",)):
+                if elem.tag == tag:
+                    digests.append(hashlib.blake2b("".join(elem.itertext()).encode('utf-8'),
+                                                   digest_size=8).digest())
+                    elem.clear()
+    return digests
+
+def _changed_since(base: Optional[Dict[str, Any]], checksums: Dict[str, int], sheet_parts: Dict[str, str],
+                   sst_digests: List[bytes]) -> Optional[List[str]]:
+    """Sheets changed since a recorded base, or None when everything must be re-read
+
+    That is the case without a base, when the sheet layout or a shared part changed,
+    or when shared strings were rewritten rather than appended to: cells refer to
+    them by index, so an edited string changes sheets whose XML is untouched.
+    """
+    if base is None or base["sheet_parts"] != sheet_parts:
+        return None
+    changed = _changed_sheets(base["checksums"], checksums, sheet_parts)
+    if changed is not None and sst_digests[:len(base["sst_digests"])] != base["sst_digests"]:
+        return None
+    return changed
+
 class ExcelAnalyzer:
     """Main Excel analysis engine"""
     
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, budget: Optional[SamplingBudget] = None,
+                 max_memory: Optional[int] = None):
         self.file_path = Path(file_path)
         self.file_name = self.file_path.name
+        self.sampler = AdaptiveSampler(budget)
+        self.max_memory = max_memory
         self.is_macro_enabled = self.file_path.suffix.lower() == '.xlsm'
         self.analysis_results = {}
+        self._file_bytes: Optional[bytes] = None
+        self._shared_workbook = None
+        self._shared_lock: Optional[threading.Lock] = None
+        
+    def _source(self):
+        """Return the workbook source, preferring bytes already read into memory"""
+        if self._file_bytes is not None:
+            return io.BytesIO(self._file_bytes)
+        return self.file_path
+    
+    @contextmanager
+    def _formula_workbook(self):
+        """Yield the full (formula-preserving) workbook, reusing the pipeline's shared parse if there is one
+
+        openpyxl creates cells as they are read, so stages take turns on the shared workbook.
+        """
+        if self._shared_workbook is not None:
+            with self._shared_lock:
+                yield self._shared_workbook
+            return
+        wb = openpyxl.load_workbook(self._source(), data_only=False)
+        try:
+            yield wb
+        finally:
+            wb.close()
         
     def analyze(self, include_vba: bool = True, include_formatting: bool = True) -> Dict[str, Any]:
         """Perform comprehensive analysis of the Excel file"""
@@ -49,6 +694,7 @@ class ExcelAnalyzer:
             "file_info": self._get_file_info(),
             "metadata": self._analyze_metadata(),
             "structure": self._analyze_structure(),
+            "layout": self._analyze_layout(),
             "content": self._analyze_content(),
         }
         
@@ -64,7 +710,234 @@ class ExcelAnalyzer:
             
         self.analysis_results = results
         return results
-    
+
+    # Pipeline stages that read the formula-preserving workbook through _formula_workbook()
+    SHARED_WORKBOOK_STAGES = {"metadata", "structure", "content", "formatting"}
+
+    def _pipeline_stages(self, include_vba: bool, include_formatting: bool) -> List[Tuple[str, Any]]:
+        """List the (result key, stage method) pairs that make up a full analysis"""
+        stages = [
+            ("metadata", self._analyze_metadata),
+            ("structure", self._analyze_structure),
+            ("layout", self._analyze_layout),
+            ("content", self._analyze_content),
+        ]
+        if include_formatting:
+            stages.append(("formatting", self._analyze_formatting))
+        if include_vba and self.is_macro_enabled:
+            stages.append(("vba_analysis", self._analyze_vba))
+        return stages
+
+    async def stream_analysis(self, include_vba: bool = True, include_formatting: bool = True,
+                              executor=None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Run the analysis stages concurrently, yielding (key, result) as each one finishes
+
+        The file is read once off the event loop and every stage parses the in-memory
+        copy in ``executor`` (the loop's default thread pool when None). On a thread
+        pool the formula-preserving workbook is parsed once, while the value-only
+        stages (layout, content) read the package alongside it, and the metadata,
+        structure, formula and formatting stages share that parse instead of each
+        loading the workbook again. Pass a ProcessPoolExecutor to spread the stages
+        across cores; each process then parses its own copy.
+        """
+        loop = asyncio.get_running_loop()
+        self._file_bytes = await loop.run_in_executor(None, self.file_path.read_bytes)
+        shared_ready = None
+        tasks: List["asyncio.Future"] = []
+        running: List["asyncio.Future"] = []
+
+        try:
+            yield "file_info", self._get_file_info()
+            if include_vba and not self.is_macro_enabled:
+                yield "vba_analysis", {"message": "File is not macro-enabled"}
+
+            stages = self._pipeline_stages(include_vba, include_formatting)
+            if not isinstance(executor, ProcessPoolExecutor):
+                self._shared_lock = threading.Lock()
+                shared_ready = asyncio.ensure_future(loop.run_in_executor(
+                    executor, lambda: openpyxl.load_workbook(self._source(), data_only=False)))
+
+            async def run_stage(key, stage):
+                if shared_ready is not None and key in self.SHARED_WORKBOOK_STAGES:
+                    try:
+                        self._shared_workbook = await asyncio.shield(shared_ready)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception:
+                        pass  # stages load the workbook themselves and report their own errors
+                # Shielded so that cancelling this task never abandons a stage still running in the executor
+                future = loop.run_in_executor(executor, stage)
+                running.append(future)
+                return key, await asyncio.shield(future)
+
+            tasks = [asyncio.ensure_future(run_stage(key, stage)) for key, stage in stages]
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # If the consumer stopped early, drop the stages that have not started and wait for
+            # the ones already running, which may still be reading the shared workbook
+            for task in tasks:
+                task.cancel()
+            pending = tasks + running + ([shared_ready] if shared_ready is not None else [])
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            if shared_ready is not None and not shared_ready.cancelled() and shared_ready.exception() is None:
+                self._shared_workbook = shared_ready.result()
+            if self._shared_workbook is not None:
+                self._shared_workbook.close()
+            self._shared_workbook = None
+            self._shared_lock = None
+            self._file_bytes = None
+
+    async def analyze_async(self, include_vba: bool = True, include_formatting: bool = True,
+                            executor=None) -> Dict[str, Any]:
+        """Asynchronous counterpart of analyze() that does not block the event loop"""
+        collected = {}
+        async for key, result in self.stream_analysis(include_vba, include_formatting, executor):
+            collected[key] = result
+
+        # Keep the same section order as the synchronous analyze()
+        order = ["file_info", "metadata", "structure", "layout", "content", "formatting", "vba_analysis"]
+        results = {key: collected[key] for key in order if key in collected}
+        self.analysis_results = results
+        return results
+
+    def analyze_incremental(self, previous: Dict[str, Any], changed_sheets: List[str],
+                            include_vba: bool = True, include_formatting: bool = True,
+                            rerun_vba: bool = False) -> Dict[str, Any]:
+        """Re-analyze only the given sheets and merge them into a previous analysis
+
+        Every other worksheet part is replaced with an empty sheet in an in-memory
+        copy of the workbook, so openpyxl and pandas only parse the changed sheets.
+        Workbook-level stages run against that copy, which keeps their output intact.
+        """
+        changed = set(changed_sheets)
+        parts = _sheet_parts(self.file_path)
+        keep = {part for name, part in parts.items() if name in changed}
+
+        trimmed = io.BytesIO()
+        with zipfile.ZipFile(self.file_path) as src, \
+                zipfile.ZipFile(trimmed, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as dst:
+            for info in src.infolist():
+                if info.filename in parts.values() and info.filename not in keep:
+                    dst.writestr(info, EMPTY_SHEET_XML)
+                else:
+                    dst.writestr(info, src.read(info))
+
+        self._file_bytes = trimmed.getvalue()
+        try:
+            results = {
+                "file_info": self._get_file_info(),
+                "metadata": self._analyze_metadata(),
+                "structure": self._analyze_structure(),
+                "layout": self._analyze_layout(),
+                "content": self._analyze_content(),
+            }
+            if include_formatting:
+                results["formatting"] = self._analyze_formatting()
+        finally:
+            self._file_bytes = None
+
+        for section in ("structure", "layout", "content", "formatting"):
+            if section not in results or "error" in results[section]:
+                continue
+            fresh = results[section]["sheets"]
+            old = previous.get(section, {}).get("sheets", {})
+            results[section]["sheets"] = {
+                name: fresh[name] if name in changed or name not in old else old[name]
+                for name in fresh
+            }
+
+        content = results["content"]
+        if "error" not in content:
+            content["total_rows"] = sum(s["rows"] for s in content["sheets"].values())
+            content["total_columns"] = sum(s["columns"] for s in content["sheets"].values())
+
+        formatting = results.get("formatting")
+        if formatting and "error" not in formatting:
+            sheets = formatting["sheets"].values()
+            formatting["summary"] = {
+                "total_styled_cells": sum(s["styled_cells"] for s in sheets),
+                "unique_fonts": sorted({font for s in sheets for font in s["fonts"]}),
+                "unique_colors": sorted({color for s in sheets for color in s["colors"]}),
+                "has_conditional_formatting": any(s["conditional_formatting_rules"] > 0 for s in sheets)
+            }
+
+        if include_vba and self.is_macro_enabled:
+            results["vba_analysis"] = self._analyze_vba() if rerun_vba else previous.get("vba_analysis", {})
+        elif include_vba:
+            results["vba_analysis"] = {"message": "File is not macro-enabled"}
+
+        self.analysis_results = results
+        return results
+
+    def analyze_template(self, matched: Dict[str, Any], include_vba: bool = True) -> Dict[str, Any]:
+        """Fast path for a workbook that exactly matches a registered template
+
+        Header detection, metadata, layout and formatting are skipped: only the
+        template's known regions are read, from the rows below their registered
+        header rows, and the content statistics are computed from those records.
+        """
+        template = matched["template"]
+        print(f"🔍 Analyzing {self.file_name} as template '{template['name']}'...")
+        
+        records: Dict[str, List[Dict[str, Any]]] = {}
+        for sheet_name, _, record in TemplateRegistry.extract(self._source(), template):
+            records.setdefault(sheet_name, []).append(record)
+        
+        content = {
+            "total_rows": 0,
+            "total_columns": 0,
+            "sheets": {}
+        }
+        for region in template["regions"]:
+            df = pd.DataFrame.from_records(records.get(region["sheet"], []), columns=region["headers"])
+            content["sheets"][region["sheet"]] = {
+                "header_row": region["header_row"],
+                "rows": len(df),
+                "columns": len(df.columns),
+                "column_names": list(df.columns),
+                "data_types": {str(k): str(v) for k, v in df.dtypes.to_dict().items()},
+                "null_counts": df.isnull().sum().to_dict(),
+                "non_null_counts": df.count().to_dict(),
+                "sample_data": df.head(3).fillna("").to_dict()
+            }
+            content["total_rows"] += len(df)
+            content["total_columns"] += len(df.columns)
+        
+        results = {
+            "file_info": self._get_file_info(),
+            "template": TemplateRegistry.describe(matched, fast_path=True),
+            "structure": {
+                "sheet_count": len(template["sheets"]),
+                "sheet_names": [s["name"] for s in template["sheets"]],
+                "sheets": {}
+            },
+            "content": content,
+        }
+        if include_vba and self.is_macro_enabled:
+            results["vba_analysis"] = self._analyze_vba()
+        elif include_vba:
+            results["vba_analysis"] = {"message": "File is not macro-enabled"}
+        
+        self.analysis_results = results
+        return results
+
+    def iter_records(self, sheets: Optional[List[str]] = None) -> Iterator[Tuple[str, int, Dict[str, Any]]]:
+        """Stream (sheet, row, record) for every data row below each sheet's detected header row"""
+        wb = openpyxl.load_workbook(self._source(), read_only=True, data_only=True)
+        try:
+            for ws in wb.worksheets:
+                if sheets and ws.title not in sheets:
+                    continue
+                header_row, headers = _detect_header_row(ws.iter_rows(max_row=HEADER_SCAN_ROWS, values_only=True))
+                if not headers:
+                    continue
+                for row_idx, record in _iter_region_records(ws, header_row, _unique_headers(headers)):
+                    yield ws.title, row_idx, record
+        finally:
+            wb.close()
+
     def _get_file_info(self) -> Dict[str, Any]:
         """Get basic file information"""
         stat = self.file_path.stat()
@@ -81,24 +954,22 @@ class ExcelAnalyzer:
     def _analyze_metadata(self) -> Dict[str, Any]:
         """Analyze workbook metadata using openpyxl"""
         try:
-            wb = openpyxl.load_workbook(self.file_path, data_only=False)
-            
-            metadata = {
-                "creator": wb.properties.creator,
-                "title": wb.properties.title,
-                "subject": wb.properties.subject,
-                "description": wb.properties.description,
-                "keywords": wb.properties.keywords,
-                "category": wb.properties.category,
-                "created": str(wb.properties.created) if wb.properties.created else None,
-                "modified": str(wb.properties.modified) if wb.properties.modified else None,
-                "last_modified_by": wb.properties.lastModifiedBy,
-                "revision": wb.properties.revision,
-                "version": wb.properties.version,
-                "defined_names": list(wb.defined_names.keys()) if wb.defined_names else []
-            }
+            with self._formula_workbook() as wb:
+                metadata = {
+                    "creator": wb.properties.creator,
+                    "title": wb.properties.title,
+                    "subject": wb.properties.subject,
+                    "description": wb.properties.description,
+                    "keywords": wb.properties.keywords,
+                    "category": wb.properties.category,
+                    "created": str(wb.properties.created) if wb.properties.created else None,
+                    "modified": str(wb.properties.modified) if wb.properties.modified else None,
+                    "last_modified_by": wb.properties.lastModifiedBy,
+                    "revision": wb.properties.revision,
+                    "version": wb.properties.version,
+                    "defined_names": list(wb.defined_names.keys()) if wb.defined_names else []
+                }
             
-            wb.close()
             return metadata
             
         except Exception as e:
@@ -108,44 +979,88 @@ class ExcelAnalyzer:
         """Analyze workbook structure using pandas and openpyxl"""
         try:
             # Use pandas for efficient sheet enumeration
-            all_sheets = pd.read_excel(self.file_path, sheet_name=None, engine='openpyxl', nrows=0)
+            all_sheets = pd.read_excel(self._source(), sheet_name=None, engine='openpyxl', nrows=0)
             
             # Use openpyxl for detailed sheet analysis
-            wb = openpyxl.load_workbook(self.file_path, data_only=False)
+            with self._formula_workbook() as wb:
+                structure = {
+                    "sheet_count": len(all_sheets),
+                    "sheet_names": list(all_sheets.keys()),
+                    "sheets": {}
+                }
+                
+                for sheet_name in wb.sheetnames:
+                    ws = wb[sheet_name]
+                    structure["sheets"][sheet_name] = {
+                        "max_row": ws.max_row,
+                        "max_column": ws.max_column,
+                        "dimensions": ws.dimensions,
+                        "merged_cells_count": len(ws.merged_cells.ranges) if ws.merged_cells else 0,
+                        "has_charts": len(ws._charts) > 0 if hasattr(ws, '_charts') else False,
+                        "has_images": len(ws._images) > 0 if hasattr(ws, '_images') else False,
+                        "sheet_state": ws.sheet_state,
+                        "protection": {
+                            "sheet_protected": ws.protection.sheet,
+                            "password_protected": bool(ws.protection.password)
+                        } if ws.protection else None
+                    }
             
-            structure = {
-                "sheet_count": len(all_sheets),
-                "sheet_names": list(all_sheets.keys()),
-                "sheets": {}
-            }
+            return structure
             
-            for sheet_name in wb.sheetnames:
-                ws = wb[sheet_name]
-                structure["sheets"][sheet_name] = {
-                    "max_row": ws.max_row,
-                    "max_column": ws.max_column,
-                    "dimensions": ws.dimensions,
-                    "merged_cells_count": len(ws.merged_cells.ranges) if ws.merged_cells else 0,
-                    "has_charts": len(ws._charts) > 0 if hasattr(ws, '_charts') else False,
-                    "has_images": len(ws._images) > 0 if hasattr(ws, '_images') else False,
-                    "sheet_state": ws.sheet_state,
-                    "protection": {
-                        "sheet_protected": ws.protection.sheet,
-                        "password_protected": bool(ws.protection.password)
-                    } if ws.protection else None
+        except Exception as e:
+            return {"error": f"Failed to analyze structure: {str(e)}"}
+    
+    def _analyze_layout(self) -> Dict[str, Any]:
+        """Map merged ranges, hidden rows/columns and frozen panes, and use them to read headers and previews"""
+        try:
+            layouts = _sheet_layouts(self._source())
+            wb = openpyxl.load_workbook(self._source(), read_only=True, data_only=True)
+            
+            layout = {"sheets": {}}
+            for ws in wb.worksheets:
+                sheet_layout = layouts.get(ws.title, LayoutMap())
+                header_rows = list(ws.iter_rows(max_row=HEADER_SCAN_ROWS, values_only=True))
+                header_row, headers = _detect_header_row(header_rows, sheet_layout)
+                
+                # Preview the first visible rows below the header (and any merges hanging off it),
+                # with merged values filled in
+                header_end = max([header_row] + [m[3] for m in sheet_layout.row_merges(header_row)]) if header_row else 0
+                preview = []
+                anchors: Dict[Tuple[int, int], Any] = {}
+                for row_idx, values in enumerate(ws.iter_rows(values_only=True), start=1):
+                    filled = sheet_layout.fill_row(row_idx, values, anchors)
+                    if row_idx <= header_end or sheet_layout.is_row_hidden(row_idx):
+                        continue
+                    if all(v is None for v in filled):
+                        continue
+                    preview.append([
+                        "" if v is None else str(v)
+                        for col, v in enumerate(filled[:len(headers)], start=1)
+                        if not sheet_layout.is_col_hidden(col)
+                    ])
+                    if len(preview) >= PREVIEW_ROWS:
+                        break
+                
+                layout["sheets"][ws.title] = {
+                    **sheet_layout.to_dict(),
+                    "header_row": header_row,
+                    "headers": [h for col, h in enumerate(headers, start=1) if not sheet_layout.is_col_hidden(col)],
+                    "preview": preview
                 }
             
             wb.close()
-            return structure
+            return layout
             
         except Exception as e:
-            return {"error": f"Failed to analyze structure: {str(e)}"}
+            return {"error": f"Failed to analyze layout: {str(e)}"}
     
     def _analyze_content(self) -> Dict[str, Any]:
         """Analyze content using pandas for efficient data processing"""
+        if self.max_memory:
+            return self._analyze_content_bounded()
         try:
             # Read all sheets with pandas
-            all_sheets = pd.read_excel(self.file_path, sheet_name=None, engine='openpyxl')
+            all_sheets = pd.read_excel(self._source(), sheet_name=None, engine='openpyxl')
             
             content = {
                 "total_rows": 0,
@@ -184,90 +1099,272 @@ class ExcelAnalyzer:
                 content["sheets"][sheet_name] = sheet_analysis
             
             # Check for formulas using openpyxl
-            wb = openpyxl.load_workbook(self.file_path, data_only=False)
-            for sheet_name in wb.sheetnames:
-                ws = wb[sheet_name]
-                has_formulas = False
-                formula_count = 0
+            with self._formula_workbook() as wb:
+                for sheet_name in wb.sheetnames:
+                    ws = wb[sheet_name]
+                    sample = self.sampler.scan(ws, self._tally_formulas)
+                    formula_count = sample.observed("formulas")
                 
-                for row in ws.iter_rows(max_row=min(100, ws.max_row)):  # Sample first 100 rows
-                    for cell in row:
-                        if cell.value and isinstance(cell.value, str) and cell.value.startswith('='):
-                            has_formulas = True
-                            formula_count += 1
-                
-                if sheet_name in content["sheets"]:
-                    content["sheets"][sheet_name]["has_formulas"] = has_formulas
-                    content["sheets"][sheet_name]["formula_count_sample"] = formula_count
+                    if sheet_name in content["sheets"]:
+                        content["sheets"][sheet_name]["has_formulas"] = formula_count > 0
+                        content["sheets"][sheet_name]["formula_count_sample"] = int(formula_count)
+                        content["sheets"][sheet_name]["formula_count_estimate"] = sample.estimate("formulas")
+                        content["sheets"][sheet_name]["sampling"] = sample.summary()
             
-            wb.close()
             return content
             
         except Exception as e:
             return {"error": f"Failed to analyze content: {str(e)}"}
     
+    def _analyze_content_bounded(self) -> Dict[str, Any]:
+        """Content analysis that keeps the rows it buffers within self.max_memory bytes
+
+        Sheets are streamed in row chunks instead of being read whole. Chunks that no
+        longer fit are spilled column by column to a temporary directory, and each
+        column is then parsed on its own exactly as pandas would parse it. If even a
+        single row no longer fits, reading stops and whatever was already read or
+        spilled is analyzed and marked as partial. Only this stage is bounded: the
+        other stages still load the workbook as usual.
+        """
+        content = {
+            "total_rows": 0,
+            "total_columns": 0,
+            "sheets": {},
+            "partial": False
+        }
+        spilled = 0
+        guard = MemoryGuard(self.max_memory)
+        try:
+            with tempfile.TemporaryDirectory(prefix="excel_analyzer_") as spill_dir:
+                wb = openpyxl.load_workbook(self._source(), read_only=True, data_only=True)
+                try:
+                    for idx, ws in enumerate(wb.worksheets):
+                        sheet_dir = Path(spill_dir) / f"sheet_{idx}"
+                        sheet_analysis, sheet_spilled = self._bounded_sheet_content(ws, guard, sheet_dir)
+                        spilled += sheet_spilled
+                        content["sheets"][ws.title] = sheet_analysis
+                        content["total_rows"] += sheet_analysis["rows"]
+                        content["total_columns"] += sheet_analysis["columns"]
+                        content["partial"] = content["partial"] or sheet_analysis.get("partial", False)
+                finally:
+                    wb.close()
+                
+                # Formulas are counted exactly from the sheet XML instead of loading the workbook
+                for sheet_name, formula_count in _count_formulas(self._source()).items():
+                    if sheet_name in content["sheets"]:
+                        content["sheets"][sheet_name].update({
+                            "has_formulas": formula_count > 0,
+                            "formula_count_sample": formula_count,
+                            "formula_count_estimate": {"estimate": formula_count, "low": formula_count,
+                                                       "high": formula_count, "exact": True}
+                        })
+        except MemoryError:
+            content["partial"] = True
+        except Exception as e:
+            return {"error": f"Failed to analyze content: {str(e)}"}
+        
+        content["memory"] = {
+            "limit_mb": round(self.max_memory / (1024 * 1024), 2),
+            "peak_mb": round(guard.peak_bytes / (1024 * 1024), 2),
+            "spilled_chunks": spilled
+        }
+        return content
+    
+    def _bounded_sheet_content(self, ws, guard: MemoryGuard, spill_dir: Path) -> Tuple[Dict[str, Any], int]:
+        """Chunked, spill-capable equivalent of the per-sheet statistics in _analyze_content"""
+        sheet_analysis = {
+            "rows": 0,
+            "columns": 0,
+            "column_names": [],
+            "data_types": {},
+            "null_counts": {},
+            "non_null_counts": {},
+            "has_formulas": False,
+            "sample_data": {}
+        }
+        header: List[Any] = []
+        # (row count, column arrays in memory or spill file paths, bytes per column)
+        chunks: List[Tuple[int, List[Any], List[int]]] = []
+        pending: List[List[Any]] = []
+        pending_bytes = held_bytes = width = data_rows = last_data_row = spilled = 0
+        chunk_rows = CONTENT_CHUNK_ROWS
+        
+        def flush(spill: bool = False):
+            nonlocal spilled, chunk_rows, pending_bytes, held_bytes
+            chunk_width = max(len(r) for r in pending)
+            columns = [np.array([r[i] if i < len(r) else "" for r in pending], dtype=object)
+                       for i in range(chunk_width)]
+            sizes = [MemoryGuard.sizeof(column) for column in columns]
+            if spill or guard.exceeded(0.5):
+                # Keep the working set small: spill this chunk and shrink the next ones
+                spill_dir.mkdir(parents=True, exist_ok=True)
+                paths = []
+                for i, column in enumerate(columns):
+                    path = spill_dir / f"chunk{len(chunks)}_col{i}.npy"
+                    np.save(path, column, allow_pickle=True)
+                    paths.append(path)
+                columns = paths
+                guard.release(pending_bytes)
+                spilled += 1
+                chunk_rows = max(50, chunk_rows // 2)
+            else:
+                held_bytes += pending_bytes
+            chunks.append((len(pending), columns, sizes))
+            pending.clear()
+            pending_bytes = 0
+        
+        for row_idx, cells in enumerate(ws.iter_rows(), start=1):
+            values = [_pandas_cell(cell) for cell in cells]
+            while values and values[-1] == "":
+                values.pop()
+            row_bytes = MemoryGuard.sizeof(values)
+            if guard.used + row_bytes > guard.limit and pending:
+                flush(spill=True)
+            if guard.used + row_bytes > guard.limit:
+                # Not even this row fits: stop reading and analyze the rows read so far
+                sheet_analysis["partial"] = True
+                break
+            guard.add(row_bytes)
+            width = max(width, len(values))
+            if row_idx == 1:
+                header = values
+                continue
+            data_rows += 1
+            if values:
+                last_data_row = data_rows
+            pending.append(values)
+            pending_bytes += row_bytes
+            if len(pending) >= chunk_rows:
+                flush()
+        if pending:
+            flush()
+        
+        if last_data_row and width:
+            names = list(TextParser([header + [""] * (width - len(header))], header=0,
+                                    skip_blank_lines=False).read().columns)
+            sheet_analysis.update({
+                "rows": last_data_row,
+                "columns": width,
+                "column_names": names
+            })
+            self._bounded_parse_columns(sheet_analysis, names, chunks, last_data_row, guard)
+        
+        # Everything this sheet kept in memory is freed before the next one
+        guard.release(MemoryGuard.sizeof(header) + held_bytes)
+        return sheet_analysis, spilled
+    
+    @staticmethod
+    def _bounded_parse_columns(sheet_analysis: Dict[str, Any], names: List[Any], chunks, rows: int,
+                               guard: MemoryGuard):
+        """Parse one column at a time from the in-memory and spilled chunks
+
+        A column is loaded whole when it fits next to what is already buffered (counting
+        it twice, for the parsed copy); otherwise only its leading chunks that fit are
+        parsed and the column is reported under truncated_columns.
+        """
+        for col, name in enumerate(names):
+            values: List[Any] = []
+            loaded = 0
+            for count, columns, sizes in chunks:
+                size = sizes[col] if col < len(columns) else 0
+                if 2 * (loaded + size) > guard.available() and values:
+                    sheet_analysis["partial"] = True
+                    sheet_analysis.setdefault("truncated_columns", {})[str(name)] = len(values)
+                    break
+                loaded += size
+                if col >= len(columns):
+                    values.extend([""] * count)
+                    continue
+                column = columns[col]
+                if isinstance(column, Path):
+                    column = np.load(column, allow_pickle=True)
+                values.extend(column.tolist())
+            guard.add(2 * loaded)
+            try:
+                series = TextParser([[v] for v in values[:rows]], header=None, skip_blank_lines=False).read()[0]
+                sheet_analysis["data_types"][str(name)] = str(series.dtype)
+                sheet_analysis["null_counts"][name] = int(series.isnull().sum())
+                sheet_analysis["non_null_counts"][name] = int(series.count())
+                sheet_analysis["sample_data"][name] = series.head(3).fillna("").to_dict()
+            finally:
+                guard.release(2 * loaded)
+    
+    @staticmethod
+    def _tally_formulas(rows) -> Dict[str, float]:
+        formulas = 0
+        for row in rows:
+            for cell in row:
+                if cell.value and isinstance(cell.value, str) and cell.value.startswith('='):
+                    formulas += 1
+        return {"formulas": formulas}
+    
     def _analyze_formatting(self) -> Dict[str, Any]:
         """Analyze formatting using openpyxl"""
         try:
-            wb = openpyxl.load_workbook(self.file_path, data_only=False)
-            
-            formatting = {
-                "sheets": {},
-                "summary": {
-                    "total_styled_cells": 0,
-                    "unique_fonts": set(),
-                    "unique_colors": set(),
-                    "has_conditional_formatting": False
-                }
-            }
-            
-            for sheet_name in wb.sheetnames:
-                ws = wb[sheet_name]
-                sheet_formatting = {
-                    "styled_cells": 0,
-                    "fonts": {},
-                    "colors": {},
-                    "borders": 0,
-                    "conditional_formatting_rules": len(ws.conditional_formatting) if hasattr(ws, 'conditional_formatting') else 0
+            with self._formula_workbook() as wb:
+                formatting = {
+                    "sheets": {},
+                    "summary": {
+                        "total_styled_cells": 0,
+                        "unique_fonts": set(),
+                        "unique_colors": set(),
+                        "has_conditional_formatting": False
+                    }
                 }
                 
-                # Sample formatting from first 50x50 cells
-                max_sample_row = min(50, ws.max_row)
-                max_sample_col = min(50, ws.max_column)
+                for sheet_name in wb.sheetnames:
+                    ws = wb[sheet_name]
+                    sheet_formatting = {
+                        "styled_cells": 0,
+                        "fonts": {},
+                        "colors": {},
+                        "borders": 0,
+                        "conditional_formatting_rules": len(ws.conditional_formatting) if hasattr(ws, 'conditional_formatting') else 0
+                    }
+                
+                    def tally(rows):
+                        counts = {"styled_cells": 0, "borders": 0}
+                        for row in rows:
+                            for cell in row:
+                                if cell.font and cell.font.name:
+                                    font_key = f"{cell.font.name}_{cell.font.size}"
+                                    sheet_formatting["fonts"][font_key] = sheet_formatting["fonts"].get(font_key, 0) + 1
+                                    formatting["summary"]["unique_fonts"].add(font_key)
                 
-                for row in range(1, max_sample_row + 1):
-                    for col in range(1, max_sample_col + 1):
-                        cell = ws.cell(row=row, column=col)
-                        
-                        if cell.font and cell.font.name:
-                            font_key = f"{cell.font.name}_{cell.font.size}"
-                            sheet_formatting["fonts"][font_key] = sheet_formatting["fonts"].get(font_key, 0) + 1
-                            formatting["summary"]["unique_fonts"].add(font_key)
-                        
-                        if cell.fill and hasattr(cell.fill, 'fgColor') and cell.fill.fgColor:
-                            color = str(cell.fill.fgColor.rgb) if cell.fill.fgColor.rgb else "auto"
-                            sheet_formatting["colors"][color] = sheet_formatting["colors"].get(color, 0) + 1
-                            formatting["summary"]["unique_colors"].add(color)
-                        
-                        if cell.border and any([cell.border.left.style, cell.border.right.style, 
-                                              cell.border.top.style, cell.border.bottom.style]):
-                            sheet_formatting["borders"] += 1
-                        
-                        if any([cell.font and cell.font.name, cell.fill and cell.fill.fgColor, 
-                               cell.border and cell.border.left.style]):
-                            sheet_formatting["styled_cells"] += 1
-                            formatting["summary"]["total_styled_cells"] += 1
+                                if cell.fill and hasattr(cell.fill, 'fgColor') and cell.fill.fgColor:
+                                    color = str(cell.fill.fgColor.rgb) if cell.fill.fgColor.rgb else "auto"
+                                    sheet_formatting["colors"][color] = sheet_formatting["colors"].get(color, 0) + 1
+                                    formatting["summary"]["unique_colors"].add(color)
                 
-                if sheet_formatting["conditional_formatting_rules"] > 0:
-                    formatting["summary"]["has_conditional_formatting"] = True
+                                if cell.border and any([cell.border.left.style, cell.border.right.style, 
+                                                      cell.border.top.style, cell.border.bottom.style]):
+                                    counts["borders"] += 1
                 
-                formatting["sheets"][sheet_name] = sheet_formatting
-            
-            # Convert sets to lists for JSON serialization
-            formatting["summary"]["unique_fonts"] = list(formatting["summary"]["unique_fonts"])
-            formatting["summary"]["unique_colors"] = list(formatting["summary"]["unique_colors"])
+                                if any([cell.font and cell.font.name, cell.fill and cell.fill.fgColor, 
+                                       cell.border and cell.border.left.style]):
+                                    counts["styled_cells"] += 1
+                        return counts
+                
+                    # Sample formatting from stratified row blocks within the sampling budget
+                    sample = self.sampler.scan(ws, tally)
+                    sheet_formatting["styled_cells"] = int(sample.observed("styled_cells"))
+                    sheet_formatting["borders"] = int(sample.observed("borders"))
+                    sheet_formatting["estimates"] = {
+                        "styled_cells": sample.estimate("styled_cells"),
+                        "borders": sample.estimate("borders")
+                    }
+                    sheet_formatting["sampling"] = sample.summary()
+                    formatting["summary"]["total_styled_cells"] += sheet_formatting["styled_cells"]
+                
+                    if sheet_formatting["conditional_formatting_rules"] > 0:
+                        formatting["summary"]["has_conditional_formatting"] = True
+                
+                    formatting["sheets"][sheet_name] = sheet_formatting
+                
+                # Convert sets to lists for JSON serialization
+                formatting["summary"]["unique_fonts"] = sorted(formatting["summary"]["unique_fonts"])
+                formatting["summary"]["unique_colors"] = sorted(formatting["summary"]["unique_colors"])
             
-            wb.close()
             return formatting
             
         except Exception as e:
@@ -279,7 +1376,7 @@ class ExcelAnalyzer:
             return {"message": "File is not macro-enabled"}
         
         try:
-            vba_parser = VBA_Parser(str(self.file_path))
+            vba_parser = VBA_Parser(str(self.file_path), data=self._file_bytes)
             
             vba_analysis = {
                 "has_macros": vba_parser.detect_vba_macros(),
@@ -380,6 +1477,13 @@ class ExcelAnalyzer:
                     subroutines.append(parts[-1])
         return subroutines
 
+async def analyze_async(file_path: str, include_vba: bool = True, include_formatting: bool = True,
+                        executor=None, budget: Optional[SamplingBudget] = None,
+                        max_memory: Optional[int] = None) -> Dict[str, Any]:
+    """Analyze an Excel file without blocking the calling event loop"""
+    analyzer = ExcelAnalyzer(file_path, budget=budget, max_memory=max_memory)
+    return await analyzer.analyze_async(include_vba, include_formatting, executor)
+
 class MarkdownReportGenerator:
     """Generate comprehensive markdown reports from analysis results"""
     
@@ -393,6 +1497,7 @@ class MarkdownReportGenerator:
             self._generate_file_info(),
             self._generate_metadata_section(),
             self._generate_structure_section(),
+            self._generate_layout_section(),
             self._generate_content_section(),
             self._generate_formatting_section(),
             self._generate_vba_section(),
@@ -401,6 +1506,10 @@ class MarkdownReportGenerator:
         
         return "\n\n".join(filter(None, report_sections))
     
+    def _template_fast_path(self) -> bool:
+        """Whether the results come from a template fast path that skips some stages"""
+        return bool(self.results.get("template", {}).get("fast_path"))
+    
     def _generate_header(self) -> str:
         """Generate report header"""
         file_name = self.results.get("file_info", {}).get("file_name", "Unknown")
@@ -427,11 +1536,15 @@ class MarkdownReportGenerator:
 | File Name | {file_info.get('file_name', 'N/A')} |
 | File Size | {file_info.get('file_size_mb', 'N/A')} MB ({file_info.get('file_size', 'N/A'):,} bytes) |
 | Macro Enabled | {'Yes' if file_info.get('is_macro_enabled') else 'No'} |
-| Last Modified | {file_info.get('last_modified', 'N/A')} |"""
+| Last Modified | {file_info.get('last_modified', 'N/A')} |""" + (
+            f"\n| Template | {self.results['template']['name']} ({self.results['template']['match']}) |"
+            if self.results.get("template") else "")
     
     def _generate_metadata_section(self) -> str:
         """Generate metadata section"""
         metadata = self.results.get("metadata", {})
+        if not metadata and self._template_fast_path():
+            return None
         if not metadata or "error" in metadata:
             return "## Metadata\n\n*Metadata analysis failed or unavailable*"
         
@@ -481,6 +1594,28 @@ class MarkdownReportGenerator:
         
         return "\n".join(sections)
     
+    def _generate_layout_section(self) -> str:
+        """Generate sheet layout section"""
+        layout = self.results.get("layout", {})
+        if not layout or "error" in layout:
+            return None
+        
+        sections = ["""## Sheet Layout
+
+| Sheet | Header Row | Merged Ranges | Hidden Rows | Hidden Columns | Frozen Panes |
+|-------|------------|---------------|-------------|----------------|--------------|"""]
+        
+        for sheet_name, sheet_layout in layout.get("sheets", {}).items():
+            hidden_rows = sum(end - start + 1 for start, end in sheet_layout.get("hidden_rows", []))
+            hidden_cols = ", ".join(a if a == b else f"{a}:{b}" for a, b in sheet_layout.get("hidden_columns", []))
+            frozen = sheet_layout.get("frozen_panes")
+            frozen_info = f"{frozen['rows']} rows, {frozen['columns']} cols" if frozen else "-"
+            sections.append(f"| {sheet_name} | {sheet_layout.get('header_row') or '-'} | "
+                            f"{len(sheet_layout.get('merged_ranges', []))} | {hidden_rows} | "
+                            f"{hidden_cols or '-'} | {frozen_info} |")
+        
+        return "\n".join(sections)
+    
     def _generate_content_section(self) -> str:
         """Generate content analysis section"""
         content = self.results.get("content", {})
@@ -499,20 +1634,24 @@ class MarkdownReportGenerator:
             has_formulas = "Yes" if sheet_info.get("has_formulas") else "No"
             formula_count = sheet_info.get("formula_count_sample", 0)
             
+            formula_info = f"""
+- **Has Formulas:** {has_formulas}
+- **Formula Count (sample):** {formula_count}""" if "has_formulas" in sheet_info else ""
+            
             sections.append(f"""
 #### {sheet_name}
 
 - **Rows:** {sheet_info.get('rows', 0):,}
-- **Columns:** {sheet_info.get('columns', 0)}
-- **Has Formulas:** {has_formulas}
-- **Formula Count (sample):** {formula_count}
-- **Column Names:** {', '.join(sheet_info.get('column_names', [])[:10])}{'...' if len(sheet_info.get('column_names', [])) > 10 else ''}""")
+- **Columns:** {sheet_info.get('columns', 0)}{formula_info}
+- **Column Names:** {', '.join(str(c) for c in sheet_info.get('column_names', [])[:10])}{'...' if len(sheet_info.get('column_names', [])) > 10 else ''}""")
         
         return "\n".join(sections)
     
     def _generate_formatting_section(self) -> str:
         """Generate formatting analysis section"""
         formatting = self.results.get("formatting", {})
+        if not formatting and self._template_fast_path():
+            return None
         if not formatting or "error" in formatting:
             return "## Formatting Analysis\n\n*Formatting analysis failed or unavailable*"
         
@@ -636,32 +1775,1990 @@ class MarkdownReportGenerator:
 *Report generated by Excel Analyzer CLI Tool*  
 *For reuse in other applications, extract the analysis data from the JSON output*"""
 
-def main():
-    """Main CLI function"""
-    parser = argparse.ArgumentParser(
-        description="Excel Analyzer - Comprehensive analysis tool for Excel files",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
-Examples:
-  python excel_analyzer.py analyze file.xlsx
-  python excel_analyzer.py analyze file.xlsm --include-vba --output-format markdown
-  python excel_analyzer.py analyze file.xlsx --output-dir ./reports/
-        """
-    )
-    
-    subparsers = parser.add_subparsers(dest='command', help='Available commands')
-    
-    # Analyze command
-    analyze_parser = subparsers.add_parser('analyze', help='Analyze an Excel file')
-    analyze_parser.add_argument('file', help='Path to Excel file (.xlsx or .xlsm)')
-    analyze_parser.add_argument('--include-vba', action='store_true', default=True,
-                               help='Include VBA macro analysis (default: True)')
-    analyze_parser.add_argument('--include-formatting', action='store_true', default=True,
-                               help='Include formatting analysis (default: True)')
-    analyze_parser.add_argument('--output-format', choices=['json', 'markdown', 'both'], 
-                               default='both', help='Output format (default: both)')
+class HeaderClassifier:
+    """Tag column headers with semantic field types, known CET/SET fields and TMF function vocabulary
+
+    Every keyword and phrase is compiled once into a trie over word tokens, so a
+    header is tokenized and scanned in a single pass no matter how large the
+    vocabulary is; a handful of shape patterns (percentages, week numbers, ...)
+    share one compiled regex. Results are memoized by normalized header text, so a
+    header seen before, in any sheet or file, costs one dict lookup.
+    """
+
+    FIELD_KEYWORDS = {
+        "id_fields": ["id", "uid", "identifier", "ref", "ref no", "reference", "code", "key", "#"],
+        "name_fields": ["name", "title", "label"],
+        "date_fields": ["date", "timestamp", "created", "updated", "modified", "deadline", "start", "end", "due"],
+        "financial_fields": ["cost", "costs", "price", "amount", "rate", "rate band", "budget", "revenue", "fee",
+                             "fees", "margin", "expense", "expenses", "value", "savings", "$", "usd", "eur"],
+        "status_fields": ["status", "state", "stage", "active", "approved", "accepted"],
+        "effort_fields": ["effort", "fte", "days", "hours", "weeks", "duration", "man days", "capacity"],
+        "percentage_fields": ["%", "percent", "percentage", "ratio"],
+        "role_fields": ["role", "owner", "job title", "job profile", "resource", "worker type", "team",
+                        "organization", "raised by"],
+        "location_fields": ["region", "territory", "country", "location", "office", "language"],
+        "phase_fields": ["phase", "scenario", "sit", "uat", "cutover", "build", "design", "warranty"],
+        "description_fields": ["description", "details", "assumption", "assumptions", "comment", "comments",
+                               "notes", "resolution", "requirement", "summary"],
+        "type_fields": ["type", "category", "group", "level", "tier", "complexity", "class"],
+        "quantity_fields": ["count", "total", "sum", "quantity", "qty", "number", "volume"],
+    }
+    SHAPE_PATTERNS = [
+        ("percentage_fields", r"%"),
+        ("date_fields", r"^(?:week|wk|month|quarter|year)\s*\d+$"),
+        ("phase_fields", r"^(?:phase|scenario)\s*\d+$|^<.*scenario.*>$"),
+        ("financial_fields", r"[$€£]"),
+    ]
+    CET_COLUMNS = [
+        "Project Role", "Project Team", "Project Phase", "Sales Region", "Sales Territory", "Resource Cost Region",
+        "Resource Cost Level", "Resource Level", "Workday Job Title", "Workday Job Profile",
+        "Supervisory Organization", "Demand Location - Country Code", "Worker Type", "Product / Service",
+        "Product Component", "Modules Included", "Domain", "Language", "FTE", "SDC Type", "Rule Owner",
+        "Agile Resource Role", "Role", "Phase Attributes", "Attribute Description", "Total Program",
+        "CSG SFDC Region", "SFDC Territory", "Sub Region Rate Band", "Country Location", "Office",
+        "Benefit from Overlap", "Combined Savings", "Project Days", "Warranty Days",
+    ]
+    SET_COLUMNS = {
+        "Ref #": "ref_num", "TM Frameworx Components": "component", "Details and/or Assumptions": "details",
+        "Customer Reference": "customer_ref", "TAM Group Type": "tam_group_type", "Row Type": "row_type",
+        "Static Ref No": "static_ref_no", "Total CUT": "total_cut", "Solution Component": "solution_component",
+    }
+    TMF_LEVELS = [("Domain", "domain"), ("AF Lev.1", "af_level_1"), ("AF Lev.2", "af_level_2"),
+                  ("Rephrased Function Name", "function")]
+    TMF_GENERIC_WORDS = {"management", "domain"}
+    TMF_JOIN_WORDS = {"and", "or", "of", "for", "the", "to", "with", "in", "on"}
+    TOKEN_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+|[#%$€£]")
+    _default: Optional["HeaderClassifier"] = None
+
+    def __init__(self, vocabulary_csv: Optional[str] = None):
+        self._trie: Dict[Any, Any] = {}
+        self._shapes = re.compile("|".join(
+            f"(?P<{tag}_{idx}>{pattern})" for idx, (tag, pattern) in enumerate(self.SHAPE_PATTERNS)))
+        self._known: Dict[str, Dict[str, str]] = {}
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self.vocabulary_csv = Path(vocabulary_csv) if vocabulary_csv else \
+            Path(__file__).with_name("TMF_Domains_Functions.csv")
+
+        for tag, keywords in self.FIELD_KEYWORDS.items():
+            for keyword in keywords:
+                self._add_phrase(keyword, ("tag", tag))
+        for label in self.CET_COLUMNS:
+            self._known[self.normalize(label)] = {"source": "cet", "field": self._snake(label)}
+        for label, field in self.SET_COLUMNS.items():
+            self._known[self.normalize(label)] = {"source": "set", "field": field}
+        if self.vocabulary_csv.exists():
+            self._load_tmf_vocabulary()
+
+    @classmethod
+    def default(cls) -> "HeaderClassifier":
+        """Shared classifier over the bundled vocabulary, so its memo carries across files"""
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        return [token.lower() for token in cls.TOKEN_PATTERN.findall(text)]
+
+    @classmethod
+    def normalize(cls, text: str) -> str:
+        return " ".join(cls.tokenize(str(text)))
+
+    @classmethod
+    def _snake(cls, text: str) -> str:
+        return "_".join(t for t in cls.tokenize(text) if t.isalnum())
+
+    def _add_phrase(self, phrase: str, payload: Tuple):
+        node = self._trie
+        for token in self.tokenize(phrase):
+            node = node.setdefault(token, {})
+        if node is not self._trie:
+            node.setdefault(None, set()).add(payload)
+
+    def _load_tmf_vocabulary(self):
+        with open(self.vocabulary_csv, 'r', encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                domain = (row.get("Domain") or "").strip()
+                for column, level in self.TMF_LEVELS:
+                    term = (row.get(column) or "").strip()
+                    if not term:
+                        continue
+                    payload = ("tmf", level, term, domain)
+                    tokens = self.tokenize(term)
+                    # A one-word term ("Resource") only matches a header that is just that word
+                    self._add_phrase(term, payload if len(tokens) > 1 else ("tmf_whole",) + payload[1:])
+                    # Also match the distinctive core of "X Management" / "X Domain" terms, but
+                    # only when it is still a phrase: a lone "Sales" or "Customer" matches anything
+                    core = [t for t in tokens if t not in self.TMF_GENERIC_WORDS]
+                    if len(core) >= 2 and len(core) < len(tokens):
+                        self._add_phrase(" ".join(core), payload)
+                    # Headers that abbreviate a term ("Billing Account") match it by prefix
+                    for end in range(2, len(tokens)):
+                        if tokens[end - 1] not in self.TMF_JOIN_WORDS:
+                            self._add_phrase(" ".join(tokens[:end]), ("tmf_prefix",) + payload[1:])
+
+    def classify(self, header: Any) -> Dict[str, Any]:
+        """Semantic tags, known CET/SET field and TMF vocabulary matches for one header"""
+        key = self.normalize(header) if header is not None else ""
+        text = str(header).strip() if header is not None else ""
+        cache_key = f"{key}\x00{text.lower()}"
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        tokens = key.split()
+        tags = set()
+        tmf_spans = []
+        prefix_spans = []
+        for start in range(len(tokens)):
+            node = self._trie
+            for end in range(start, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                for payload in node.get(None, ()):
+                    if payload[0] == "tag":
+                        tags.add(payload[1])
+                    elif payload[0] == "tmf":
+                        tmf_spans.append((start, end + 1, payload))
+                    elif start == 0 and end == len(tokens) - 1:
+                        spans = tmf_spans if payload[0] == "tmf_whole" else prefix_spans
+                        spans.append((start, end + 1, payload))
+        for match in self._shapes.finditer(text.lower()):
+            tags.add(match.lastgroup.rsplit("_", 1)[0])
+
+        # A whole header that only abbreviates terms matches the highest-level ones among them
+        if not tmf_spans and prefix_spans:
+            levels = [level for _, level in self.TMF_LEVELS]
+            top = min(levels.index(payload[1]) for _, _, payload in prefix_spans)
+            tmf_spans = [span for span in prefix_spans if levels.index(span[2][1]) == top]
+
+        # Keep only the longest TMF matches; shorter ones inside them add nothing
+        tmf = []
+        for start, end, payload in tmf_spans:
+            if any(s <= start and end <= e and (e - s) > (end - start) for s, e, _ in tmf_spans):
+                continue
+            match = {"level": payload[1], "term": payload[2], "domain": payload[3]}
+            if match not in tmf:
+                tmf.append(match)
+
+        result = {"tags": sorted(tags), "known": self._known.get(key), "tmf": tmf}
+        self._cache[cache_key] = result
+        return result
+
+    def classify_headers(self, headers: List[Any]) -> Dict[str, List[int]]:
+        """Group column indexes by semantic tag, like the header_patterns in cet_analyzer"""
+        patterns: Dict[str, List[int]] = {}
+        for idx, header in enumerate(headers):
+            if header:
+                for tag in self.classify(header)["tags"]:
+                    patterns.setdefault(tag, []).append(idx)
+        return patterns
+
+    def classify_workbook(self, file_path: str) -> Dict[str, Any]:
+        """Tag the detected header row of every sheet, reading each sheet's leading rows once"""
+        layouts = _sheet_layouts(file_path)
+        sheets = {}
+        wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for ws in wb.worksheets:
+                rows = ws.iter_rows(max_row=HEADER_SCAN_ROWS, values_only=True)
+                header_row, headers = _detect_header_row(rows, layouts.get(ws.title))
+                sheets[ws.title] = {
+                    "header_row": header_row,
+                    "columns": [
+                        {"column": get_column_letter(col), "header": header, **self.classify(header)}
+                        for col, header in enumerate(headers, start=1) if header
+                    ],
+                }
+        finally:
+            wb.close()
+        return {"file_name": Path(file_path).name, "sheets": sheets}
+
+class ValidationCatalog:
+    """Catalog of defined names and data-validation rules resolved to their list values
+
+    Names come from workbook.xml and validations (including the x14 extension
+    form Excel uses for cross-sheet lists) are streamed out of each worksheet
+    part in one pass. Every range a dropdown depends on is then read in a
+    single bounded pass per sheet, and identical sources share one list entry.
+    """
+
+    NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+    NS_X14 = "http://schemas.microsoft.com/office/spreadsheetml/2009/9/main"
+    NS_XM = "http://schemas.microsoft.com/office/excel/2006/main"
+    REF_PATTERN = re.compile(
+        r"^(?:(?P<external>\[\d+\])?(?:'(?P<quoted>(?:[^']|'')+)'|(?P<plain>[^'!\[]+))!)?"
+        r"(?P<range>\$?[A-Z]{1,3}\$?\d+(?::\$?[A-Z]{1,3}\$?\d+)?"
+        r"|\$?[A-Z]{1,3}:\$?[A-Z]{1,3}|\$?\d+:\$?\d+)$"
+    )
+
+    def __init__(self, file_path: str):
+        self.file_path = Path(file_path)
+
+    @classmethod
+    def parse_reference(cls, text: str, default_sheet: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Parse 'Sheet'!$A$1:$B$2, $A:$A or $2:$2 style references; None when the text is not a plain range"""
+        match = cls.REF_PATTERN.match(text.strip().lstrip("="))
+        if not match:
+            return None
+        sheet = match.group("quoted")
+        sheet = sheet.replace("''", "'") if sheet else (match.group("plain") or default_sheet)
+        cell_range = match.group("range").replace("$", "")
+        return {"sheet": sheet, "range": cell_range, "external": bool(match.group("external"))}
+
+    def _read_workbook_parts(self) -> Tuple[List[str], List[Dict[str, Any]]]:
+        with zipfile.ZipFile(self.file_path) as zf:
+            workbook = ElementTree.fromstring(zf.read("xl/workbook.xml"))
+        ns = {"main": self.NS_MAIN}
+        sheet_names = [s.get("name") for s in workbook.findall("main:sheets/main:sheet", ns)]
+        names = []
+        for defined in workbook.findall("main:definedNames/main:definedName", ns):
+            local_id = defined.get("localSheetId")
+            names.append({
+                "name": defined.get("name"),
+                "scope": sheet_names[int(local_id)] if local_id is not None else "workbook",
+                "hidden": defined.get("hidden") == "1",
+                "refers_to": defined.text or "",
+            })
+        return sheet_names, names
+
+    def _iter_validations(self, sheet_parts: Dict[str, str]) -> Iterator[Dict[str, Any]]:
+        """Stream validation rules out of every worksheet part"""
+        main_tag = f"{{{self.NS_MAIN}}}dataValidation"
+        x14_tag = f"{{{self.NS_X14}}}dataValidation"
+        row_tag = f"{{{self.NS_MAIN}}}row"
+        with zipfile.ZipFile(self.file_path) as zf:
+            for sheet_name, part in sheet_parts.items():
+                if part not in zf.namelist():
+                    continue
+                with zf.open(part) as stream:
+                    for _, elem in ElementTree.iterparse(stream, events=("end",)):
+                        if elem.tag == row_tag:
+                            elem.clear()
+                        elif elem.tag == main_tag:
+                            yield self._validation_entry(
+                                sheet_name, elem, elem.get("sqref", ""),
+                                elem.findtext(f"{{{self.NS_MAIN}}}formula1"),
+                                elem.findtext(f"{{{self.NS_MAIN}}}formula2"))
+                            elem.clear()
+                        elif elem.tag == x14_tag:
+                            yield self._validation_entry(
+                                sheet_name, elem, elem.findtext(f"{{{self.NS_XM}}}sqref") or "",
+                                elem.findtext(f"{{{self.NS_X14}}}formula1/{{{self.NS_XM}}}f"),
+                                elem.findtext(f"{{{self.NS_X14}}}formula2/{{{self.NS_XM}}}f"))
+                            elem.clear()
+
+    @staticmethod
+    def _validation_entry(sheet_name, elem, sqref, formula1, formula2) -> Dict[str, Any]:
+        return {
+            "sheet": sheet_name,
+            "sqref": sqref,
+            "type": elem.get("type", "any"),
+            "operator": elem.get("operator"),
+            "allow_blank": elem.get("allowBlank") == "1",
+            "formula1": formula1,
+            "formula2": formula2,
+            "prompt": elem.get("prompt"),
+            "error": elem.get("error"),
+        }
+
+    def _resolve_source(self, formula: str, sheet_name: str, names: Dict[Tuple[str, str], str],
+                        depth: int = 0) -> Dict[str, Any]:
+        """Work out where a list validation's values come from"""
+        formula = (formula or "").strip()
+        if formula.startswith('"') and formula.endswith('"'):
+            values = [v.strip() for v in formula[1:-1].split(",") if v.strip()]
+            return {"kind": "literal", "key": "literal:" + ",".join(values), "values": values}
+
+        reference = self.parse_reference(formula, default_sheet=sheet_name)
+        if reference:
+            if reference["external"]:
+                return {"kind": "external", "key": formula}
+            return {"kind": "range", "key": f"{reference['sheet']}!{reference['range']}", **reference}
+
+        target = names.get((sheet_name, formula)) or names.get(("workbook", formula))
+        if target is not None and depth < 5:
+            resolved = self._resolve_source(target, sheet_name, names, depth + 1)
+            resolved.setdefault("name", formula)
+            return resolved
+        return {"kind": "formula", "key": formula}
+
+    def _read_ranges(self, ranges: Dict[str, Dict[str, Any]]) -> Dict[str, List[Any]]:
+        """Read the values of every range source, one bounded pass per sheet
+
+        Whole-column and whole-row sources ($A:$A, $2:$2) are cut off at the sheet's
+        used range.
+        """
+        by_sheet: Dict[str, List[Tuple[str, Tuple[Any, ...]]]] = {}
+        for key, source in ranges.items():
+            by_sheet.setdefault(source["sheet"], []).append((key, range_boundaries(source["range"])))
+
+        values: Dict[str, List[Any]] = {}
+        wb = openpyxl.load_workbook(self.file_path, read_only=True, data_only=True)
+        try:
+            for sheet_name, wanted in by_sheet.items():
+                if sheet_name not in wb.sheetnames:
+                    continue
+                ws = wb[sheet_name]
+                if any(None in b for _, b in wanted):
+                    ws.calculate_dimension(force=True)
+                    wanted = [(key, (c1 or 1, r1 or 1, c2 or ws.max_column or 1, r2 or ws.max_row or 1))
+                              for key, (c1, r1, c2, r2) in wanted]
+                min_col = min(b[0] for _, b in wanted)
+                min_row = min(b[1] for _, b in wanted)
+                max_col = max(b[2] for _, b in wanted)
+                max_row = max(b[3] for _, b in wanted)
+                grid = {}
+                rows = ws.iter_rows(min_row=min_row, max_row=max_row,
+                                                min_col=min_col, max_col=max_col, values_only=True)
+                for row_idx, row in enumerate(rows, start=min_row):
+                    for col_idx, value in enumerate(row, start=min_col):
+                        if value is not None and value != "":
+                            grid[(row_idx, col_idx)] = value
+                for key, (c1, r1, c2, r2) in wanted:
+                    values[key] = [
+                        grid[(r, c)] for r in range(r1, r2 + 1) for c in range(c1, c2 + 1) if (r, c) in grid
+                    ]
+        finally:
+            wb.close()
+        return values
+
+    def build(self) -> Dict[str, Any]:
+        """Resolve every defined name and validation rule into an indexed catalog"""
+        sheet_names, defined_names = self._read_workbook_parts()
+        names = {(n["scope"], n["name"]): n["refers_to"] for n in defined_names}
+
+        for entry in defined_names:
+            reference = self.parse_reference(entry["refers_to"])
+            if reference and reference["sheet"]:
+                entry.update(kind="external" if reference["external"] else "range",
+                             sheet=reference["sheet"], range=reference["range"])
+            elif "#REF!" in entry["refers_to"]:
+                entry["kind"] = "broken"
+            else:
+                entry["kind"] = "formula"
+
+        validations = []
+        lists: Dict[str, Dict[str, Any]] = {}
+        pending_ranges: Dict[str, Dict[str, Any]] = {}
+        for rule in self._iter_validations(_sheet_parts(self.file_path)):
+            rule["id"] = len(validations)
+            if rule["type"] == "list":
+                source = self._resolve_source(rule["formula1"], rule["sheet"], names)
+                rule["list_id"] = source["key"]
+                if source["key"] not in lists:
+                    lists[source["key"]] = {
+                        "kind": source["kind"],
+                        "name": source.get("name"),
+                        "values": source.get("values", []),
+                    }
+                    if source["kind"] == "range":
+                        pending_ranges[source["key"]] = source
+            validations.append(rule)
+
+        for key, values in self._read_ranges(pending_ranges).items():
+            lists[key]["values"] = values
+
+        sheet_index: Dict[str, List[int]] = {name: [] for name in sheet_names}
+        for rule in validations:
+            sheet_index.setdefault(rule["sheet"], []).append(rule["id"])
+        name_index: Dict[str, List[int]] = {}
+        for idx, entry in enumerate(defined_names):
+            name_index.setdefault(entry["name"], []).append(idx)
+
+        return {
+            "file_name": self.file_path.name,
+            "defined_names": defined_names,
+            "validations": validations,
+            "lists": lists,
+            "index": {"sheets": sheet_index, "names": name_index},
+            "summary": {
+                "defined_names": len(defined_names),
+                "validations": len(validations),
+                "list_validations": sum(1 for v in validations if v["type"] == "list"),
+                "resolved_lists": sum(1 for l in lists.values() if l["values"]),
+                "unresolved_lists": sum(1 for l in lists.values() if not l["values"]),
+            },
+        }
+
+    @staticmethod
+    def dropdown_for(catalog: Dict[str, Any], sheet_name: str, cell: str) -> Optional[List[Any]]:
+        """Dropdown values for a cell from a built catalog, or None when it has no list validation"""
+        col, row = coordinate_to_tuple(cell)[::-1]
+        for rule_id in catalog["index"]["sheets"].get(sheet_name, []):
+            rule = catalog["validations"][rule_id]
+            if rule["type"] != "list":
+                continue
+            for part in rule["sqref"].split():
+                c1, r1, c2, r2 = range_boundaries(part)
+                if (c1 or 1) <= col <= (c2 or col) and (r1 or 1) <= row <= (r2 or row):
+                    return catalog["lists"][rule["list_id"]]["values"]
+        return None
+
+class DuplicateDetector:
+    """Find duplicate and near-duplicate rows within and across sheets and files
+
+    Every normalized row is hashed into an exact fingerprint index. Fingerprints
+    seen only once are then summarised with MinHash signatures over their
+    column-keyed cells and bucketed with LSH banding, so near-duplicates are found
+    without pairwise comparison. Rows already in an exact cluster are not reported
+    again as near-duplicates.
+    """
+
+    MERSENNE_PRIME = (1 << 31) - 1
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, min_cells: int = 2, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.min_cells = min_cells
+        self.bands, self.rows_per_band = self._choose_bands(threshold, num_perm)
+
+        rng = np.random.default_rng(seed)
+        self._perm_a = rng.integers(1, self.MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._perm_b = rng.integers(0, self.MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        # fingerprint -> list of (file, sheet, row) locations
+        self.fingerprints: Dict[bytes, List[Tuple[str, str, int]]] = {}
+        self._tokens: Dict[bytes, set] = {}
+        self.rows_indexed = 0
+
+    @staticmethod
+    def _choose_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+        """Pick the LSH band layout whose S-curve midpoint is closest to the threshold"""
+        best = (num_perm, 1)
+        best_error = float("inf")
+        for rows in range(1, num_perm + 1):
+            if num_perm % rows:
+                continue
+            bands = num_perm // rows
+            error = abs((1 / bands) ** (1 / rows) - threshold)
+            if error < best_error:
+                best, best_error = (bands, rows), error
+        return best
+
+    @staticmethod
+    def _hash_token(token: str) -> int:
+        return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little")
+
+    def add_workbook(self, file_path: str, sheets: Optional[List[str]] = None) -> int:
+        """Index every row of a workbook, returning the number of rows added"""
+        file_name = Path(file_path).name
+        added = 0
+        wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for ws in wb.worksheets:
+                if sheets and ws.title not in sheets:
+                    continue
+                for row_idx, values in enumerate(ws.iter_rows(values_only=True), start=1):
+                    if self.add_row(file_name, ws.title, row_idx, values):
+                        added += 1
+        finally:
+            wb.close()
+        return added
+
+    def add_row(self, file_name: str, sheet_name: str, row_idx: int, values) -> bool:
+        """Index a single row; rows with fewer than min_cells values are skipped"""
+        cells = [_normalize_cell(v) for v in values]
+        while cells and not cells[-1]:
+            cells.pop()
+        # Key each cell by its column, so reordered rows or rows of flags do not look alike
+        tokens = {f"{col}={cell}" for col, cell in enumerate(cells) if cell}
+        if len(tokens) < self.min_cells:
+            return False
+
+        fingerprint = hashlib.blake2b("\x1f".join(cells).encode("utf-8"), digest_size=16).digest()
+        locations = self.fingerprints.setdefault(fingerprint, [])
+        if not locations:
+            self._tokens[fingerprint] = tokens
+        locations.append((file_name, sheet_name, row_idx))
+        self.rows_indexed += 1
+        return True
+
+    def _signature(self, tokens: set) -> np.ndarray:
+        hashes = np.fromiter((self._hash_token(t) for t in tokens), dtype=np.uint64, count=len(tokens))
+        permuted = (self._perm_a[:, None] * hashes[None, :] + self._perm_b[:, None]) % self.MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+    def find_clusters(self) -> Dict[str, Any]:
+        """Report exact and near-duplicate clusters over everything indexed so far"""
+        exact_clusters = [
+            self._describe_cluster("exact", locations, 1.0)
+            for locations in self.fingerprints.values() if len(locations) > 1
+        ]
+
+        keys = [k for k in self._tokens if len(self.fingerprints[k]) == 1]
+        signatures = np.vstack([self._signature(self._tokens[k]) for k in keys]) if keys else np.empty((0, self.num_perm))
+
+        # Union distinct fingerprints that share an LSH bucket and agree closely enough
+        parent = list(range(len(keys)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        similarity: Dict[int, float] = {}
+        for band in range(self.bands):
+            start = band * self.rows_per_band
+            buckets: Dict[bytes, int] = {}
+            for i, signature in enumerate(signatures):
+                bucket = signature[start:start + self.rows_per_band].tobytes()
+                representative = buckets.setdefault(bucket, i)
+                if representative == i:
+                    continue
+                estimate = float(np.mean(signatures[representative] == signature))
+                if estimate >= self.threshold:
+                    root_a, root_b = find(representative), find(i)
+                    if root_a != root_b:
+                        parent[root_b] = root_a
+                    similarity[i] = max(similarity.get(i, 0.0), estimate)
+
+        groups: Dict[int, List[int]] = {}
+        for i in range(len(keys)):
+            groups.setdefault(find(i), []).append(i)
+
+        near_clusters = []
+        for members in groups.values():
+            if len(members) < 2:
+                continue
+            locations = [loc for i in members for loc in self.fingerprints[keys[i]]]
+            min_similarity = min(similarity.get(i, 1.0) for i in members)
+            near_clusters.append(self._describe_cluster("near", locations, round(min_similarity, 3)))
+
+        clusters = sorted(exact_clusters + near_clusters, key=lambda c: -c["size"])
+        return {
+            "rows_indexed": self.rows_indexed,
+            "distinct_rows": len(self.fingerprints),
+            "threshold": self.threshold,
+            "lsh": {"num_perm": self.num_perm, "bands": self.bands, "rows_per_band": self.rows_per_band},
+            "summary": {
+                "exact_clusters": len(exact_clusters),
+                "near_clusters": len(near_clusters),
+                "duplicate_rows": sum(c["size"] - 1 for c in exact_clusters),
+                "cross_sheet_clusters": sum(1 for c in clusters if c["scope"] != "within_sheet"),
+                "cross_file_clusters": sum(1 for c in clusters if c["scope"] == "cross_file"),
+            },
+            "clusters": clusters,
+        }
+
+    @staticmethod
+    def _describe_cluster(kind: str, locations: List[Tuple[str, str, int]], similarity: float) -> Dict[str, Any]:
+        files = {loc[0] for loc in locations}
+        sheets = {(loc[0], loc[1]) for loc in locations}
+        if len(files) > 1:
+            scope = "cross_file"
+        elif len(sheets) > 1:
+            scope = "cross_sheet"
+        else:
+            scope = "within_sheet"
+        return {
+            "kind": kind,
+            "scope": scope,
+            "size": len(locations),
+            "similarity": similarity,
+            "members": [{"file": f, "sheet": s, "row": r} for f, s, r in locations],
+        }
+
+class TemplateRegistry:
+    """Persistent registry of known workbook families
+
+    A workbook is fingerprinted by its sheet names, detected header rows and
+    header sets. Known templates are indexed by full signature and by sheet-name
+    signature so matching a new file is a dictionary lookup in the common case.
+    """
+
+    def __init__(self, registry_path: str = DEFAULT_TEMPLATE_REGISTRY):
+        self.registry_path = Path(registry_path)
+        self.templates: Dict[str, Dict[str, Any]] = {}
+        if self.registry_path.exists():
+            with open(self.registry_path, 'r', encoding='utf-8') as f:
+                self.templates = json.load(f).get("templates", {})
+        self._build_indexes()
+
+    def _build_indexes(self):
+        self._by_signature: Dict[str, str] = {}
+        self._by_sheet_signature: Dict[str, List[str]] = {}
+        for name, template in self.templates.items():
+            self._by_signature[template["signature"]] = name
+            self._by_sheet_signature.setdefault(template["sheet_signature"], []).append(name)
+
+    @staticmethod
+    def _digest(payload: Any) -> str:
+        return hashlib.blake2b(json.dumps(payload, sort_keys=True).encode("utf-8"), digest_size=8).hexdigest()
+
+    @classmethod
+    def fingerprint(cls, file_path: str) -> Dict[str, Any]:
+        """Compute the layout signature of a workbook from its leading rows only"""
+        wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            sheets = []
+            for ws in wb.worksheets:
+                header_row, headers = _detect_header_row(ws.iter_rows(max_row=HEADER_SCAN_ROWS, values_only=True))
+                sheets.append({"name": ws.title, "header_row": header_row, "headers": headers})
+        finally:
+            wb.close()
+
+        return {
+            "signature": cls._digest([[s["name"], s["header_row"], s["headers"]] for s in sheets]),
+            "sheet_signature": cls._digest(sorted(s["name"] for s in sheets)),
+            "sheets": sheets,
+        }
+
+    def register(self, name: str, file_path: str, purpose: Optional[str] = None,
+                 sheets: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Register (or replace) a template from an example workbook and persist the registry"""
+        fingerprint = self.fingerprint(file_path)
+        regions = [
+            {
+                "sheet": s["name"],
+                "header_row": s["header_row"],
+                "headers": _unique_headers(s["headers"]),
+            }
+            for s in fingerprint["sheets"]
+            if s["headers"] and (not sheets or s["name"] in sheets)
+        ]
+        template = {
+            "name": name,
+            "purpose": purpose,
+            "source_file": Path(file_path).name,
+            "registered": datetime.now().isoformat(),
+            "signature": fingerprint["signature"],
+            "sheet_signature": fingerprint["sheet_signature"],
+            "sheets": fingerprint["sheets"],
+            "regions": regions,
+        }
+        self.templates[name] = template
+        self._build_indexes()
+        self.save()
+        return template
+
+    def save(self):
+        """Write the registry to disk"""
+        with open(self.registry_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": 1, "templates": self.templates}, f, indent=2)
+
+    @staticmethod
+    def _header_similarity(template: Dict[str, Any], fingerprint: Dict[str, Any]) -> float:
+        """Average per-sheet Jaccard similarity of header sets over the union of sheet names"""
+        known = {s["name"]: set(filter(None, s["headers"])) for s in template["sheets"]}
+        seen = {s["name"]: set(filter(None, s["headers"])) for s in fingerprint["sheets"]}
+        names = set(known) | set(seen)
+        if not names:
+            return 0.0
+        total = 0.0
+        for name in names:
+            a, b = known.get(name), seen.get(name)
+            if a is None or b is None:
+                continue
+            total += len(a & b) / len(a | b) if a | b else 1.0
+        return total / len(names)
+
+    def match(self, file_path: str, min_score: float = 0.75,
+              fingerprint: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Match a workbook against the registry, returning the best template or None"""
+        fingerprint = fingerprint or self.fingerprint(file_path)
+
+        name = self._by_signature.get(fingerprint["signature"])
+        if name:
+            return {"template": self.templates[name], "match": "exact", "score": 1.0}
+
+        # Same sheet names but drifted headers: score only that bucket; otherwise fall back to a scan
+        candidates = self._by_sheet_signature.get(fingerprint["sheet_signature"])
+        match_kind = "sheet_names" if candidates else "similar"
+        best_name, best_score = None, 0.0
+        for name in candidates or self.templates:
+            score = self._header_similarity(self.templates[name], fingerprint)
+            if score > best_score:
+                best_name, best_score = name, score
+
+        if best_name is None or best_score < min_score:
+            return None
+        return {"template": self.templates[best_name], "match": match_kind, "score": round(best_score, 3)}
+
+    @staticmethod
+    def describe(matched: Dict[str, Any], fast_path: bool = False) -> Dict[str, Any]:
+        """Summarize a match() result for analysis output"""
+        return {
+            "name": matched["template"]["name"],
+            "purpose": matched["template"].get("purpose"),
+            "match": matched["match"],
+            "score": matched["score"],
+            "fast_path": fast_path
+        }
+
+    @staticmethod
+    def extract(file_path: str, template: Dict[str, Any]) -> Iterator[Tuple[str, int, Dict[str, Any]]]:
+        """Fast path: stream (sheet, row, record) from the template's known regions only"""
+        wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for region in template["regions"]:
+                if region["sheet"] not in wb.sheetnames:
+                    continue
+                ws = wb[region["sheet"]]
+                for row_idx, record in _iter_region_records(ws, region["header_row"], region["headers"]):
+                    yield region["sheet"], row_idx, record
+        finally:
+            wb.close()
+
+class SETLoaderExtractor:
+    """Single-pass extractor for SET Test Loader and BoSS 'Detail CUT' style sheets
+
+    Output follows the set_test_loader_data.json layout read by
+    src/components/set-import.tsx, so the field names match that file.
+    """
+
+    HEADER_MARKER = "Ref #"
+    END_MARKER = "END OF DETAIL SHEET"
+    SAMPLE_SIZE = 20
+
+    # (record field, column offset from the Ref # column)
+    FIELDS = [
+        ("ref_num", 0),
+        ("component", 1),
+        ("details", 2),
+        ("customer_ref", 3),
+        ("phase1_effort", 4),
+        ("scenario2_effort", 5),
+        ("scenario3_effort", 6),
+        ("template_effort", 7),
+    ]
+    GROUP_LABEL = "TAM Group Type"
+    ROW_TYPE_LABEL = "Row Type"
+
+    def __init__(self, file_path: str):
+        self.file_path = Path(file_path)
+        self.project_info: Dict[str, Any] = {}
+
+    def _locate_header(self, leading_rows: List[tuple]) -> Optional[int]:
+        """Return the 0-based index of the Ref # header row among the leading rows"""
+        for idx, values in enumerate(leading_rows):
+            if values and isinstance(values[0], str) and values[0].strip() == self.HEADER_MARKER:
+                return idx
+        return None
+
+    def find_sheets(self) -> List[str]:
+        """List the sheets laid out as SET loader detail sheets"""
+        wb = openpyxl.load_workbook(self.file_path, read_only=True, data_only=True)
+        try:
+            return [
+                ws.title for ws in wb.worksheets
+                if self._locate_header(list(ws.iter_rows(max_row=HEADER_SCAN_ROWS, values_only=True))) is not None
+            ]
+        finally:
+            wb.close()
+
+    def iter_components(self, sheet_name: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Stream component records from one SET sheet in a single pass
+
+        Uses the first recognised sheet when sheet_name is None. project_info is
+        populated before the first record is yielded. Raises ValueError when the
+        named sheet does not exist or is not a SET sheet, or when no sheet is.
+        """
+        wb = openpyxl.load_workbook(self.file_path, read_only=True, data_only=True)
+        try:
+            if sheet_name and sheet_name not in wb.sheetnames:
+                raise ValueError(f"Sheet '{sheet_name}' not found in {self.file_path.name}")
+            candidates = [wb[sheet_name]] if sheet_name else wb.worksheets
+            for ws in candidates:
+                rows = ws.iter_rows(values_only=True)
+                leading = []
+                for values in rows:
+                    leading.append(values)
+                    if len(leading) >= HEADER_SCAN_ROWS or self._locate_header(leading[-1:]) is not None:
+                        break
+                header_idx = self._locate_header(leading)
+                if header_idx is None:
+                    continue
+
+                width = len(leading[header_idx])
+                group_col = self._label_column(leading[:header_idx], self.GROUP_LABEL, 10)
+                row_type_col = self._label_column(leading[:header_idx], self.ROW_TYPE_LABEL, 12)
+                scenario_row = leading[header_idx - 1] if header_idx >= 1 else ()
+                self.project_info = {
+                    "title": leading[0][0] if header_idx > 0 else None,
+                    "scenario": scenario_row[0] if scenario_row else None,
+                    "total_effort": scenario_row[2] if len(scenario_row) > 2 else None,
+                    "total_effort_days": scenario_row[3] if len(scenario_row) > 3 else None,
+                    "sheet": ws.title,
+                }
+
+                for values in rows:
+                    if any(isinstance(v, str) and self.END_MARKER in v for v in values):
+                        break
+                    values = tuple(values) + (None,) * (width - len(values))
+                    if values[0] is None or values[1] is None:
+                        continue
+                    record = {field: values[offset] for field, offset in self.FIELDS}
+                    record["domain"] = values[group_col] if group_col < len(values) else None
+                    record["row_type"] = values[row_type_col] if row_type_col < len(values) else None
+                    yield record
+                return
+            if sheet_name:
+                raise ValueError(f"Sheet '{sheet_name}' is not a SET Test Loader sheet (no '{self.HEADER_MARKER}' header row)")
+            raise ValueError(f"No SET Test Loader sheet found in {self.file_path.name}")
+        finally:
+            wb.close()
+
+    @staticmethod
+    def _label_column(rows: List[tuple], label: str, default: int) -> int:
+        """Find the column carrying a label in the rows above the header"""
+        for values in rows:
+            for col, value in enumerate(values):
+                if isinstance(value, str) and value.strip() == label:
+                    return col
+        return default
+
+    def extract(self, sheet_name: Optional[str] = None) -> Dict[str, Any]:
+        """Build the full set_test_loader_data.json structure"""
+        components = []
+        domains: Dict[str, Dict[str, Any]] = {}
+        for record in self.iter_components(sheet_name):
+            components.append(record)
+            domain = domains.setdefault(record["domain"], {"count": 0, "effort": 0})
+            domain["count"] += 1
+            if isinstance(record["phase1_effort"], (int, float)):
+                domain["effort"] += record["phase1_effort"]
+
+        return {
+            "project_info": self.project_info,
+            "components": components,
+            "domains": domains,
+            "sample_data": [
+                {
+                    "Reference": c["ref_num"],
+                    "Component": c["component"],
+                    "Phase1_Effort": c["phase1_effort"],
+                    "Details": c["details"] or "",
+                }
+                for c in components[:self.SAMPLE_SIZE]
+            ],
+        }
+
+class BulkLoader:
+    """Chunked, idempotent loader from analyzed workbooks into the excel_rows tables
+
+    Rows are keyed by (file hash, sheet, row) so reloading the same file is a no-op,
+    and every committed chunk is recorded so an interrupted load resumes where it
+    stopped. Only a load of every sheet marks a file completed; loads of selected
+    sheets mark it partial, so a later load still reads the sheets they left out. PostgreSQL targets COPY each chunk into a temporary table and upsert it
+    in one statement; SQLite targets (for local testing) use executemany upserts.
+    """
+
+    SCHEMA = {
+        "postgresql": [
+            """CREATE TABLE IF NOT EXISTS excel_load_files (
+                file_sha TEXT PRIMARY KEY,
+                file_name TEXT NOT NULL,
+                status TEXT NOT NULL,
+                row_count INTEGER DEFAULT 0,
+                started_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                completed_at TIMESTAMP WITH TIME ZONE
+            )""",
+            """CREATE TABLE IF NOT EXISTS excel_rows (
+                file_sha TEXT NOT NULL,
+                sheet_name TEXT NOT NULL,
+                row_number INTEGER NOT NULL,
+                data JSONB NOT NULL,
+                loaded_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                PRIMARY KEY (file_sha, sheet_name, row_number)
+            )""",
+            """CREATE TABLE IF NOT EXISTS excel_load_chunks (
+                file_sha TEXT NOT NULL,
+                sheet_name TEXT NOT NULL,
+                first_row INTEGER NOT NULL,
+                last_row INTEGER NOT NULL,
+                row_count INTEGER NOT NULL,
+                loaded_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+                PRIMARY KEY (file_sha, sheet_name, first_row, last_row)
+            )""",
+        ],
+        "sqlite": [
+            """CREATE TABLE IF NOT EXISTS excel_load_files (
+                file_sha TEXT PRIMARY KEY,
+                file_name TEXT NOT NULL,
+                status TEXT NOT NULL,
+                row_count INTEGER DEFAULT 0,
+                started_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                completed_at TEXT
+            )""",
+            """CREATE TABLE IF NOT EXISTS excel_rows (
+                file_sha TEXT NOT NULL,
+                sheet_name TEXT NOT NULL,
+                row_number INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                loaded_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (file_sha, sheet_name, row_number)
+            )""",
+            """CREATE TABLE IF NOT EXISTS excel_load_chunks (
+                file_sha TEXT NOT NULL,
+                sheet_name TEXT NOT NULL,
+                first_row INTEGER NOT NULL,
+                last_row INTEGER NOT NULL,
+                row_count INTEGER NOT NULL,
+                loaded_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (file_sha, sheet_name, first_row, last_row)
+            )""",
+        ],
+    }
+
+    def __init__(self, database_url: str, chunk_size: int = 5000, workers: int = 4):
+        if database_url.startswith(("postgres://", "postgresql://")):
+            self.dialect = "postgresql"
+        elif database_url.startswith("sqlite:///"):
+            self.dialect = "sqlite"
+        else:
+            raise ValueError("Database URL must start with postgresql:// or sqlite:///")
+
+        self.database_url = database_url
+        self.chunk_size = max(1, chunk_size)
+        self.workers = max(1, workers)
+        self._pool: "queue.LifoQueue" = queue.LifoQueue()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _sql(self, statement: str) -> str:
+        """Swap the ? placeholders used below for the driver's parameter style"""
+        return statement.replace("?", "%s") if self.dialect == "postgresql" else statement
+
+    def _connect(self):
+        if self.dialect == "sqlite":
+            conn = sqlite3.connect(self.database_url[len("sqlite:///"):], timeout=60, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            return conn
+        try:
+            import psycopg2
+        except ImportError:
+            raise RuntimeError("PostgreSQL targets require psycopg2 (pip install psycopg2-binary)")
+        return psycopg2.connect(self.database_url)
+
+    @contextmanager
+    def _connection(self):
+        """Borrow a pooled connection for one transaction"""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+            with self._connections_lock:
+                self._connections.append(conn)
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        """Close every pooled connection"""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._pool = queue.LifoQueue()
+
+    def ensure_schema(self):
+        """Create the loader tables when they do not exist yet"""
+        if self._schema_ready:
+            return
+        with self._connection() as conn:
+            cur = conn.cursor()
+            for statement in self.SCHEMA[self.dialect]:
+                cur.execute(statement)
+        self._schema_ready = True
+
+    @staticmethod
+    def file_digest(file_path: str) -> str:
+        """SHA-256 of the file contents, used as the load identity"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def load(self, file_path: str, sheets: Optional[List[str]] = None, force: bool = False) -> Dict[str, Any]:
+        """Load every data row of a workbook (or of the given sheets), skipping chunks committed by earlier runs"""
+        started = time.perf_counter()
+        self.ensure_schema()
+        file_sha = self.file_digest(file_path)
+        stats = {
+            "file_name": Path(file_path).name,
+            "file_sha": file_sha,
+            "status": "completed",
+            "rows_loaded": 0,
+            "rows_skipped": 0,
+            "chunks_loaded": 0,
+            "chunks_skipped": 0,
+        }
+
+        with self._connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self._sql("SELECT status FROM excel_load_files WHERE file_sha = ?"), (file_sha,))
+            existing = cur.fetchone()
+            if existing and existing[0] == "completed" and not force:
+                stats["status"] = "skipped"
+                stats["seconds"] = round(time.perf_counter() - started, 3)
+                return stats
+
+            cur.execute(self._sql(
+                "INSERT INTO excel_load_files (file_sha, file_name, status) VALUES (?, ?, 'loading') "
+                "ON CONFLICT (file_sha) DO UPDATE SET status = 'loading', completed_at = NULL"
+            ), (file_sha, stats["file_name"]))
+
+            done = set()
+            if not force:
+                cur.execute(self._sql(
+                    "SELECT sheet_name, first_row, last_row FROM excel_load_chunks WHERE file_sha = ?"
+                ), (file_sha,))
+                done = {tuple(row) for row in cur.fetchall()}
+
+        in_flight = deque()
+
+        def flush(sheet_name, rows):
+            key = (sheet_name, rows[0][0], rows[-1][0])
+            if key in done:
+                stats["chunks_skipped"] += 1
+                stats["rows_skipped"] += len(rows)
+                return
+            # Keep at most two chunks per worker buffered so memory stays bounded
+            while len(in_flight) >= self.workers * 2:
+                in_flight.popleft().result()
+            in_flight.append(executor.submit(self._write_chunk, file_sha, sheet_name, rows))
+            stats["chunks_loaded"] += 1
+            stats["rows_loaded"] += len(rows)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            current_sheet, buffer = None, []
+            for sheet_name, row_idx, record in ExcelAnalyzer(file_path).iter_records(sheets):
+                if buffer and (sheet_name != current_sheet or len(buffer) >= self.chunk_size):
+                    flush(current_sheet, buffer)
+                    buffer = []
+                current_sheet = sheet_name
+                buffer.append((row_idx, json.dumps(record, default=str)))
+            if buffer:
+                flush(current_sheet, buffer)
+            while in_flight:
+                in_flight.popleft().result()
+
+        with self._connection() as conn:
+            conn.cursor().execute(self._sql(
+                "UPDATE excel_load_files SET status = ?, completed_at = CURRENT_TIMESTAMP, "
+                "row_count = (SELECT COUNT(*) FROM excel_rows WHERE file_sha = ?) WHERE file_sha = ?"
+            ), ("completed" if sheets is None else "partial", file_sha, file_sha))
+
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        return stats
+
+    def _write_chunk(self, file_sha: str, sheet_name: str, rows: List[Tuple[int, str]]):
+        """Upsert one chunk and record it as committed in the same transaction"""
+        with self._connection() as conn:
+            cur = conn.cursor()
+            if self.dialect == "postgresql":
+                cur.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS excel_rows_incoming "
+                    "(file_sha TEXT, sheet_name TEXT, row_number INTEGER, data JSONB) ON COMMIT DELETE ROWS"
+                )
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows((file_sha, sheet_name, row_idx, data) for row_idx, data in rows)
+                buffer.seek(0)
+                cur.copy_expert(
+                    "COPY excel_rows_incoming (file_sha, sheet_name, row_number, data) FROM STDIN WITH (FORMAT csv)",
+                    buffer
+                )
+                cur.execute(
+                    "INSERT INTO excel_rows (file_sha, sheet_name, row_number, data) "
+                    "SELECT file_sha, sheet_name, row_number, data FROM excel_rows_incoming "
+                    "ON CONFLICT (file_sha, sheet_name, row_number) "
+                    "DO UPDATE SET data = EXCLUDED.data, loaded_at = CURRENT_TIMESTAMP"
+                )
+            else:
+                cur.executemany(
+                    "INSERT INTO excel_rows (file_sha, sheet_name, row_number, data) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (file_sha, sheet_name, row_number) "
+                    "DO UPDATE SET data = excluded.data, loaded_at = CURRENT_TIMESTAMP",
+                    [(file_sha, sheet_name, row_idx, data) for row_idx, data in rows]
+                )
+            cur.execute(self._sql(
+                "INSERT INTO excel_load_chunks (file_sha, sheet_name, first_row, last_row, row_count) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT DO NOTHING"
+            ), (file_sha, sheet_name, rows[0][0], rows[-1][0], len(rows)))
+
+class ColumnarSheet:
+    """Column-oriented copy of one sheet with hash and sorted indexes
+
+    Numeric columns are stored as float64 arrays (NaN for blanks); other columns
+    are object arrays with a hash index mapping each value to its row positions.
+    Any column holding numbers also gets a sorted index over its numeric values,
+    so range filters and aggregates work on mixed text/number columns too.
+    """
+
+    OPERATORS = ("==", "!=", ">=", "<=", "=", ">", "<")
+    AGGREGATES = ("sum", "mean", "min", "max", "count")
+
+    def __init__(self, name: str, row_numbers: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.name = name
+        self.row_numbers = row_numbers
+        self.columns = columns
+        self.hash_indexes: Dict[str, Dict[Any, np.ndarray]] = {}
+        self.sorted_indexes: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def from_records(cls, name: str, rows: List[Tuple[int, Dict[str, Any]]]) -> "ColumnarSheet":
+        headers = list(rows[0][1]) if rows else []
+        columns = {}
+        for header in headers:
+            values = [record.get(header) for _, record in rows]
+            numeric = all(v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in values)
+            if numeric and any(v is not None for v in values):
+                columns[header] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            else:
+                columns[header] = np.array(values, dtype=object)
+        return cls(name, np.array([row for row, _ in rows], dtype=np.int64), columns)
+
+    def __len__(self) -> int:
+        return len(self.row_numbers)
+
+    def to_state(self) -> Dict[str, Any]:
+        """Plain-data form used for persistence"""
+        return {
+            "name": self.name,
+            "row_numbers": self.row_numbers,
+            "columns": self.columns,
+            "hash_indexes": self.hash_indexes,
+            "sorted_indexes": self.sorted_indexes,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "ColumnarSheet":
+        table = cls(state["name"], state["row_numbers"], state["columns"])
+        table.hash_indexes = state["hash_indexes"]
+        table.sorted_indexes = state["sorted_indexes"]
+        return table
+
+    def _check_columns(self, columns: List[str]):
+        """Raise ValueError naming any column the sheet does not have"""
+        unknown = [column for column in columns if column not in self.columns]
+        if unknown:
+            raise ValueError(f"Unknown column{'s' if len(unknown) > 1 else ''} "
+                             f"{', '.join(repr(c) for c in unknown)} in sheet '{self.name}'")
+
+    def is_numeric(self, column: str) -> bool:
+        return self.columns[column].dtype == np.float64
+
+    def numeric_values(self, column: str) -> np.ndarray:
+        """Column as float64, with blanks and non-numeric cells as NaN"""
+        values = self.columns[column]
+        if self.is_numeric(column):
+            return values
+        return np.array([
+            v if isinstance(v, (int, float)) and not isinstance(v, bool) else np.nan for v in values
+        ], dtype=np.float64)
+
+    def build_indexes(self, columns: Optional[List[str]] = None):
+        """Index the given columns, or every column when None"""
+        for column in columns or list(self.columns):
+            if column not in self.columns:
+                continue
+            numbers = self.numeric_values(column)
+            present = np.flatnonzero(~np.isnan(numbers))
+            if len(present):
+                order = present[np.argsort(numbers[present], kind="stable")]
+                self.sorted_indexes[column] = (numbers[order], order)
+            if not self.is_numeric(column):
+                positions: Dict[Any, List[int]] = {}
+                for pos, value in enumerate(self.columns[column]):
+                    if value is not None:
+                        positions.setdefault(value, []).append(pos)
+                self.hash_indexes[column] = {k: np.array(v, dtype=np.int64) for k, v in positions.items()}
+
+    def _coerce(self, column: str, value: Any, op: str) -> Any:
+        """Turn CLI strings into numbers where the comparison needs them"""
+        if isinstance(value, str) and (self.is_numeric(column) or op not in ("=", "==", "!=")):
+            try:
+                return float(value)
+            except ValueError:
+                raise ValueError(f"'{value}' is not a number (condition on '{column}' with {op})")
+        return value
+
+    def _positions(self, column: str, op: str, value: Any) -> np.ndarray:
+        """Row positions matching a single condition, using an index when one exists"""
+        self._check_columns([column])
+        value = self._coerce(column, value, op)
+        op = "==" if op == "=" else op
+
+        if op in ("==", "!=") and not self.is_numeric(column):
+            matches = self._equal_positions(column, value)
+            if op == "==":
+                return matches
+            return np.setdiff1d(np.arange(len(self), dtype=np.int64), matches, assume_unique=True)
+        if column in self.sorted_indexes and op != "!=":
+            keys, order = self.sorted_indexes[column]
+            if op == "==":
+                lo, hi = np.searchsorted(keys, value, "left"), np.searchsorted(keys, value, "right")
+            elif op == ">":
+                lo, hi = np.searchsorted(keys, value, "right"), len(keys)
+            elif op == ">=":
+                lo, hi = np.searchsorted(keys, value, "left"), len(keys)
+            elif op == "<":
+                lo, hi = 0, np.searchsorted(keys, value, "left")
+            else:
+                lo, hi = 0, np.searchsorted(keys, value, "right")
+            return np.sort(order[lo:hi])
+
+        # No usable index: vectorised scan over the column
+        if op in ("==", "!="):
+            mask = self.columns[column] == value
+            return np.flatnonzero(mask if op == "==" else ~mask)
+        compare = {">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal}[op]
+        return np.flatnonzero(compare(self.numeric_values(column), float(value)))
+
+    def _equal_positions(self, column: str, value: Any) -> np.ndarray:
+        """Rows of a text or mixed column equal to value, matching numeric cells for numeric strings"""
+        if column in self.hash_indexes:
+            matches = self.hash_indexes[column].get(value, np.empty(0, dtype=np.int64))
+        else:
+            matches = np.flatnonzero(self.columns[column] == value)
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return matches
+        return np.union1d(matches, np.flatnonzero(self.numeric_values(column) == number))
+
+    def filter(self, conditions: List[Tuple[str, str, Any]]) -> np.ndarray:
+        """Intersect the row positions matching every (column, operator, value) condition"""
+        result = None
+        for column, op, value in conditions:
+            positions = self._positions(column, op, value)
+            result = positions if result is None else np.intersect1d(result, positions, assume_unique=True)
+            if not len(result):
+                break
+        return np.arange(len(self), dtype=np.int64) if result is None else result
+
+    def lookup(self, column: str, value: Any) -> List[Dict[str, Any]]:
+        """All records whose column equals value"""
+        return self.records(self._positions(column, "==", value))
+
+    def aggregate(self, column: str, func: str, positions: Optional[np.ndarray] = None) -> Any:
+        """sum, mean, min, max or count of a column over the given rows (all rows when None)"""
+        if func not in self.AGGREGATES:
+            raise ValueError(f"Unknown aggregate '{func}' (expected one of {', '.join(self.AGGREGATES)})")
+        self._check_columns([column])
+        if func == "count":
+            values = self.columns[column] if positions is None else self.columns[column][positions]
+            if self.is_numeric(column):
+                return int(np.count_nonzero(~np.isnan(values)))
+            return int(sum(1 for v in values if v is not None))
+        values = self.numeric_values(column)
+        if positions is not None:
+            values = values[positions]
+        if not np.count_nonzero(~np.isnan(values)):
+            return None
+        return float({"sum": np.nansum, "mean": np.nanmean, "min": np.nanmin, "max": np.nanmax}[func](values))
+
+    def records(self, positions: np.ndarray, columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Materialise rows as dicts, with the source row number under '_row'"""
+        columns = columns or list(self.columns)
+        self._check_columns(columns)
+        records = []
+        for pos in positions:
+            record = {"_row": int(self.row_numbers[pos])}
+            for column in columns:
+                value = self.columns[column][pos]
+                if isinstance(value, float) and np.isnan(value):
+                    value = None
+                record[column] = value.item() if isinstance(value, np.generic) else value
+            records.append(record)
+        return records
+
+    @classmethod
+    def parse_condition(cls, expression: str) -> Tuple[str, str, str]:
+        """Split 'Column>=value' style CLI expressions into (column, operator, value)"""
+        for op in cls.OPERATORS:
+            column, sep, value = expression.partition(op)
+            if sep:
+                return column.strip(), op, value.strip()
+        raise ValueError(f"Cannot parse condition '{expression}'")
+
+    @classmethod
+    def parse_aggregate(cls, expression: str) -> Tuple[str, str]:
+        """Split a 'func:column' CLI aggregate such as 'sum:Cost' into (func, column)"""
+        func, sep, column = expression.partition(":")
+        func, column = func.strip().lower(), column.strip()
+        if not sep or not func or not column:
+            raise ValueError(f"Cannot parse aggregate '{expression}' (expected func:column, e.g. sum:Cost)")
+        if func not in cls.AGGREGATES:
+            raise ValueError(f"Unknown aggregate '{func}' (expected one of {', '.join(cls.AGGREGATES)})")
+        return func, column
+
+class QueryStore:
+    """Per-sheet columnar stores persisted beside an analysis for fast repeated queries
+
+    The store directory holds a manifest plus one pickle per sheet, so a query
+    loads only the sheet it touches and never reopens the workbook. The manifest
+    records the source size and mtime; a changed workbook makes the store stale.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, store_dir: str):
+        self.store_dir = Path(store_dir)
+        with open(self.store_dir / self.MANIFEST, 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self._sheets: Dict[str, ColumnarSheet] = {}
+
+    @staticmethod
+    def default_dir(file_path: str, output_dir: str = '.') -> Path:
+        return Path(output_dir) / f"{Path(file_path).stem}_query"
+
+    @classmethod
+    def build(cls, file_path: str, store_dir: Optional[str] = None,
+              index_columns: Optional[List[str]] = None) -> "QueryStore":
+        """Extract every sheet once and persist its columns and indexes
+
+        index_columns restricts indexing to those column names (all columns when None).
+        """
+        store_dir = Path(store_dir) if store_dir else cls.default_dir(file_path)
+        store_dir.mkdir(parents=True, exist_ok=True)
+
+        by_sheet: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+        for sheet_name, row_idx, record in ExcelAnalyzer(file_path).iter_records():
+            by_sheet.setdefault(sheet_name, []).append((row_idx, record))
+
+        stat = Path(file_path).stat()
+        manifest = {
+            "source_file": str(Path(file_path).resolve()),
+            "source_size": stat.st_size,
+            "source_mtime_ns": stat.st_mtime_ns,
+            "built": datetime.now().isoformat(),
+            "sheets": {},
+        }
+        for idx, (sheet_name, rows) in enumerate(by_sheet.items()):
+            table = ColumnarSheet.from_records(sheet_name, rows)
+            table.build_indexes(index_columns)
+            part = f"sheet_{idx}.pkl"
+            with open(store_dir / part, 'wb') as f:
+                pickle.dump(table.to_state(), f, protocol=pickle.HIGHEST_PROTOCOL)
+            manifest["sheets"][sheet_name] = {
+                "file": part,
+                "rows": len(table),
+                "columns": list(table.columns),
+                "hash_indexes": list(table.hash_indexes),
+                "sorted_indexes": list(table.sorted_indexes),
+                "indexed": [c for c in table.columns if not index_columns or c in index_columns],
+            }
+
+        with open(store_dir / cls.MANIFEST, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        return cls(str(store_dir))
+
+    @classmethod
+    def open_or_build(cls, file_path: str, store_dir: Optional[str] = None,
+                      index_columns: Optional[List[str]] = None) -> "QueryStore":
+        """Reuse a persisted store unless it is missing or the workbook has changed
+
+        A reused store gets any of index_columns it does not have indexed yet.
+        """
+        store_dir = Path(store_dir) if store_dir else cls.default_dir(file_path)
+        if (store_dir / cls.MANIFEST).exists():
+            store = cls(str(store_dir))
+            if not store.is_stale():
+                if index_columns is not None:
+                    store.ensure_indexes(index_columns)
+                return store
+        return cls.build(file_path, str(store_dir), index_columns)
+
+    def ensure_indexes(self, index_columns: List[str]) -> List[Tuple[str, str]]:
+        """Index the given columns (every column when empty) wherever they are not indexed yet
+
+        Only the sheets that gain an index are rewritten. Returns the (sheet, column)
+        pairs that were added.
+        """
+        added = []
+        for sheet_name, entry in self.manifest["sheets"].items():
+            # Stores built before "indexed" was recorded list their indexes only
+            indexed = set(entry.get("indexed", entry["hash_indexes"] + entry["sorted_indexes"]))
+            wanted = [c for c in (index_columns or entry["columns"]) if c in entry["columns"]]
+            missing = [c for c in wanted if c not in indexed]
+            if not missing:
+                continue
+            table = self.sheet(sheet_name)
+            table.build_indexes(missing)
+            with open(self.store_dir / entry["file"], 'wb') as f:
+                pickle.dump(table.to_state(), f, protocol=pickle.HIGHEST_PROTOCOL)
+            entry.update({
+                "hash_indexes": list(table.hash_indexes),
+                "sorted_indexes": list(table.sorted_indexes),
+                "indexed": sorted(indexed | set(missing), key=entry["columns"].index),
+            })
+            added.extend((sheet_name, column) for column in missing)
+        if added:
+            with open(self.store_dir / self.MANIFEST, 'w', encoding='utf-8') as f:
+                json.dump(self.manifest, f, indent=2)
+        return added
+
+    def is_stale(self) -> bool:
+        source = Path(self.manifest["source_file"])
+        if not source.exists():
+            return False
+        stat = source.stat()
+        return (stat.st_size, stat.st_mtime_ns) != (self.manifest["source_size"], self.manifest["source_mtime_ns"])
+
+    def sheet(self, name: str) -> ColumnarSheet:
+        """Load (and cache) the columnar store for one sheet"""
+        if name not in self._sheets:
+            entry = self.manifest["sheets"].get(name)
+            if entry is None:
+                raise ValueError(f"Sheet '{name}' is not in the query store")
+            with open(self.store_dir / entry["file"], 'rb') as f:
+                self._sheets[name] = ColumnarSheet.from_state(pickle.load(f))
+        return self._sheets[name]
+
+    def query(self, sheet_name: str, where: Optional[List[Tuple[str, str, Any]]] = None,
+              columns: Optional[List[str]] = None, aggregate: Optional[Tuple[str, str]] = None,
+              limit: Optional[int] = None) -> Dict[str, Any]:
+        """Filter a sheet and either return matching rows or a (func, column) aggregate"""
+        table = self.sheet(sheet_name)
+        positions = table.filter(where or [])
+        result = {"sheet": sheet_name, "matched": int(len(positions))}
+        if aggregate:
+            func, column = aggregate
+            result[f"{func}({column})"] = table.aggregate(column, func, positions)
+        else:
+            result["rows"] = table.records(positions[:limit] if limit else positions, columns)
+        return result
+
+class WorkbookWatcher:
+    """Poll a directory and refresh analysis reports as workbooks are saved
+
+    A save is processed once the file's size and mtime have been stable for the
+    debounce interval. Zip part checksums from the previous run identify which
+    worksheets changed, and only those are re-analyzed. A change to the sheet
+    list, styles or any other shared part, or shared strings that were edited
+    rather than appended to, falls back to a full analysis.
+    """
+
+    def __init__(self, directory: str, output_dir: str, output_format: str = 'both',
+                 interval: float = 0.25, debounce: float = 0.5,
+                 include_vba: bool = True, include_formatting: bool = True,
+                 budget: Optional[SamplingBudget] = None):
+        self.directory = Path(directory)
+        self.output_dir = Path(output_dir)
+        self.output_format = output_format
+        self.interval = interval
+        self.debounce = debounce
+        self.include_vba = include_vba
+        self.include_formatting = include_formatting
+        self.budget = budget
+        self._processed: Dict[Path, Tuple[int, int]] = {}
+        self._pending: Dict[Path, Tuple[Tuple[int, int], float]] = {}
+        # path -> (part checksums, sheet parts and shared-string digests, analysis results) from the last run
+        self._state: Dict[Path, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        found = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.startswith("~$") or Path(entry.name).suffix.lower() not in ('.xlsx', '.xlsm'):
+                    continue
+                stat = entry.stat()
+                found[Path(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+        return found
+
+    def poll_once(self) -> List[Path]:
+        """Check the directory once, refreshing every workbook whose save has settled"""
+        now = time.monotonic()
+        current = self._scan()
+
+        for path in set(self._processed) - set(current):
+            self._processed.pop(path, None)
+            self._state.pop(path, None)
+
+        refreshed = []
+        for path, signature in current.items():
+            if self._processed.get(path) == signature:
+                self._pending.pop(path, None)
+                continue
+            pending = self._pending.get(path)
+            if pending is None or pending[0] != signature:
+                self._pending[path] = (signature, now)
+                continue
+            if now - pending[1] < self.debounce:
+                continue
+            try:
+                self.refresh(path)
+            except (zipfile.BadZipFile, KeyError, OSError) as e:
+                # Usually a save still in progress; try again on the next change
+                print(f"⚠️  Skipping {path.name}: {e}")
+            self._processed[path] = signature
+            self._pending.pop(path, None)
+            refreshed.append(path)
+        return refreshed
+
+    def refresh(self, path: Path) -> Dict[str, Any]:
+        """Analyze a workbook, incrementally when a previous run is available"""
+        started = time.perf_counter()
+        checksums = _zip_part_checksums(path)
+        sheet_parts = _sheet_parts(path)
+        analyzer = ExcelAnalyzer(str(path), budget=self.budget)
+
+        previous = self._state.get(path)
+        base = previous[0] if previous else None
+        sst_changed = base is None or \
+            checksums.get("xl/sharedStrings.xml") != base["checksums"].get("xl/sharedStrings.xml")
+        sst_digests = _shared_string_digests(path) if sst_changed else base["sst_digests"]
+        changed_sheets = _changed_since(base, checksums, sheet_parts, sst_digests)
+
+        if changed_sheets is None:
+            print(f"🔍 {path.name}: full analysis")
+            results = analyzer.analyze(self.include_vba, self.include_formatting)
+        else:
+            print(f"🔍 {path.name}: re-analyzing {', '.join(changed_sheets) or 'workbook metadata'}")
+            results = analyzer.analyze_incremental(
+                previous[1], changed_sheets, self.include_vba, self.include_formatting,
+                rerun_vba=checksums.get("xl/vbaProject.bin") != base["checksums"].get("xl/vbaProject.bin")
+            )
+
+        self._state[path] = ({"checksums": checksums, "sheet_parts": sheet_parts, "sst_digests": sst_digests},
+                             results)
+        for report in _write_reports(results, self.output_dir, path.stem, self.output_format):
+            print(f"   📄 Updated {report}")
+        print(f"   ⏱️  {time.perf_counter() - started:.2f}s")
+        return results
+
+    def run(self):
+        """Analyze every workbook once, then watch for saves until interrupted"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        for path, signature in self._scan().items():
+            self.refresh(path)
+            self._processed[path] = signature
+        print(f"👀 Watching {self.directory} (Ctrl+C to stop)")
+        try:
+            while True:
+                self.poll_once()
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            print("\n👋 Stopped watching")
+
+class HistoryStore:
+    """Version history of one workbook family, stored as a full base snapshot plus row-level deltas
+
+    Each version records only the rows that differ from the version before it and
+    a path-level diff of its analysis JSON. A head file keeps the part checksums,
+    per-row digests and latest analysis, so ingesting a new version re-reads and
+    re-analyzes only the sheets whose worksheet parts changed. The checksums the
+    latest analysis was built from are kept separately, since versions ingested
+    without analysis move the row state on but not the analysis.
+    """
+
+    MANIFEST = "manifest.json"
+    HEAD = "head.pkl"
+
+    def __init__(self, store_dir: str):
+        self.store_dir = Path(store_dir)
+        manifest_file = self.store_dir / self.MANIFEST
+        if manifest_file.exists():
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"created": datetime.now().isoformat(), "versions": []}
+
+    @property
+    def versions(self) -> List[Dict[str, Any]]:
+        return self.manifest["versions"]
+
+    @staticmethod
+    def _write_blob(path: Path, data: Any):
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, 'wb') as f:
+            f.write(zlib.compress(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL), 6))
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _read_blob(path: Path) -> Any:
+        with open(path, 'rb') as f:
+            return pickle.loads(zlib.decompress(f.read()))
+
+    @staticmethod
+    def _row_digest(values) -> bytes:
+        return hashlib.blake2b(repr(values).encode('utf-8'), digest_size=8).digest()
+
+    @staticmethod
+    def _read_sheet_rows(file_path, sheets: List[str]) -> Dict[str, Dict[int, tuple]]:
+        """Cell values of the non-empty rows of the given sheets, trailing blanks trimmed"""
+        rows: Dict[str, Dict[int, tuple]] = {}
+        wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for sheet_name in sheets:
+                if sheet_name not in wb.sheetnames:
+                    continue
+                sheet_rows = rows[sheet_name] = {}
+                for row_idx, values in enumerate(wb[sheet_name].iter_rows(values_only=True), start=1):
+                    values = list(values)
+                    while values and values[-1] is None:
+                        values.pop()
+                    if values:
+                        sheet_rows[row_idx] = tuple(values)
+        finally:
+            wb.close()
+        return rows
+
+    @classmethod
+    def _json_delta(cls, old: Any, new: Any, path: Tuple = ()) -> Tuple[List[Tuple[Tuple, Any]], List[Tuple]]:
+        """Paths set and deleted to turn one JSON document into another (lists are compared whole)"""
+        if not (isinstance(old, dict) and isinstance(new, dict)):
+            return ([] if old == new else [(path, new)]), []
+        changes, deletions = [], [path + (key,) for key in old if key not in new]
+        for key, value in new.items():
+            if key not in old:
+                changes.append((path + (key,), value))
+            else:
+                sub_changes, sub_deletions = cls._json_delta(old[key], value, path + (key,))
+                changes.extend(sub_changes)
+                deletions.extend(sub_deletions)
+        return changes, deletions
+
+    @staticmethod
+    def _apply_json_delta(document: Any, changes, deletions) -> Any:
+        for path in deletions:
+            target = document
+            for key in path[:-1]:
+                target = target[key]
+            target.pop(path[-1], None)
+        for path, value in changes:
+            if not path:
+                document = value
+                continue
+            target = document
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = value
+        return document
+
+    def ingest(self, file_path: str, label: Optional[str] = None, analyze: bool = True,
+               include_vba: bool = True, include_formatting: bool = True) -> Dict[str, Any]:
+        """Add a workbook as the next version and return its manifest entry"""
+        started = time.perf_counter()
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        checksums = _zip_part_checksums(file_path)
+        sheet_parts = _sheet_parts(file_path)
+        head = self._read_blob(self.store_dir / self.HEAD) if self.versions else None
+
+        # Sheets to re-read: only those whose parts changed since the previous version
+        sst_changed = head is None or \
+            checksums.get("xl/sharedStrings.xml") != head["checksums"].get("xl/sharedStrings.xml")
+        sst_digests = _shared_string_digests(file_path) if sst_changed else head["sst_digests"]
+        changed_sheets = _changed_since(head, checksums, sheet_parts, sst_digests)
+        read_sheets = list(sheet_parts) if changed_sheets is None else changed_sheets
+
+        row_digests = dict(head["row_digests"]) if head else {}
+        delta: Dict[str, Any] = {"sheets": {}, "removed_sheets": [name for name in row_digests
+                                                                    if name not in sheet_parts]}
+        for name in delta["removed_sheets"]:
+            del row_digests[name]
+        rows_set = rows_deleted = 0
+        for sheet_name, rows in self._read_sheet_rows(file_path, read_sheets).items():
+            old = row_digests.get(sheet_name)
+            digests = {row_idx: self._row_digest(values) for row_idx, values in rows.items()}
+            if old is None:
+                sheet_delta = {"full": True, "set": rows, "delete": []}
+            else:
+                sheet_delta = {
+                    "full": False,
+                    "set": {row_idx: rows[row_idx] for row_idx, digest in digests.items() if old.get(row_idx) != digest},
+                    "delete": sorted(row_idx for row_idx in old if row_idx not in digests),
+                }
+            row_digests[sheet_name] = digests
+            if sheet_delta["full"] or sheet_delta["set"] or sheet_delta["delete"]:
+                delta["sheets"][sheet_name] = sheet_delta
+                rows_set += len(sheet_delta["set"])
+                rows_deleted += len(sheet_delta["delete"])
+
+        # The analysis is diffed against the version it was last built from, which is not the
+        # previous version when that one was ingested without analysis
+        analysis = head["analysis"] if head else None
+        analysis_base = head.get("analysis_base") if head else None
+        if analyze:
+            analyzer = ExcelAnalyzer(file_path)
+            analysis_changed = _changed_since(analysis_base, checksums, sheet_parts, sst_digests)
+            if analysis is None or analysis_changed is None:
+                results = analyzer.analyze(include_vba, include_formatting)
+            else:
+                results = analyzer.analyze_incremental(
+                    analysis, analysis_changed, include_vba, include_formatting,
+                    rerun_vba=checksums.get("xl/vbaProject.bin") != analysis_base["checksums"].get("xl/vbaProject.bin"))
+            results = json.loads(json.dumps(results, default=str))
+            if analysis is None:
+                delta["analysis"] = {"full": results}
+            else:
+                changes, deletions = self._json_delta(analysis, results)
+                delta["analysis"] = {"set": changes, "delete": deletions}
+            analysis = results
+            analysis_base = {"checksums": checksums, "sheet_parts": sheet_parts, "sst_digests": sst_digests}
+
+        version = len(self.versions) + 1
+        blob = f"v{version:04d}.delta"
+        self._write_blob(self.store_dir / blob, delta)
+        self._write_blob(self.store_dir / self.HEAD, {
+            "checksums": checksums, "sheet_parts": sheet_parts, "sst_digests": sst_digests,
+            "row_digests": row_digests, "analysis": analysis, "analysis_base": analysis_base,
+        })
+
+        entry = {
+            "version": version,
+            "label": label or Path(file_path).name,
+            "source_file": str(Path(file_path).resolve()),
+            "ingested": datetime.now().isoformat(),
+            "file": blob,
+            "stored_bytes": (self.store_dir / blob).stat().st_size,
+            "sheets_read": len(read_sheets),
+            "changed_sheets": sorted(delta["sheets"]),
+            "removed_sheets": delta["removed_sheets"],
+            "rows_set": rows_set,
+            "rows_deleted": rows_deleted,
+            "has_analysis": "analysis" in delta,
+            "seconds": round(time.perf_counter() - started, 2),
+        }
+        self.versions.append(entry)
+        tmp = self.store_dir / (self.MANIFEST + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, self.store_dir / self.MANIFEST)
+        return entry
+
+    def _check_version(self, version: int):
+        if not 1 <= version <= len(self.versions):
+            raise ValueError(f"Version {version} not found (store has {len(self.versions)} versions)")
+
+    def _deltas(self, version: int) -> Iterator[Dict[str, Any]]:
+        self._check_version(version)
+        for entry in self.versions[:version]:
+            yield self._read_blob(self.store_dir / entry["file"])
+
+    def snapshot(self, version: int, sheets: Optional[List[str]] = None) -> Dict[str, Dict[int, tuple]]:
+        """Rebuild the row values of a version by replaying deltas over the base snapshot"""
+        state: Dict[str, Dict[int, tuple]] = {}
+        for delta in self._deltas(version):
+            for name in delta["removed_sheets"]:
+                state.pop(name, None)
+            for name, sheet_delta in delta["sheets"].items():
+                if sheets and name not in sheets:
+                    continue
+                rows = {} if sheet_delta["full"] else state.setdefault(name, {})
+                for row_idx in sheet_delta["delete"]:
+                    rows.pop(row_idx, None)
+                rows.update(sheet_delta["set"])
+                state[name] = rows
+        return state
+
+    def analysis(self, version: int) -> Optional[Dict[str, Any]]:
+        """Rebuild the analysis JSON recorded for a version (None if it was ingested without one)"""
+        self._check_version(version)
+        if not self.versions[version - 1].get("has_analysis"):
+            return None
+        document = None
+        for delta in self._deltas(version):
+            change = delta.get("analysis")
+            if change is None:
+                continue
+            if "full" in change:
+                document = change["full"]
+            elif document is not None:
+                document = self._apply_json_delta(document, change["set"], change["delete"])
+        return document
+
+    def timeline(self) -> List[Dict[str, Any]]:
+        """Per-version change summary, straight from the manifest"""
+        return [
+            {key: entry[key] for key in ("version", "label", "ingested", "changed_sheets", "removed_sheets",
+                                         "rows_set", "rows_deleted", "stored_bytes")}
+            for entry in self.versions
+        ]
+
+def _write_reports(results: Dict[str, Any], output_dir: Path, file_stem: str, output_format: str) -> List[Path]:
+    """Write the JSON and/or Markdown reports, replacing existing files atomically"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    outputs = []
+    if output_format in ['json', 'both']:
+        outputs.append((output_dir / f"{file_stem}_analysis.json",
+                        json.dumps(results, indent=2, default=str)))
+    if output_format in ['markdown', 'both']:
+        outputs.append((output_dir / f"{file_stem}_analysis.md",
+                        MarkdownReportGenerator(results).generate_report()))
+
+    for target, text in outputs:
+        tmp_file = target.with_name(target.name + ".tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_file, target)
+    return [target for target, _ in outputs]
+
+def _check_excel_file(file_path: str) -> bool:
+    """Validate that a CLI file argument exists and is a supported Excel file"""
+    if not os.path.exists(file_path):
+        print(f"❌ Error: File '{file_path}' not found")
+        return False
+    
+    file_ext = Path(file_path).suffix.lower()
+    if file_ext not in ['.xlsx', '.xlsm']:
+        print(f"❌ Error: Unsupported file type '{file_ext}'. Only .xlsx and .xlsm files are supported.")
+        return False
+    
+    return True
+
+def main():
+    """Main CLI function"""
+    parser = argparse.ArgumentParser(
+        description="Excel Analyzer - Comprehensive analysis tool for Excel files",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python excel_analyzer.py analyze file.xlsx
+  python excel_analyzer.py analyze file.xlsm --include-vba --output-format markdown
+  python excel_analyzer.py analyze file.xlsx --output-dir ./reports/
+  python excel_analyzer.py analyze file.xlsx --budget 200k
+  python excel_analyzer.py analyze file.xlsx --max-memory 512M
+  python excel_analyzer.py duplicates file1.xlsx file2.xlsx --threshold 0.8
+  python excel_analyzer.py templates register file.xlsx --name cet-v22 --purpose "Cost Estimation Template"
+  python excel_analyzer.py templates extract other.xlsx
+  python excel_analyzer.py analyze other.xlsx --registry excel_templates.json
+  python excel_analyzer.py load file.xlsx --database postgresql://localhost/e2e
+  python excel_analyzer.py extract-set "SET Test Loader CUT.xlsx" --output public/set_test_loader_data.json
+  python excel_analyzer.py watch ./workbooks --output-dir ./reports
+  python excel_analyzer.py query file.xlsx --sheet GovDemand --where "FTE>=1" --agg sum:FTE
+  python excel_analyzer.py catalog file.xlsm --output-dir ./reports
+  python excel_analyzer.py fields file1.xlsx file2.xlsm --output-dir ./reports
+  python excel_analyzer.py history ingest v1.xlsx v2.xlsx --store ./history/cet
+  python excel_analyzer.py history timeline --store ./history/cet
+  python excel_analyzer.py history analysis --version 1 --store ./history/cet
+        """
+    )
+    
+    subparsers = parser.add_subparsers(dest='command', help='Available commands')
+    
+    # Analyze command
+    analyze_parser = subparsers.add_parser('analyze', help='Analyze an Excel file')
+    analyze_parser.add_argument('file', help='Path to Excel file (.xlsx or .xlsm)')
+    analyze_parser.add_argument('--include-vba', action='store_true', default=True,
+                               help='Include VBA macro analysis (default: True)')
+    analyze_parser.add_argument('--include-formatting', action='store_true', default=True,
+                               help='Include formatting analysis (default: True)')
+    analyze_parser.add_argument('--output-format', choices=['json', 'markdown', 'both'], 
+                               default='both', help='Output format (default: both)')
     analyze_parser.add_argument('--output-dir', default='.', 
                                help='Output directory (default: current directory)')
+    analyze_parser.add_argument('--concurrent', action='store_true',
+                               help='Run analysis stages concurrently through the asyncio pipeline, sharing one workbook parse between them')
+    analyze_parser.add_argument('--registry', help='Template registry used to identify known workbook families; '
+                                                   'exact matches only read the template\'s known regions')
+    analyze_parser.add_argument('--full-analysis', action='store_true',
+                               help='Run every analysis stage even when the file exactly matches a registered template')
+    analyze_parser.add_argument('--include-catalog', action='store_true',
+                               help='Include the defined-name and data-validation catalog')
+    analyze_parser.add_argument('--max-memory', type=_parse_size, default=None,
+                               help='Limit the memory the content stage buffers (e.g. 512M, 2G) by chunking sheets and '
+                                    'spilling them to disk. This only limits the content stage, not the process: metadata, '
+                                    'structure, layout and formatting still load whole workbooks')
+    analyze_parser.add_argument('--budget', type=SamplingBudget.parse, default=None,
+                               help='Sampling budget per sheet: a cell count (50000, 200k) or a time (2s, 500ms); sheets within it are scanned exactly')
+    
+    # Templates command
+    templates_parser = subparsers.add_parser('templates', help='Manage the known workbook template registry')
+    templates_parser.add_argument('action', choices=['register', 'match', 'extract', 'list'],
+                                  help='Registry action to perform')
+    templates_parser.add_argument('file', nargs='?', help='Path to Excel file (not needed for list)')
+    templates_parser.add_argument('--name', help='Template name (register)')
+    templates_parser.add_argument('--purpose', help='Template purpose shown in reports (register)')
+    templates_parser.add_argument('--sheets', nargs='*', help='Restrict extraction regions to these sheets (register)')
+    templates_parser.add_argument('--registry', default=DEFAULT_TEMPLATE_REGISTRY,
+                                  help=f'Registry file (default: {DEFAULT_TEMPLATE_REGISTRY})')
+    templates_parser.add_argument('--output-dir', default='.',
+                                  help='Output directory for extracted records (default: current directory)')
+    
+    # Watch command
+    watch_parser = subparsers.add_parser('watch', help='Re-analyze workbooks in a directory as they are saved')
+    watch_parser.add_argument('directory', help='Directory containing Excel files')
+    watch_parser.add_argument('--output-format', choices=['json', 'markdown', 'both'],
+                              default='both', help='Output format (default: both)')
+    watch_parser.add_argument('--output-dir', default='.',
+                              help='Output directory (default: current directory)')
+    watch_parser.add_argument('--interval', type=float, default=0.25,
+                              help='Polling interval in seconds (default: 0.25)')
+    watch_parser.add_argument('--debounce', type=float, default=0.5,
+                              help='Seconds a file must be unchanged before it is analyzed (default: 0.5)')
+    watch_parser.add_argument('--budget', type=SamplingBudget.parse, default=None,
+                              help='Sampling budget per sheet: a cell count (50000, 200k) or a time (2s, 500ms); sheets within it are scanned exactly')
+    
+    # Query command
+    query_parser = subparsers.add_parser('query', help='Query sheet data through persisted columnar indexes')
+    query_parser.add_argument('file', help='Path to Excel file (.xlsx or .xlsm)')
+    query_parser.add_argument('--sheet', help='Sheet to query (omit to list sheets and columns)')
+    query_parser.add_argument('--where', action='append', default=[],
+                              help='Condition such as "Project Role=Team Architect" or "FTE>=1" (repeatable)')
+    query_parser.add_argument('--columns', nargs='*', help='Columns to return (default: all)')
+    query_parser.add_argument('--agg', help='Aggregate as func:column, e.g. sum:Cost (sum, mean, min, max, count)')
+    query_parser.add_argument('--limit', type=int, default=20, help='Maximum rows to print (default: 20)')
+    query_parser.add_argument('--index', nargs='*', help='Columns to index (default: all when building); '
+                                   'missing ones are added to an existing store')
+    query_parser.add_argument('--rebuild', action='store_true', help='Rebuild the store even if it is current')
+    query_parser.add_argument('--output-dir', default='.',
+                              help='Directory holding the query store (default: current directory)')
+    
+    # History command
+    history_parser = subparsers.add_parser('history', help='Keep delta-compressed versions of a workbook family')
+    history_parser.add_argument('action', choices=['ingest', 'timeline', 'analysis', 'snapshot'],
+                                help='History action to perform')
+    history_parser.add_argument('files', nargs='*', help='Workbook versions to ingest, oldest first (ingest)')
+    history_parser.add_argument('--store', required=True, help='History store directory for this workbook family')
+    history_parser.add_argument('--version', type=int, help='Version to rebuild (analysis, snapshot; default: latest)')
+    history_parser.add_argument('--sheets', nargs='*', help='Only rebuild these sheets (snapshot)')
+    history_parser.add_argument('--skip-analysis', action='store_true',
+                                help='Store row deltas only, without analyzing each version (ingest)')
+    history_parser.add_argument('--output', help='Output file (analysis, snapshot; default: <store>/v<N>_<action>.json)')
+    
+    # Fields command
+    fields_parser = subparsers.add_parser('fields', help='Tag every column header with semantic and TMF field types')
+    fields_parser.add_argument('files', nargs='+', help='Excel files to classify')
+    fields_parser.add_argument('--vocabulary', help='TMF vocabulary CSV (default: TMF_Domains_Functions.csv)')
+    fields_parser.add_argument('--output-dir', default='.',
+                               help='Output directory (default: current directory)')
+    
+    # Catalog command
+    catalog_parser = subparsers.add_parser('catalog', help='Catalog defined names and dropdown validation lists')
+    catalog_parser.add_argument('file', help='Path to Excel file (.xlsx or .xlsm)')
+    catalog_parser.add_argument('--output-dir', default='.',
+                                help='Output directory (default: current directory)')
+    
+    # SET extract command
+    set_parser = subparsers.add_parser('extract-set', help='Extract SET Test Loader components to JSON')
+    set_parser.add_argument('file', help='Path to SET Test Loader or BoSS proposal workbook')
+    set_parser.add_argument('--sheet', help='SET detail sheet to read (default: first recognised sheet)')
+    set_parser.add_argument('--jsonl', action='store_true',
+                            help='Stream one component per line instead of writing the summary JSON')
+    set_parser.add_argument('--output', help='Output file (default: <file>_set_data.json or .jsonl)')
+    
+    # Load command
+    load_parser = subparsers.add_parser('load', help='Bulk load extracted rows into a database')
+    load_parser.add_argument('files', nargs='+', help='Excel files to load')
+    load_parser.add_argument('--database', required=True,
+                             help='Target database URL (postgresql://... or sqlite:///path.db)')
+    load_parser.add_argument('--sheets', nargs='*', help='Only load these sheet names')
+    load_parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per bulk insert (default: 5000)')
+    load_parser.add_argument('--workers', type=int, default=4, help='Pooled writer connections (default: 4)')
+    load_parser.add_argument('--force', action='store_true', help='Reload files that already completed')
+    
+    # Duplicates command
+    duplicates_parser = subparsers.add_parser('duplicates', help='Find duplicate and near-duplicate rows')
+    duplicates_parser.add_argument('files', nargs='+', help='Excel files to index')
+    duplicates_parser.add_argument('--sheets', nargs='*', help='Only index these sheet names')
+    duplicates_parser.add_argument('--threshold', type=float, default=0.8,
+                                  help='Estimated Jaccard similarity for near-duplicates (default: 0.8)')
+    duplicates_parser.add_argument('--min-cells', type=int, default=2,
+                                  help='Ignore rows with fewer non-empty cells (default: 2)')
+    duplicates_parser.add_argument('--output-dir', default='.',
+                                  help='Output directory (default: current directory)')
     
     args = parser.parse_args()
     
@@ -670,47 +3767,44 @@ Examples:
         return
     
     if args.command == 'analyze':
-        # Validate file exists
-        if not os.path.exists(args.file):
-            print(f"❌ Error: File '{args.file}' not found")
-            return
-        
-        # Validate file extension
-        file_ext = Path(args.file).suffix.lower()
-        if file_ext not in ['.xlsx', '.xlsm']:
-            print(f"❌ Error: Unsupported file type '{file_ext}'. Only .xlsx and .xlsm files are supported.")
+        if not _check_excel_file(args.file):
             return
         
         print(f"🚀 Starting analysis of {Path(args.file).name}")
         print("=" * 60)
         
-        # Perform analysis
-        analyzer = ExcelAnalyzer(args.file)
-        results = analyzer.analyze(
-            include_vba=args.include_vba,
-            include_formatting=args.include_formatting
-        )
+        # Identify known workbook families first, so an exact match can skip the full analysis
+        matched = None
+        if args.registry:
+            matched = TemplateRegistry(args.registry).match(args.file)
+            if matched:
+                print(f"🧩 Matched template: {matched['template']['name']} ({matched['match']})")
         
-        # Generate outputs
-        output_dir = Path(args.output_dir)
-        output_dir.mkdir(exist_ok=True)
+        # Perform analysis
+        analyzer = ExcelAnalyzer(args.file, budget=args.budget, max_memory=args.max_memory)
+        if matched and matched["match"] == "exact" and not args.full_analysis:
+            results = analyzer.analyze_template(matched, include_vba=args.include_vba)
+        elif args.concurrent:
+            results = asyncio.run(analyzer.analyze_async(
+                include_vba=args.include_vba,
+                include_formatting=args.include_formatting
+            ))
+        else:
+            results = analyzer.analyze(
+                include_vba=args.include_vba,
+                include_formatting=args.include_formatting
+            )
         
-        file_stem = Path(args.file).stem
+        if matched and "template" not in results:
+            results["template"] = TemplateRegistry.describe(matched)
         
-        if args.output_format in ['json', 'both']:
-            json_file = output_dir / f"{file_stem}_analysis.json"
-            with open(json_file, 'w', encoding='utf-8') as f:
-                json.dump(results, f, indent=2, default=str)
-            print(f"📄 JSON report saved: {json_file}")
+        if args.include_catalog:
+            results["catalog"] = ValidationCatalog(args.file).build()
         
-        if args.output_format in ['markdown', 'both']:
-            md_generator = MarkdownReportGenerator(results)
-            markdown_content = md_generator.generate_report()
-            
-            md_file = output_dir / f"{file_stem}_analysis.md"
-            with open(md_file, 'w', encoding='utf-8') as f:
-                f.write(markdown_content)
-            print(f"📝 Markdown report saved: {md_file}")
+        # Generate outputs
+        output_dir = Path(args.output_dir)
+        for report in _write_reports(results, output_dir, Path(args.file).stem, args.output_format):
+            print(f"{'📄 JSON' if report.suffix == '.json' else '📝 Markdown'} report saved: {report}")
         
         print("\n✅ Analysis completed successfully!")
         
@@ -726,6 +3820,258 @@ Examples:
         if vba and vba.get("has_macros"):
             print(f"   • VBA modules: {vba.get('code_statistics', {}).get('total_modules', 0)}")
             print(f"   • Security risk: {vba.get('security_analysis', {}).get('risk_level', 'unknown').upper()}")
+        content = results.get("content", {})
+        if content.get("memory"):
+            memory = content["memory"]
+            print(f"   • Content stage memory: peak {memory['peak_mb']} MB of {memory['limit_mb']} MB buffered, "
+                  f"{memory['spilled_chunks']} chunks spilled (other stages are not limited)")
+            if content.get("partial"):
+                partial = [name for name, sheet in content["sheets"].items() if sheet.get("partial")]
+                print(f"   ⚠️  Partial content results (memory limit reached): {', '.join(partial) or 'all sheets'}")
+
+    elif args.command == 'templates':
+        registry = TemplateRegistry(args.registry)
+        
+        if args.action == 'list':
+            if not registry.templates:
+                print(f"ℹ️  No templates registered in {registry.registry_path}")
+            for name, template in registry.templates.items():
+                print(f"🧩 {name}: {len(template['sheets'])} sheets, {len(template['regions'])} regions"
+                      f" (from {template['source_file']})")
+            return
+        
+        if not args.file or not _check_excel_file(args.file):
+            if not args.file:
+                print("❌ Error: A file is required for this action")
+            return
+        
+        if args.action == 'register':
+            name = args.name or Path(args.file).stem
+            template = registry.register(name, args.file, purpose=args.purpose, sheets=args.sheets)
+            print(f"✅ Registered template '{name}' with {len(template['regions'])} regions in {registry.registry_path}")
+            return
+        
+        matched = registry.match(args.file)
+        if not matched:
+            print(f"⚠️  {Path(args.file).name} does not match any registered template")
+            return
+        print(f"🧩 {Path(args.file).name} matches '{matched['template']['name']}' "
+              f"({matched['match']}, score {matched['score']})")
+        
+        if args.action == 'extract':
+            records: Dict[str, List[Dict[str, Any]]] = {}
+            for sheet_name, row_idx, record in registry.extract(args.file, matched["template"]):
+                records.setdefault(sheet_name, []).append({"row": row_idx, **record})
+            
+            output_dir = Path(args.output_dir)
+            output_dir.mkdir(exist_ok=True)
+            json_file = output_dir / f"{Path(args.file).stem}_extract.json"
+            with open(json_file, 'w', encoding='utf-8') as f:
+                json.dump({"template": matched["template"]["name"], "sheets": records}, f, indent=2, default=str)
+            print(f"📄 Extracted {sum(len(r) for r in records.values()):,} records to {json_file}")
+    
+    elif args.command == 'watch':
+        if not os.path.isdir(args.directory):
+            print(f"❌ Error: Directory '{args.directory}' not found")
+            return
+        
+        watcher = WorkbookWatcher(args.directory, args.output_dir, args.output_format,
+                                  interval=args.interval, debounce=args.debounce, budget=args.budget)
+        watcher.run()
+    
+    elif args.command == 'query':
+        if not _check_excel_file(args.file):
+            return
+        
+        store_dir = QueryStore.default_dir(args.file, args.output_dir)
+        if args.rebuild:
+            store = QueryStore.build(args.file, str(store_dir), args.index)
+        else:
+            store = QueryStore.open_or_build(args.file, str(store_dir), args.index)
+        
+        if not args.sheet:
+            for sheet_name, entry in store.manifest["sheets"].items():
+                print(f"📋 {sheet_name}: {entry['rows']:,} rows")
+                print(f"   Columns: {', '.join(entry['columns'])}")
+            return
+        
+        try:
+            where = [ColumnarSheet.parse_condition(expr) for expr in args.where]
+            aggregate = ColumnarSheet.parse_aggregate(args.agg) if args.agg else None
+            started = time.perf_counter()
+            result = store.query(args.sheet, where, args.columns, aggregate, args.limit)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            return
+        
+        print(json.dumps(result, indent=2, default=str))
+        print(f"⏱️  {result['matched']:,} matching rows in {elapsed_ms:.1f} ms")
+    
+    elif args.command == 'history':
+        store = HistoryStore(args.store)
+        
+        if args.action == 'ingest':
+            if not args.files:
+                print("❌ Error: At least one file is required for ingest")
+                return
+            if not all(_check_excel_file(f) for f in args.files):
+                return
+            for file_path in args.files:
+                entry = store.ingest(file_path, analyze=not args.skip_analysis)
+                print(f"🗂️  Version {entry['version']} ({entry['label']}): {len(entry['changed_sheets'])} sheets changed, "
+                      f"{entry['rows_set']:,} rows set, {entry['rows_deleted']:,} deleted, "
+                      f"{entry['stored_bytes']:,} bytes stored in {entry['seconds']}s")
+            return
+        
+        if not store.versions:
+            print(f"ℹ️  No versions stored in {store.store_dir}")
+            return
+        
+        if args.action == 'timeline':
+            for entry in store.timeline():
+                changed = ', '.join(entry['changed_sheets']) or 'no sheet changes'
+                print(f"🗂️  v{entry['version']} {entry['label']} ({entry['ingested']}): {changed}; "
+                      f"+{entry['rows_set']:,}/-{entry['rows_deleted']:,} rows, {entry['stored_bytes']:,} bytes")
+            return
+        
+        version = args.version or len(store.versions)
+        try:
+            if args.action == 'analysis':
+                data = store.analysis(version)
+                if data is None:
+                    print(f"⚠️  Version {version} was ingested without analysis")
+                    return
+            else:
+                data = {
+                    sheet_name: {str(row_idx): list(values) for row_idx, values in sorted(rows.items())}
+                    for sheet_name, rows in store.snapshot(version, args.sheets).items()
+                }
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            return
+        
+        output_file = Path(args.output or store.store_dir / f"v{version}_{args.action}.json")
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, default=str)
+        print(f"📄 Version {version} {args.action} saved: {output_file}")
+    
+    elif args.command == 'fields':
+        if not all(_check_excel_file(f) for f in args.files):
+            return
+        
+        classifier = HeaderClassifier(args.vocabulary) if args.vocabulary else HeaderClassifier.default()
+        output_dir = Path(args.output_dir)
+        output_dir.mkdir(exist_ok=True)
+        for file_path in args.files:
+            fields = classifier.classify_workbook(file_path)
+            columns = [c for sheet in fields["sheets"].values() for c in sheet["columns"]]
+            json_file = output_dir / f"{Path(file_path).stem}_fields.json"
+            with open(json_file, 'w', encoding='utf-8') as f:
+                json.dump(fields, f, indent=2, default=str)
+            print(f"🏷️  {Path(file_path).name}: {len(columns):,} headers, "
+                  f"{sum(1 for c in columns if c['tags']):,} tagged, "
+                  f"{sum(1 for c in columns if c['known']):,} known CET/SET fields, "
+                  f"{sum(1 for c in columns if c['tmf']):,} TMF matches")
+            print(f"📄 JSON report saved: {json_file}")
+    
+    elif args.command == 'catalog':
+        if not _check_excel_file(args.file):
+            return
+        
+        catalog = ValidationCatalog(args.file).build()
+        output_dir = Path(args.output_dir)
+        output_dir.mkdir(exist_ok=True)
+        json_file = output_dir / f"{Path(args.file).stem}_catalog.json"
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(catalog, f, indent=2, default=str)
+        print(f"📄 JSON catalog saved: {json_file}")
+        
+        summary = catalog["summary"]
+        print(f"\n📊 Summary:")
+        print(f"   • Defined names: {summary['defined_names']:,}")
+        print(f"   • Validation rules: {summary['validations']:,} ({summary['list_validations']:,} dropdowns)")
+        print(f"   • Dropdown lists resolved: {summary['resolved_lists']:,} of "
+              f"{summary['resolved_lists'] + summary['unresolved_lists']:,}")
+    
+    elif args.command == 'extract-set':
+        if not _check_excel_file(args.file):
+            return
+        
+        extractor = SETLoaderExtractor(args.file)
+        set_sheets = extractor.find_sheets()
+        if not set_sheets:
+            print(f"❌ Error: No SET Test Loader sheet found in {Path(args.file).name}")
+            return
+        if args.sheet is not None and args.sheet not in set_sheets:
+            print(f"❌ Error: '{args.sheet}' is not a SET Test Loader sheet in {Path(args.file).name} "
+                  f"(found: {', '.join(set_sheets)})")
+            return
+        
+        suffix = "jsonl" if args.jsonl else "json"
+        output_file = Path(args.output or f"{Path(args.file).stem}_set_data.{suffix}")
+        if args.jsonl:
+            count = 0
+            with open(output_file, 'w', encoding='utf-8') as f:
+                for record in extractor.iter_components(args.sheet):
+                    f.write(json.dumps(record, default=str) + "\n")
+                    count += 1
+        else:
+            data = extractor.extract(args.sheet)
+            count = len(data["components"])
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, default=str)
+        print(f"📄 {count:,} components from '{extractor.project_info.get('sheet')}' saved: {output_file}")
+    
+    elif args.command == 'load':
+        if not all(_check_excel_file(f) for f in args.files):
+            return
+        
+        try:
+            loader = BulkLoader(args.database, chunk_size=args.chunk_size, workers=args.workers)
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            return
+        
+        try:
+            for file_path in args.files:
+                print(f"🚚 Loading {Path(file_path).name}...")
+                stats = loader.load(file_path, sheets=args.sheets, force=args.force)
+                if stats["status"] == "skipped":
+                    print("   • Already loaded, skipping (use --force to reload)")
+                    continue
+                print(f"   • {stats['rows_loaded']:,} rows in {stats['chunks_loaded']} chunks "
+                      f"({stats['rows_skipped']:,} rows resumed from earlier runs) in {stats['seconds']}s")
+        finally:
+            loader.close()
+        print("\n✅ Load completed successfully!")
+    
+    elif args.command == 'duplicates':
+        if not all(_check_excel_file(f) for f in args.files):
+            return
+        
+        detector = DuplicateDetector(threshold=args.threshold, min_cells=args.min_cells)
+        for file_path in args.files:
+            print(f"🔍 Indexing {Path(file_path).name}...")
+            added = detector.add_workbook(file_path, sheets=args.sheets)
+            print(f"   • {added:,} rows fingerprinted")
+        
+        report = detector.find_clusters()
+        
+        output_dir = Path(args.output_dir)
+        output_dir.mkdir(exist_ok=True)
+        json_file = output_dir / "duplicates_analysis.json"
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"📄 JSON report saved: {json_file}")
+        
+        summary = report["summary"]
+        print(f"\n📊 Summary:")
+        print(f"   • Distinct rows: {report['distinct_rows']:,} of {report['rows_indexed']:,}")
+        print(f"   • Exact duplicate clusters: {summary['exact_clusters']:,}")
+        print(f"   • Near-duplicate clusters: {summary['near_clusters']:,}")
+        print(f"   • Cross-sheet clusters: {summary['cross_sheet_clusters']:,}")
+        print(f"   • Cross-file clusters: {summary['cross_file_clusters']:,}")
 
 if __name__ == "__main__":
     main()
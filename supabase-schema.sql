@@ -219,6 +219,37 @@ CREATE TABLE IF NOT EXISTS filter_options (
   metadata JSONB DEFAULT '{}'::jsonb
 );
 
+-- Excel Load Files table (one row per loaded workbook, keyed by content hash)
+CREATE TABLE IF NOT EXISTS excel_load_files (
+  file_sha TEXT PRIMARY KEY,
+  file_name TEXT NOT NULL,
+  status TEXT NOT NULL,
+  row_count INTEGER DEFAULT 0,
+  started_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  completed_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Excel Rows table (rows extracted by excel_analyzer.py load)
+CREATE TABLE IF NOT EXISTS excel_rows (
+  file_sha TEXT NOT NULL,
+  sheet_name TEXT NOT NULL,
+  row_number INTEGER NOT NULL,
+  data JSONB NOT NULL,
+  loaded_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  PRIMARY KEY (file_sha, sheet_name, row_number)
+);
+
+-- Excel Load Chunks table (committed chunks, used to resume interrupted loads)
+CREATE TABLE IF NOT EXISTS excel_load_chunks (
+  file_sha TEXT NOT NULL,
+  sheet_name TEXT NOT NULL,
+  first_row INTEGER NOT NULL,
+  last_row INTEGER NOT NULL,
+  row_count INTEGER NOT NULL,
+  loaded_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  PRIMARY KEY (file_sha, sheet_name, first_row, last_row)
+);
+
 -- Enable Row Level Security (RLS) on all tables
 ALTER TABLE projects ENABLE ROW LEVEL SECURITY;
 ALTER TABLE tmf_reference_domains ENABLE ROW LEVEL SECURITY;
@@ -234,6 +265,9 @@ ALTER TABLE integration_configs ENABLE ROW LEVEL SECURITY;
 ALTER TABLE user_preferences ENABLE ROW LEVEL SECURITY;
 ALTER TABLE filter_categories ENABLE ROW LEVEL SECURITY;
 ALTER TABLE filter_options ENABLE ROW LEVEL SECURITY;
+ALTER TABLE excel_load_files ENABLE ROW LEVEL SECURITY;
+ALTER TABLE excel_rows ENABLE ROW LEVEL SECURITY;
+ALTER TABLE excel_load_chunks ENABLE ROW LEVEL SECURITY;
 
 -- Create basic RLS policies (allow all operations for now - customize based on your auth requirements)
 -- Projects
@@ -262,6 +296,11 @@ CREATE POLICY "Allow all operations on user_preferences" ON user_preferences FOR
 CREATE POLICY "Allow all operations on filter_categories" ON filter_categories FOR ALL USING (true);
 CREATE POLICY "Allow all operations on filter_options" ON filter_options FOR ALL USING (true);
 
+-- Excel Loader
+CREATE POLICY "Allow all operations on excel_load_files" ON excel_load_files FOR ALL USING (true);
+CREATE POLICY "Allow all operations on excel_rows" ON excel_rows FOR ALL USING (true);
+CREATE POLICY "Allow all operations on excel_load_chunks" ON excel_load_chunks FOR ALL USING (true);
+
 -- Create indexes for better performance
 -- Projects
 CREATE INDEX IF NOT EXISTS idx_projects_customer ON projects(customer);
@@ -292,6 +331,9 @@ CREATE INDEX IF NOT EXISTS idx_tmf_reference_domains_category ON tmf_reference_d
 CREATE INDEX IF NOT EXISTS idx_tmf_reference_capabilities_domain_id ON tmf_reference_capabilities(domain_id);
 CREATE INDEX IF NOT EXISTS idx_tmf_reference_capabilities_level ON tmf_reference_capabilities(level);
 
+-- Excel Rows
+CREATE INDEX IF NOT EXISTS idx_excel_rows_sheet_name ON excel_rows(sheet_name);
+
 -- Composite indexes
 CREATE INDEX IF NOT EXISTS idx_projects_customer_status ON projects(customer, status);
 CREATE INDEX IF NOT EXISTS idx_specsync_project_capability ON specsync_items(project_id, capability);
@@ -0,0 +1,41 @@
+"""Shared fixtures for the excel_analyzer / cet_analyzer test suite"""
+
+import sys
+from pathlib import Path
+
+import openpyxl
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+
+def write_workbook(path: Path, sheets):
+    """Write {sheet name: [row values, ...]} to an .xlsx file and return its path"""
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+    for name, rows in sheets.items():
+        ws = wb.create_sheet(name)
+        for row in rows:
+            ws.append(list(row))
+    wb.save(path)
+    return path
+
+
+@pytest.fixture
+def make_workbook(tmp_path):
+    """Build small workbooks on the fly: make_workbook("name.xlsx", {"Sheet": [[...], ...]})"""
+    def build(name, sheets):
+        return write_workbook(tmp_path / name, sheets)
+    return build
+
+
+@pytest.fixture
+def repo_file():
+    """Path to a workbook shipped in the repository, skipping the test when it is absent"""
+    def locate(name):
+        path = REPO_ROOT / name
+        if not path.exists():
+            pytest.skip(f"{name} is not available")
+        return path
+    return locate
@@ -0,0 +1,75 @@
+"""Tests for memory-bounded content analysis"""
+
+import pytest
+
+from excel_analyzer import ExcelAnalyzer, MemoryGuard
+
+ROWS = [["Name", "Cost", "Notes"]] + [[f"item {i}", i * 1.5, "x" * (i % 7)] for i in range(1, 2001)]
+
+
+@pytest.fixture
+def workbook(make_workbook):
+    return str(make_workbook("bounded.xlsx", {"Data": ROWS, "Small": [["Key", "Value"], ["a", 1]]}))
+
+
+def _content(path, max_memory=None):
+    analyzer = ExcelAnalyzer(path, max_memory=max_memory)
+    return analyzer._analyze_content_bounded() if max_memory else analyzer._analyze_content()
+
+
+def _stats(sheet):
+    return {key: sheet[key] for key in ("rows", "columns", "column_names", "data_types",
+                                         "null_counts", "non_null_counts", "sample_data")}
+
+
+def test_spilled_analysis_matches_unbounded_analysis(workbook):
+    full = _content(workbook)
+    bounded = _content(workbook, max_memory=512 * 1024)
+
+    assert not bounded["partial"]
+    assert bounded["memory"]["spilled_chunks"] > 0
+    assert bounded["memory"]["peak_mb"] <= bounded["memory"]["limit_mb"]
+    for name in ("Data", "Small"):
+        assert _stats(bounded["sheets"][name]) == _stats(full["sheets"][name])
+
+
+def test_generous_limit_does_not_spill(workbook):
+    bounded = _content(workbook, max_memory=64 * 1024 * 1024)
+
+    assert not bounded["partial"]
+    assert bounded["memory"]["spilled_chunks"] == 0
+
+
+def test_tripped_guard_still_analyzes_rows_already_read(workbook):
+    bounded = _content(workbook, max_memory=16 * 1024)
+    data = bounded["sheets"]["Data"]
+
+    assert bounded["partial"] and data["partial"]
+    # Reading stopped or columns were truncated, but every column was still analyzed
+    assert data["column_names"] == ["Name", "Cost", "Notes"]
+    assert set(data["non_null_counts"]) == {"Name", "Cost", "Notes"}
+    assert data["non_null_counts"]["Name"] > 0
+    assert not bounded["sheets"]["Small"].get("partial")
+
+
+def test_guard_counts_only_its_own_buffers(workbook):
+    unrelated = [bytearray(1024 * 1024) for _ in range(8)]
+    guard = MemoryGuard(1024 * 1024)
+
+    assert guard.used == 0 and not guard.exceeded()
+    guard.add(600 * 1024)
+    assert guard.exceeded(0.5) and not guard.exceeded()
+    guard.release(600 * 1024)
+    assert guard.used == 0 and guard.peak_bytes == 600 * 1024
+    assert len(unrelated) == 8
+
+
+def test_unreadable_file_reports_an_error_like_the_unbounded_path(tmp_path):
+    path = tmp_path / "corrupt.xlsx"
+    path.write_bytes(b"not a zip file")
+
+    bounded = ExcelAnalyzer(str(path), max_memory=1024 * 1024).analyze(include_vba=False)
+    full = ExcelAnalyzer(str(path)).analyze(include_vba=False)
+
+    assert bounded["content"] == full["content"]
+    assert bounded["content"]["error"].startswith("Failed to analyze content:")
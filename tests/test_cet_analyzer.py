@@ -0,0 +1,38 @@
+"""Tests for the CET-focused analyzer"""
+
+import openpyxl
+import pytest
+
+import cet_analyzer
+
+
+@pytest.fixture
+def formula_workbook(tmp_path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Estimate"
+    ws.append(["Role Name", "Cost", "Total Cost"])
+    for row in range(2, 32):
+        ws.append([f"role {row}", row, f"=B{row}*2"])
+    path = tmp_path / "formulas.xlsx"
+    wb.save(path)
+    return str(path)
+
+
+def test_formulas_are_counted_from_formula_preserving_copy(formula_workbook):
+    analysis = cet_analyzer.analyze_cet_file(formula_workbook)
+    structure = analysis["sheets"]["Estimate"]["structure"]
+
+    assert structure["formula_count"] == 30
+    # Only the first data rows are listed, like the original preview
+    assert len(structure["formulas"]) == cet_analyzer.FORMULA_PREVIEW_ROWS
+    assert structure["formulas"][0] == {"cell": "C2", "formula": "=B2*2"}
+
+
+def test_structure_without_formula_copy_falls_back_to_sheet(formula_workbook):
+    sheet = openpyxl.load_workbook(formula_workbook)["Estimate"]
+
+    structure = cet_analyzer.analyze_sheet_structure(sheet, ["Role Name", "Cost", "Total Cost"], 31, 3)
+
+    assert len(structure["formulas"]) == cet_analyzer.FORMULA_PREVIEW_ROWS
+    assert structure["formula_count"] == cet_analyzer.FORMULA_PREVIEW_ROWS
@@ -0,0 +1,93 @@
+"""Tests for exact and near-duplicate row detection"""
+
+import json
+import sys
+
+import excel_analyzer
+from excel_analyzer import DuplicateDetector
+
+WIDE = [f"value {i}" for i in range(20)]
+
+
+def _clusters(detector, kind):
+    return [c for c in detector.find_clusters()["clusters"] if c["kind"] == kind]
+
+
+def _rows(cluster):
+    return sorted(member["row"] for member in cluster["members"])
+
+
+def test_exact_duplicates_are_clustered_across_sheets():
+    detector = DuplicateDetector()
+    detector.add_row("a.xlsx", "One", 1, ["Role", "Architect", 100])
+    detector.add_row("a.xlsx", "Two", 5, [" role ", "ARCHITECT", 100, None])
+
+    [cluster] = _clusters(detector, "exact")
+
+    assert cluster["scope"] == "cross_sheet"
+    assert cluster["similarity"] == 1.0
+    assert _rows(cluster) == [1, 5]
+
+
+def test_reordered_cells_are_not_near_duplicates():
+    detector = DuplicateDetector()
+    detector.add_row("a.xlsx", "Data", 1, ["a", "b", "c", "d"])
+    detector.add_row("a.xlsx", "Data", 2, ["d", "c", "b", "a"])
+
+    assert detector.find_clusters()["clusters"] == []
+
+
+def test_rows_of_flags_do_not_collide():
+    detector = DuplicateDetector()
+    detector.add_row("a.xlsx", "Flags", 1, [1, 0, 1, 0, True, False])
+    detector.add_row("a.xlsx", "Flags", 2, [0, 1, 0, 1, False, True])
+
+    assert detector.find_clusters()["clusters"] == []
+
+
+def test_one_changed_cell_is_a_near_duplicate():
+    detector = DuplicateDetector()
+    detector.add_row("a.xlsx", "Data", 1, WIDE)
+    detector.add_row("a.xlsx", "Data", 2, WIDE[:-1] + ["changed"])
+
+    [cluster] = _clusters(detector, "near")
+
+    assert _rows(cluster) == [1, 2]
+    assert cluster["similarity"] >= 0.8
+
+
+def test_exact_cluster_members_are_not_counted_again_as_near():
+    detector = DuplicateDetector()
+    detector.add_row("a.xlsx", "Data", 1, WIDE)
+    detector.add_row("a.xlsx", "Data", 2, WIDE)
+    detector.add_row("a.xlsx", "Data", 3, WIDE[:-1] + ["changed"])
+    detector.add_row("a.xlsx", "Data", 4, WIDE[:-1] + ["other"])
+
+    report = detector.find_clusters()
+    exact = {row for c in report["clusters"] if c["kind"] == "exact" for row in _rows(c)}
+    near = {row for c in report["clusters"] if c["kind"] == "near" for row in _rows(c)}
+
+    assert exact == {1, 2}
+    assert near == {3, 4}
+    assert report["summary"]["duplicate_rows"] == 1
+
+
+def test_short_rows_are_skipped():
+    detector = DuplicateDetector(min_cells=2)
+
+    assert not detector.add_row("a.xlsx", "Data", 1, ["only", None, ""])
+    assert detector.rows_indexed == 0
+
+
+def test_cli_writes_cross_file_report(make_workbook, tmp_path, monkeypatch):
+    rows = [["Role", "Cost"], ["Architect", 100], ["Developer", 80]]
+    first = make_workbook("first.xlsx", {"Team": rows})
+    second = make_workbook("second.xlsx", {"Team": rows[:2]})
+    monkeypatch.setattr(sys, "argv", ["excel_analyzer.py", "duplicates", str(first), str(second),
+                                      "--output-dir", str(tmp_path / "out")])
+
+    excel_analyzer.main()
+
+    report = json.loads((tmp_path / "out" / "duplicates_analysis.json").read_text(encoding="utf-8"))
+    assert report["summary"]["exact_clusters"] == 2
+    assert report["summary"]["cross_file_clusters"] == 2
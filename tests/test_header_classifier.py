@@ -0,0 +1,64 @@
+"""Tests for header tagging and TMF vocabulary matching"""
+
+import pytest
+
+from excel_analyzer import HeaderClassifier
+
+VOCABULARY = [
+    "Domain,Vertical,AF Lev.1,AF Lev.2,Rephrased Function Name,Function ID,UID",
+    "Market & Sales Domain,Sales,Sales Management,Sales Territory Management,Sales Territory Assignment,1,1",
+    "Customer Domain,Billing,Invoice Management,Billing Account Administration,Billing Account Reporting,2,2",
+    "Customer Domain,Orders,Customer Order Management,Order Capture,Order Capture Validation,3,3",
+    "Product Domain,Catalog,Product Management,Product Catalog,Product Offering Design,4,4",
+    "Service Domain,Operations,Service Management,Service Inventory,Service Inventory Reconciliation,5,5",
+    "Shared Domain,Delivery,Project Management,Project Planning,Project Plan Tracking,6,6",
+    "Resource Domain,Operations,Resource,Resource Inventory,Resource Inventory Audit,7,7",
+]
+
+
+@pytest.fixture
+def classifier(tmp_path):
+    path = tmp_path / "tmf.csv"
+    path.write_text("\n".join(VOCABULARY) + "\n", encoding="utf-8")
+    return HeaderClassifier(str(path))
+
+
+def _terms(classifier, header):
+    return [(match["level"], match["term"]) for match in classifier.classify(header)["tmf"]]
+
+
+@pytest.mark.parametrize("header", [
+    "Sales Region", "Customer Name", "Project Team", "Product / Service", "Resource Level",
+])
+def test_generic_single_words_do_not_match_tmf_terms(classifier, header):
+    assert _terms(classifier, header) == []
+
+
+def test_full_terms_and_multi_word_cores_match(classifier):
+    assert _terms(classifier, "Billing Account Administration") == [("af_level_2", "Billing Account Administration")]
+    assert _terms(classifier, "Customer Order") == [("af_level_1", "Customer Order Management")]
+    assert _terms(classifier, "Resource") == [("af_level_1", "Resource")]
+
+
+def test_header_abbreviating_a_term_matches_its_highest_level(classifier):
+    assert _terms(classifier, "Billing Account") == [("af_level_2", "Billing Account Administration")]
+    assert _terms(classifier, "Service Inventory") == [("af_level_2", "Service Inventory")]
+    # A prefix only counts when it is the whole header
+    assert _terms(classifier, "Billing Account Owner") == []
+
+
+def test_semantic_tags_and_known_fields(classifier):
+    result = classifier.classify("Sales Region")
+
+    assert "location_fields" in result["tags"]
+    assert result["known"] == {"source": "cet", "field": "sales_region"}
+    assert classifier.classify("Sales Region") is result
+
+
+def test_bundled_vocabulary_false_positives(repo_file):
+    repo_file("TMF_Domains_Functions.csv")
+    classifier = HeaderClassifier()
+
+    for header in ("Sales Region", "Customer Name", "Project Team", "Product / Service"):
+        assert _terms(classifier, header) == []
+    assert ("af_level_2", "Billing Account Administration") in _terms(classifier, "Billing Account")
@@ -0,0 +1,81 @@
+"""Tests for the delta-compressed history store"""
+
+import json
+
+import pytest
+
+from excel_analyzer import ExcelAnalyzer, HistoryStore
+
+BASE = {
+    "Alpha": [["Name", "Cost"]] + [[f"a{i}", i] for i in range(1, 5)],
+    "Beta": [["Key", "Value"], ["x", 10], ["y", 20]],
+}
+
+
+def _versions(make_workbook):
+    v1 = make_workbook("v1.xlsx", BASE)
+    v2 = make_workbook("v2.xlsx", {**BASE, "Alpha": BASE["Alpha"] + [["a5", 5]]})
+    v3 = make_workbook("v3.xlsx", {"Alpha": BASE["Alpha"] + [["a5", 5]], "Beta": BASE["Beta"] + [["z", 30]]})
+    return v1, v2, v3
+
+
+def _sheet_rows(analysis, sheet):
+    return analysis["content"]["sheets"][sheet]["rows"]
+
+
+def test_snapshots_replay_row_deltas(make_workbook, tmp_path):
+    v1, v2, v3 = _versions(make_workbook)
+    store = HistoryStore(str(tmp_path / "history"))
+    for path in (v1, v2, v3):
+        store.ingest(str(path), analyze=False)
+
+    assert store.snapshot(1)["Alpha"][5] == ("a4", 4)
+    assert 6 not in store.snapshot(1)["Alpha"]
+    assert store.snapshot(2)["Alpha"][6] == ("a5", 5)
+    assert store.snapshot(3)["Beta"][4] == ("z", 30)
+    assert store.versions[2]["changed_sheets"] == ["Beta"]
+    assert store.versions[2]["sheets_read"] == 1
+
+
+def test_skipped_ingests_do_not_stale_the_next_analysis(make_workbook, tmp_path):
+    v1, v2, v3 = _versions(make_workbook)
+    store = HistoryStore(str(tmp_path / "history"))
+
+    store.ingest(str(v1))
+    store.ingest(str(v2), analyze=False)  # edits Alpha
+    store.ingest(str(v3))  # edits Beta
+
+    latest = store.analysis(3)
+    full = json.loads(json.dumps(ExcelAnalyzer(str(v3)).analyze(), default=str))
+    assert _sheet_rows(latest, "Alpha") == _sheet_rows(full, "Alpha") == 5
+    assert _sheet_rows(latest, "Beta") == _sheet_rows(full, "Beta") == 3
+    assert latest["content"]["sheets"] == full["content"]["sheets"]
+    assert store.analysis(2) is None
+    assert _sheet_rows(store.analysis(1), "Alpha") == 4
+
+
+def test_reopened_store_chains_analyzed_and_skipped_ingests(make_workbook, tmp_path):
+    v1, v2, v3 = _versions(make_workbook)
+    store_dir = str(tmp_path / "history")
+
+    HistoryStore(store_dir).ingest(str(v1), analyze=False)
+    HistoryStore(store_dir).ingest(str(v2))
+    HistoryStore(store_dir).ingest(str(v3), analyze=False)
+    store = HistoryStore(store_dir)
+    store.ingest(str(v3))
+
+    assert store.analysis(1) is None
+    assert _sheet_rows(store.analysis(2), "Alpha") == 5
+    assert _sheet_rows(store.analysis(4), "Beta") == 3
+    assert [v["has_analysis"] for v in store.versions] == [False, True, False, True]
+
+
+def test_unknown_version_raises(make_workbook, tmp_path):
+    v1, _, _ = _versions(make_workbook)
+    store = HistoryStore(str(tmp_path / "history"))
+    store.ingest(str(v1), analyze=False)
+
+    with pytest.raises(ValueError):
+        store.analysis(2)
+    with pytest.raises(ValueError):
+        store.snapshot(0)
@@ -0,0 +1,117 @@
+"""Tests for part-checksum diffing and incremental re-analysis"""
+
+import json
+import zipfile
+
+import pytest
+
+from excel_analyzer import (
+    ExcelAnalyzer, WorkbookWatcher, _changed_sheets, _sheet_parts, _zip_part_checksums
+)
+
+SHEETS = {
+    "Alpha": [["Name", "Cost"], ["a", 1], ["b", 2]],
+    "Beta": [["Key", "Value"], ["x", 10]],
+}
+
+
+def _rewrite(source, target, replace):
+    """Copy a workbook package, replacing or adding parts from {name: bytes}"""
+    with zipfile.ZipFile(source) as src, zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            dst.writestr(info, replace.pop(info.filename, None) or src.read(info))
+        for name, data in replace.items():
+            dst.writestr(name, data)
+    return target
+
+
+def test_metadata_only_parts_do_not_force_full_reanalysis(make_workbook, tmp_path):
+    original = make_workbook("v1.xlsx", SHEETS)
+    edited = make_workbook("v2.xlsx", {**SHEETS, "Beta": [["Key", "Value"], ["x", 11]]})
+    sheet_parts = _sheet_parts(edited)
+    with zipfile.ZipFile(edited) as zf:
+        rels = zf.read("_rels/.rels").replace(b"</Relationships>", b"<!-- saved --></Relationships>")
+    resaved = _rewrite(edited, tmp_path / "v2_resaved.xlsx", {
+        "_rels/.rels": rels,
+        "customXml/item1.xml": b"<ct>upload 2</ct>",
+        "customXml/itemProps1.xml": b"<ds/>",
+        "docProps/custom.xml": b"<Properties/>",
+    })
+
+    changed = _changed_sheets(_zip_part_checksums(original), _zip_part_checksums(resaved), sheet_parts)
+
+    assert changed == ["Beta"]
+
+
+def test_shared_part_change_still_forces_full_reanalysis(make_workbook, tmp_path):
+    original = make_workbook("v1.xlsx", SHEETS)
+    restyled = _rewrite(original, tmp_path / "restyled.xlsx", {"xl/styles.xml": b"<styleSheet/>"})
+
+    assert _changed_sheets(_zip_part_checksums(original), _zip_part_checksums(restyled), _sheet_parts(original)) is None
+
+
+def test_incremental_analysis_matches_full_analysis(make_workbook):
+    original = make_workbook("v1.xlsx", SHEETS)
+    edited = make_workbook("v2.xlsx", {**SHEETS, "Beta": [["Key", "Value"], ["x", 11], ["y", 12]]})
+    previous = ExcelAnalyzer(str(original)).analyze()
+
+    incremental = ExcelAnalyzer(str(edited)).analyze_incremental(previous, ["Beta"])
+    full = ExcelAnalyzer(str(edited)).analyze()
+
+    for section in ("structure", "layout", "content", "formatting"):
+        assert incremental[section]["sheets"] == full[section]["sheets"]
+        # Unchanged sheets are carried over from the previous run, not re-read
+        assert incremental[section]["sheets"]["Alpha"] is previous[section]["sheets"]["Alpha"]
+    assert incremental["content"]["total_rows"] == full["content"]["total_rows"]
+
+
+def test_deliver_demo_pair_rereads_only_changed_sheets(repo_file):
+    old = repo_file("Yettel_DeliverDemo_001-2025_08_05_10_07_28.xlsx")
+    new = repo_file("Yettel_DeliverDemo_001-2025_08_05_10_07_28new.xlsx")
+    sheet_parts = _sheet_parts(new)
+
+    changed = _changed_sheets(_zip_part_checksums(old), _zip_part_checksums(new), sheet_parts)
+
+    assert sheet_parts == _sheet_parts(old)
+    assert changed == ["Input - Requirement", "Input - TMF Categories", "Rephrased - Atomic Requirements"]
+    assert len(changed) < len(sheet_parts)
+
+
+def test_watcher_reanalyzes_when_only_a_shared_string_is_edited(repo_file, tmp_path):
+    folder = tmp_path / "watched"
+    folder.mkdir()
+    path = folder / "set.xlsx"
+    path.write_bytes(repo_file("SET_Test_Loader_CUT_copy.xlsx").read_bytes())
+    watcher = WorkbookWatcher(str(folder), str(tmp_path / "reports"), output_format="json",
+                              include_vba=False)
+    watcher.refresh(path)
+
+    # Excel replaces a unique string in place: only the shared-strings table changes
+    with zipfile.ZipFile(path) as zf:
+        strings = zf.read("xl/sharedStrings.xml")
+    edited = _rewrite(path, tmp_path / "edited.xlsx",
+                      {"xl/sharedStrings.xml": strings.replace(b"<t>Ref #</t>", b"<t>EDITED</t>", 1)})
+    path.write_bytes(edited.read_bytes())
+    assert _changed_sheets(watcher._state[path][0]["checksums"], _zip_part_checksums(path), _sheet_parts(path)) == []
+
+    incremental = watcher.refresh(path)
+    full = ExcelAnalyzer(str(path)).analyze(include_vba=False)
+
+    assert "EDITED" in json.dumps(incremental["content"], default=str)
+    for section in ("structure", "layout", "content", "formatting"):
+        assert incremental[section]["sheets"] == full[section]["sheets"]
+
+
+def test_watcher_stays_incremental_when_shared_strings_are_appended(make_workbook, tmp_path):
+    folder = tmp_path / "watched"
+    folder.mkdir()
+    path = make_workbook("watched/book.xlsx", SHEETS)
+    watcher = WorkbookWatcher(str(folder), str(tmp_path / "reports"), output_format="json",
+                              include_vba=False)
+    previous = watcher.refresh(path)
+
+    make_workbook("watched/book.xlsx", {**SHEETS, "Beta": SHEETS["Beta"] + [["new key", 20]]})
+    incremental = watcher.refresh(path)
+
+    assert incremental["content"]["sheets"]["Alpha"] is previous["content"]["sheets"]["Alpha"]
+    assert incremental["content"]["sheets"]["Beta"]["rows"] == 2
@@ -0,0 +1,96 @@
+"""Tests for layout maps and layout-aware header detection"""
+
+import openpyxl
+import pytest
+
+from excel_analyzer import ExcelAnalyzer, LayoutMap, _detect_header_row, _sheet_layouts
+
+
+def _merged_workbook(tmp_path, rows, merges, hidden_rows=()):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Data"
+    for row in rows:
+        ws.append(row)
+    for ref in merges:
+        ws.merge_cells(ref)
+    for row in hidden_rows:
+        ws.row_dimensions[row].hidden = True
+    ws.freeze_panes = "A2"
+    path = tmp_path / "layout.xlsx"
+    wb.save(path)
+    return str(path)
+
+
+MERGED_HEADER = [
+    ["Role", None, "Cost", None, "Status"],
+    ["Architect", None, 100, None, "Open"],
+    ["Developer", None, 80, None, "Closed"],
+]
+GROUPED_HEADER = [
+    ["Effort", None, "Cost", None],
+    ["Low", "High", "Low", "High"],
+    [1, 2, 10, 20],
+]
+
+
+def test_lookups_follow_merges_and_hidden_runs():
+    layout = LayoutMap([(1, 1, 2, 1), (3, 2, 3, 4)], hidden_rows=[5, 6, 7], hidden_cols=[2])
+
+    assert layout.merge_at(1, 2) == (1, 1, 2, 1)
+    assert layout.merge_at(3, 3) == (3, 2, 3, 4)
+    assert layout.merge_at(5, 3) is None
+    assert layout.anchor(4, 3) == (2, 3)
+    assert layout.is_row_hidden(6) and not layout.is_row_hidden(8)
+    assert layout.is_col_hidden(2) and not layout.is_col_hidden(3)
+    assert layout.fill_row(1, ["a"], {}) == ["a", "a"]
+
+
+def test_merged_labels_over_data_are_not_a_group_band():
+    layout = LayoutMap([(1, 1, 2, 1), (3, 1, 4, 1)])
+
+    assert not layout.is_group_band(1, ["Role", None, "Cost"], ["Architect", None, 100])
+    assert not layout.is_group_band(1, ["Role", None, "Cost"])
+    assert layout.is_group_band(1, ["Role", None, "Cost"], ["Name", "Title", "Low", "High"])
+
+
+def test_header_with_every_label_merged_is_detected(tmp_path):
+    path = _merged_workbook(tmp_path, MERGED_HEADER, ["A1:B1", "C1:D1", "E1:F1"])
+    ws = openpyxl.load_workbook(path, read_only=True)["Data"]
+
+    header_row, headers = _detect_header_row(ws.iter_rows(values_only=True), _sheet_layouts(path)["Data"])
+
+    assert header_row == 1
+    assert headers == ["Role", "", "Cost", "", "Status"]
+
+
+def test_group_band_labels_the_sub_headers(tmp_path):
+    path = _merged_workbook(tmp_path, GROUPED_HEADER, ["A1:B1", "C1:D1"])
+    ws = openpyxl.load_workbook(path, read_only=True)["Data"]
+
+    header_row, headers = _detect_header_row(ws.iter_rows(values_only=True), _sheet_layouts(path)["Data"])
+
+    assert header_row == 2
+    assert headers == ["Effort / Low", "Effort / High", "Cost / Low", "Cost / High"]
+
+
+def test_layout_stage_previews_rows_under_a_merged_header(tmp_path):
+    path = _merged_workbook(tmp_path, MERGED_HEADER, ["A1:B1", "C1:D1", "E1:F1"], hidden_rows=[3])
+
+    sheet = ExcelAnalyzer(path)._analyze_layout()["sheets"]["Data"]
+
+    assert sheet["header_row"] == 1
+    assert sheet["merged_ranges"] == ["A1:B1", "C1:D1", "E1:F1"]
+    assert sheet["hidden_rows"] == [(3, 3)] or sheet["hidden_rows"] == [[3, 3]]
+    assert sheet["frozen_panes"]["top_left_cell"] == "A2"
+    assert [row[0] for row in sheet["preview"]] == ["Architect"]
+
+
+@pytest.mark.parametrize("rows, merges, expected", [
+    (MERGED_HEADER, ["A1:B1", "C1:D1", "E1:F1"], 1),
+    (GROUPED_HEADER, ["A1:B1", "C1:D1"], 2),
+])
+def test_layout_stage_header_row(tmp_path, rows, merges, expected):
+    path = _merged_workbook(tmp_path, rows, merges)
+
+    assert ExcelAnalyzer(path)._analyze_layout()["sheets"]["Data"]["header_row"] == expected
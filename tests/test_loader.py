@@ -0,0 +1,103 @@
+"""SQLite tests for the chunked bulk loader"""
+
+import sqlite3
+import sys
+
+import pytest
+
+import excel_analyzer
+from excel_analyzer import BulkLoader
+
+ROWS = [["Role", "Cost"]] + [[f"role {i}", i] for i in range(1, 26)]
+
+
+@pytest.fixture
+def workbook(make_workbook):
+    return str(make_workbook("load.xlsx", {"Data": ROWS, "Extra": [["Key", "Value"], ["a", 1], ["b", 2]]}))
+
+
+@pytest.fixture
+def database(tmp_path):
+    return tmp_path / "load.db"
+
+
+def _row_count(database):
+    with sqlite3.connect(database) as conn:
+        return conn.execute("SELECT COUNT(*) FROM excel_rows").fetchone()[0]
+
+
+def _load(database, workbook, **kwargs):
+    loader = BulkLoader(f"sqlite:///{database}", chunk_size=10, workers=1)
+    try:
+        return loader.load(workbook, **kwargs)
+    finally:
+        loader.close()
+
+
+def test_loading_twice_does_not_duplicate_rows(database, workbook):
+    first = _load(database, workbook)
+    forced = _load(database, workbook, force=True)
+
+    assert first["rows_loaded"] == 27
+    assert forced["rows_loaded"] == 27
+    assert _row_count(database) == 27
+
+
+def test_unchanged_file_is_skipped(database, workbook):
+    _load(database, workbook)
+    second = _load(database, workbook)
+
+    assert second["status"] == "skipped"
+    assert second["rows_loaded"] == 0
+    assert _row_count(database) == 27
+
+
+def test_load_resumes_after_chunk_failure(database, workbook, monkeypatch):
+    real_write = BulkLoader._write_chunk
+    calls = []
+
+    def failing_write(self, file_sha, sheet_name, rows):
+        calls.append(rows[0][0])
+        if len(calls) == 2:
+            raise sqlite3.OperationalError("injected failure")
+        return real_write(self, file_sha, sheet_name, rows)
+
+    monkeypatch.setattr(BulkLoader, "_write_chunk", failing_write)
+    with pytest.raises(sqlite3.OperationalError):
+        _load(database, workbook)
+    monkeypatch.setattr(BulkLoader, "_write_chunk", real_write)
+
+    resumed = _load(database, workbook)
+
+    # Chunks committed before the failure surfaced are not written again
+    assert resumed["status"] == "completed"
+    assert resumed["chunks_skipped"] >= 1
+    assert resumed["rows_skipped"] + resumed["rows_loaded"] == 27
+    assert resumed["rows_loaded"] < 27
+    assert _row_count(database) == 27
+    with sqlite3.connect(database) as conn:
+        assert conn.execute("SELECT status, row_count FROM excel_load_files").fetchone() == ("completed", 27)
+
+
+def test_cli_reports_malformed_database_url(workbook, monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["excel_analyzer.py", "load", workbook, "--database", "mysql://localhost/db"])
+
+    excel_analyzer.main()
+
+    out = capsys.readouterr().out
+    assert "❌ Error: Database URL must start with" in out
+
+
+def test_loading_selected_sheets_does_not_skip_the_rest(database, workbook):
+    partial = _load(database, workbook, sheets=["Extra"])
+    full = _load(database, workbook)
+    again = _load(database, workbook, sheets=["Data"])
+
+    assert partial["rows_loaded"] == 2
+    assert full["status"] == "completed"
+    assert full["rows_loaded"] == 25 and full["rows_skipped"] == 2
+    assert again["status"] == "skipped"
+    with sqlite3.connect(database) as conn:
+        sheets = dict(conn.execute("SELECT sheet_name, COUNT(*) FROM excel_rows GROUP BY sheet_name").fetchall())
+        assert conn.execute("SELECT status, row_count FROM excel_load_files").fetchone() == ("completed", 27)
+    assert sheets == {"Data": 25, "Extra": 2}
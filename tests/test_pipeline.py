@@ -0,0 +1,102 @@
+"""Tests for the asyncio analysis pipeline"""
+
+import asyncio
+import threading
+import time
+
+import openpyxl
+
+import excel_analyzer
+from excel_analyzer import ExcelAnalyzer
+
+
+def _without_timestamps(results):
+    results = dict(results)
+    results["file_info"] = {k: v for k, v in results["file_info"].items() if k != "analysis_timestamp"}
+    return results
+
+
+def test_async_pipeline_matches_sequential_analysis(make_workbook):
+    path = make_workbook("pipeline.xlsx", {
+        "Data": [["Name", "Cost"], ["a", 1], ["b", 2], ["c", "=B2+B3"]],
+        "Other": [["Key", "Value"], ["x", 10]],
+    })
+
+    sequential = ExcelAnalyzer(str(path)).analyze()
+    concurrent = asyncio.run(ExcelAnalyzer(str(path)).analyze_async())
+
+    assert list(concurrent) == list(sequential)
+    assert _without_timestamps(concurrent) == _without_timestamps(sequential)
+
+
+def test_async_pipeline_parses_formula_workbook_once(make_workbook, monkeypatch):
+    path = make_workbook("once.xlsx", {"Data": [["Name", "Cost"], ["a", 1]]})
+    loads = []
+    real_load = openpyxl.load_workbook
+
+    def counting_load(*args, **kwargs):
+        if not kwargs.get("read_only") and not kwargs.get("data_only"):
+            loads.append(kwargs)
+        return real_load(*args, **kwargs)
+
+    monkeypatch.setattr(excel_analyzer.openpyxl, "load_workbook", counting_load)
+    ExcelAnalyzer(str(path)).analyze()
+    sequential_loads = len(loads)
+
+    loads.clear()
+    asyncio.run(ExcelAnalyzer(str(path)).analyze_async())
+
+    assert sequential_loads == 4  # metadata, structure, content formulas, formatting
+    assert len(loads) == 1
+
+
+def test_stream_analysis_yields_every_stage(make_workbook):
+    path = make_workbook("stream.xlsx", {"Data": [["Name"], ["a"]]})
+
+    async def collect():
+        return [key async for key, _ in ExcelAnalyzer(str(path)).stream_analysis()]
+
+    keys = asyncio.run(collect())
+
+    assert keys[0] == "file_info"
+    assert set(keys) == {"file_info", "vba_analysis", "metadata", "structure", "layout", "content", "formatting"}
+
+
+def test_stopping_early_waits_for_running_stages_before_closing(make_workbook, monkeypatch):
+    path = make_workbook("early.xlsx", {"Data": [["Name", "Cost"], ["a", 1]]})
+    analyzer = ExcelAnalyzer(str(path))
+    events = []
+    started = threading.Event()
+    real_close = openpyxl.Workbook.close
+
+    def slow_structure(self):
+        with self._formula_workbook() as wb:
+            started.set()
+            time.sleep(0.3)
+            events.append(("structure read", wb.sheetnames))
+        return {}
+
+    def recording_close(wb):
+        if not wb.read_only:
+            events.append("closed")
+        real_close(wb)
+
+    monkeypatch.setattr(ExcelAnalyzer, "_analyze_structure", slow_structure)
+    monkeypatch.setattr(openpyxl.Workbook, "close", recording_close)
+
+    async def first_stage():
+        stream = analyzer.stream_analysis(include_vba=False)
+        async for key, _ in stream:
+            if key != "file_info":
+                # Stop while the structure stage is still reading the shared workbook
+                while not started.is_set():
+                    await asyncio.sleep(0.01)
+                break
+        await stream.aclose()
+        return key
+
+    first = asyncio.run(first_stage())
+
+    assert first != "structure"
+    assert events == [("structure read", ["Data"]), "closed"]
+    assert analyzer._shared_workbook is None
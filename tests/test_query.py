@@ -0,0 +1,101 @@
+"""Tests for the columnar query store and the query command"""
+
+import json
+import sys
+
+import pytest
+
+import excel_analyzer
+from excel_analyzer import ColumnarSheet, QueryStore
+
+ROWS = [
+    ["Project Role", "FTE", "Notes"],
+    ["Team Architect", 1, "lead"],
+    ["Developer", 2, None],
+    ["Developer", 0.5, "part time"],
+    ["Tester", "tbc", None],
+]
+
+
+@pytest.fixture
+def store(make_workbook, tmp_path):
+    path = make_workbook("query.xlsx", {"Team": ROWS})
+    return QueryStore.build(str(path), str(tmp_path / "store"))
+
+
+def test_filters_and_aggregates(store):
+    developers = store.query("Team", [("Project Role", "=", "Developer")], columns=["FTE"])
+    total = store.query("Team", [("FTE", ">=", "1")], aggregate=("sum", "FTE"))
+
+    assert developers["rows"] == [{"_row": 3, "FTE": 2}, {"_row": 4, "FTE": 0.5}]
+    assert total == {"sheet": "Team", "matched": 2, "sum(FTE)": 3.0}
+    assert store.query("Team", aggregate=("count", "Notes"))["count(Notes)"] == 2
+
+
+def test_unknown_columns_raise_value_error(store):
+    with pytest.raises(ValueError, match="Unknown column 'Cost'"):
+        store.query("Team", aggregate=("sum", "Cost"))
+    with pytest.raises(ValueError, match="Unknown columns 'Nope', 'Other'"):
+        store.query("Team", columns=["FTE", "Nope", "Other"])
+    with pytest.raises(ValueError, match="Unknown column 'Nope'"):
+        store.query("Team", [("Nope", "=", "x")])
+    with pytest.raises(ValueError, match="not a number"):
+        store.query("Team", [("FTE", ">", "abc")])
+
+
+@pytest.mark.parametrize("expression", ["sum", "sum:", ":FTE", "median:FTE"])
+def test_parse_aggregate_is_strict(expression):
+    with pytest.raises(ValueError):
+        ColumnarSheet.parse_aggregate(expression)
+
+
+def test_parse_aggregate_accepts_func_and_column():
+    assert ColumnarSheet.parse_aggregate("SUM: Cost Total") == ("sum", "Cost Total")
+
+
+@pytest.mark.parametrize("extra", [["--agg", "sum"], ["--agg", "sum:Cost"], ["--columns", "Nope"]])
+def test_cli_reports_bad_query_arguments(make_workbook, tmp_path, monkeypatch, capsys, extra):
+    path = make_workbook("query.xlsx", {"Team": ROWS})
+    monkeypatch.setattr(sys, "argv", ["excel_analyzer.py", "query", str(path), "--sheet", "Team",
+                                      "--output-dir", str(tmp_path)] + extra)
+
+    excel_analyzer.main()
+
+    assert "❌ Error:" in capsys.readouterr().out
+
+
+def test_cli_prints_aggregate(make_workbook, tmp_path, monkeypatch, capsys):
+    path = make_workbook("query.xlsx", {"Team": ROWS})
+    monkeypatch.setattr(sys, "argv", ["excel_analyzer.py", "query", str(path), "--sheet", "Team",
+                                      "--agg", "max:FTE", "--output-dir", str(tmp_path)])
+
+    excel_analyzer.main()
+
+    out = capsys.readouterr().out
+    assert json.loads(out[:out.rindex("}") + 1])["max(FTE)"] == 2.0
+
+
+def test_reopened_store_builds_missing_indexes(make_workbook, tmp_path):
+    path = make_workbook("query.xlsx", {"Team": ROWS})
+    store_dir = str(tmp_path / "store")
+    QueryStore.build(str(path), store_dir, index_columns=["FTE"])
+
+    store = QueryStore.open_or_build(str(path), store_dir, index_columns=["Project Role", "Nope"])
+    reopened = QueryStore(store_dir)
+
+    entry = reopened.manifest["sheets"]["Team"]
+    assert entry["indexed"] == ["Project Role", "FTE"]
+    assert "Project Role" in entry["hash_indexes"]
+    assert "Project Role" in reopened.sheet("Team").hash_indexes
+    assert store.query("Team", [("Project Role", "=", "Developer")])["matched"] == 2
+    assert reopened.ensure_indexes(["FTE", "Project Role"]) == []
+
+
+def test_reopened_store_without_index_request_is_left_as_is(make_workbook, tmp_path):
+    path = make_workbook("query.xlsx", {"Team": ROWS})
+    store_dir = str(tmp_path / "store")
+    QueryStore.build(str(path), store_dir, index_columns=["FTE"])
+
+    store = QueryStore.open_or_build(str(path), store_dir)
+
+    assert store.manifest["sheets"]["Team"]["indexed"] == ["FTE"]
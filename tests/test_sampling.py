@@ -0,0 +1,46 @@
+"""Tests for sampling budgets and the adaptive sampler"""
+
+import argparse
+
+import openpyxl
+import pytest
+
+from excel_analyzer import AdaptiveSampler, SamplingBudget
+
+
+@pytest.mark.parametrize("text, cells, seconds", [
+    ("50000", 50000, None),
+    ("200k", 200000, None),
+    ("2s", None, 2.0),
+    ("500ms", None, 0.5),
+])
+def test_parse_budget(text, cells, seconds):
+    budget = SamplingBudget.parse(text)
+
+    assert (budget.cells, budget.seconds) == (cells, seconds)
+
+
+@pytest.mark.parametrize("text", ["0", "-5", "0k", "0s", "-1ms", "0.0001k"])
+def test_parse_rejects_non_positive_budgets(text):
+    with pytest.raises(argparse.ArgumentTypeError, match="must be positive"):
+        SamplingBudget.parse(text)
+
+
+def test_constructor_rejects_non_positive_budgets():
+    with pytest.raises(ValueError):
+        SamplingBudget(cells=0)
+    with pytest.raises(ValueError):
+        SamplingBudget(seconds=-1)
+
+
+def test_small_sheet_is_scanned_exactly(make_workbook):
+    path = make_workbook("small.xlsx", {"Data": [["n"]] + [[i] for i in range(100)]})
+    ws = openpyxl.load_workbook(path)["Data"]
+
+    def tally(rows):
+        return {"cells": sum(1 for row in rows for cell in row if cell.value is not None)}
+
+    sample = AdaptiveSampler(SamplingBudget(cells=1000)).scan(ws, tally)
+
+    assert sample.exact
+    assert sample.estimate("cells")["estimate"] == 101
@@ -0,0 +1,80 @@
+"""Tests for the SET Test Loader extractor and the extract-set command"""
+
+import json
+import sys
+
+import pytest
+
+import excel_analyzer
+from excel_analyzer import SETLoaderExtractor
+
+LABELS = [None] * 10 + ["TAM Group Type", None, "Row Type"]
+SET_ROWS = [
+    ["BoSS Proposal"],
+    LABELS,
+    ["Phase 1", None, 12.5, 2],
+    ["Ref #", "Component", "Details", "Customer Ref", "Phase 1", "S2", "S3", "Template"] + [None] * 5,
+    [1, "Billing", "Invoice runs", "C-1", 5, 6, 7, 8, None, None, "BSS", None, "Item"],
+    [2, "CRM", None, "C-2", 7.5, None, None, None, None, None, "BSS", None, "Item"],
+    [None, None, "spacer"],
+    ["END OF DETAIL SHEET"],
+    [3, "After end", None],
+]
+
+
+@pytest.fixture
+def set_workbook(make_workbook):
+    return str(make_workbook("set.xlsx", {"Cover": [["Notes"], ["nothing here"]], "Detail CUT": SET_ROWS}))
+
+
+def test_extract_reads_first_set_sheet(set_workbook):
+    data = SETLoaderExtractor(set_workbook).extract()
+
+    assert data["project_info"]["sheet"] == "Detail CUT"
+    assert [c["component"] for c in data["components"]] == ["Billing", "CRM"]
+    assert data["domains"] == {"BSS": {"count": 2, "effort": 12.5}}
+    assert data["components"][0]["row_type"] == "Item"
+
+
+def test_unknown_and_non_set_sheets_raise(set_workbook, make_workbook):
+    extractor = SETLoaderExtractor(set_workbook)
+
+    with pytest.raises(ValueError, match="not found"):
+        extractor.extract("Nope")
+    with pytest.raises(ValueError, match="not a SET Test Loader sheet"):
+        extractor.extract("Cover")
+    plain = make_workbook("plain.xlsx", {"Sheet": [["A", "B"], [1, 2]]})
+    with pytest.raises(ValueError, match="No SET Test Loader sheet"):
+        SETLoaderExtractor(str(plain)).extract()
+
+
+@pytest.mark.parametrize("sheet", ["Nope", "Cover"])
+def test_cli_rejects_bad_sheet_without_writing_output(set_workbook, tmp_path, monkeypatch, capsys, sheet):
+    output = tmp_path / "out.json"
+    monkeypatch.setattr(sys, "argv", ["excel_analyzer.py", "extract-set", set_workbook,
+                                      "--sheet", sheet, "--output", str(output)])
+
+    excel_analyzer.main()
+
+    assert "❌ Error:" in capsys.readouterr().out
+    assert not output.exists()
+
+
+def test_cli_extracts_named_sheet(set_workbook, tmp_path, monkeypatch):
+    output = tmp_path / "out.jsonl"
+    monkeypatch.setattr(sys, "argv", ["excel_analyzer.py", "extract-set", set_workbook,
+                                      "--sheet", "Detail CUT", "--jsonl", "--output", str(output)])
+
+    excel_analyzer.main()
+
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert [r["ref_num"] for r in records] == [1, 2]
+
+
+def test_repo_set_loader_extracts_components(repo_file):
+    extractor = SETLoaderExtractor(str(repo_file("SET Test Loader CUT.xlsx")))
+
+    data = extractor.extract()
+
+    assert data["project_info"]["sheet"] in extractor.find_sheets()
+    assert data["components"]
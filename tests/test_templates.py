@@ -0,0 +1,78 @@
+"""Tests for the template registry and its analysis fast path"""
+
+import json
+import sys
+
+import cet_analyzer
+import excel_analyzer
+from excel_analyzer import ExcelAnalyzer, TemplateRegistry
+
+ESTIMATE_SHEETS = {
+    "Estimate": [["Title row"], ["Role", "Cost", "Phase"], ["Architect", 100, "Build"], ["Tester", 50, "Test"]],
+    "Notes": [["Key", "Value"], ["owner", "ops"]],
+}
+
+
+def test_exact_match_takes_region_fast_path(make_workbook, tmp_path):
+    example = make_workbook("example.xlsx", ESTIMATE_SHEETS)
+    other = make_workbook("other.xlsx", ESTIMATE_SHEETS)
+    registry = TemplateRegistry(str(tmp_path / "templates.json"))
+    registry.register("estimate", str(example), purpose="Cost Estimation Template")
+
+    matched = TemplateRegistry(str(tmp_path / "templates.json")).match(str(other))
+    results = ExcelAnalyzer(str(other)).analyze_template(matched)
+
+    assert matched["match"] == "exact"
+    assert results["template"]["fast_path"] is True
+    assert results["template"]["purpose"] == "Cost Estimation Template"
+    assert "metadata" not in results and "formatting" not in results
+    estimate = results["content"]["sheets"]["Estimate"]
+    assert estimate["header_row"] == 2
+    assert estimate["rows"] == 2
+    assert estimate["column_names"] == ["Role", "Cost", "Phase"]
+    assert results["content"]["total_rows"] == 3
+
+
+def test_cli_runs_match_before_stages(make_workbook, tmp_path, monkeypatch):
+    example = make_workbook("example.xlsx", ESTIMATE_SHEETS)
+    registry_path = tmp_path / "templates.json"
+    TemplateRegistry(str(registry_path)).register("estimate", str(example), purpose="Cost Estimation Template")
+
+    def fail_full_analysis(self, *args, **kwargs):
+        raise AssertionError("exact template matches should not run the full analysis")
+
+    monkeypatch.setattr(ExcelAnalyzer, "analyze", fail_full_analysis)
+    monkeypatch.setattr(sys, "argv", ["excel_analyzer.py", "analyze", str(example), "--registry", str(registry_path),
+                                      "--output-format", "json", "--output-dir", str(tmp_path)])
+    excel_analyzer.main()
+
+    results = json.loads((tmp_path / "example_analysis.json").read_text(encoding="utf-8"))
+    assert results["template"]["name"] == "estimate"
+    assert results["template"]["fast_path"] is True
+
+
+def test_drifted_headers_run_full_analysis(make_workbook, tmp_path):
+    example = make_workbook("example.xlsx", ESTIMATE_SHEETS)
+    drifted = make_workbook("drifted.xlsx", {
+        **ESTIMATE_SHEETS,
+        "Estimate": [["Title row"], ["Role", "Cost", "Phase", "Owner"], ["Architect", 100, "Build", "me"]],
+    })
+    registry = TemplateRegistry(str(tmp_path / "templates.json"))
+    registry.register("estimate", str(example))
+
+    matched = registry.match(str(drifted))
+
+    assert matched is not None
+    assert matched["match"] == "sheet_names"
+
+
+def test_cet_summary_uses_template_purpose(make_workbook, tmp_path):
+    example = make_workbook("example.xlsx", ESTIMATE_SHEETS)
+    registry = TemplateRegistry(str(tmp_path / "templates.json"))
+    registry.register("estimate", str(example), purpose="Delivery Estimate Workbook")
+
+    analysis = cet_analyzer.analyze_cet_file(str(example), registry=registry)
+
+    assert analysis["template"]["name"] == "estimate"
+    assert analysis["summary"]["estimated_purpose"] == "Delivery Estimate Workbook"
+    assert cet_analyzer.generate_summary(analysis["sheets"])["estimated_purpose"] == "Cost Estimation Template"
@@ -0,0 +1,90 @@
+"""Tests for the defined-name and data-validation catalog"""
+
+import zipfile
+
+import openpyxl
+import pytest
+from openpyxl.workbook.defined_name import DefinedName
+from openpyxl.worksheet.datavalidation import DataValidation
+
+import cet_analyzer
+from excel_analyzer import ValidationCatalog
+
+X14_VALIDATION = (
+    '<extLst><ext uri="{CCE6A557-97BC-4b89-ADB6-D9C93CAAB3DF}" '
+    'xmlns:x14="http://schemas.microsoft.com/office/spreadsheetml/2009/9/main">'
+    '<x14:dataValidations count="1" xmlns:xm="http://schemas.microsoft.com/office/excel/2006/main">'
+    '<x14:dataValidation type="list" allowBlank="1"><x14:formula1><xm:f>LookupValues!$A:$A</xm:f></x14:formula1>'
+    '<xm:sqref>B2:B10</xm:sqref></x14:dataValidation></x14:dataValidations></ext></extLst>'
+)
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Estimate"
+    ws.append(["Role", "Region", "Status", "Level"])
+    ws.append(["Architect", "EMEA", "Open", "L1"])
+    lookups = wb.create_sheet("LookupValues")
+    for value in ["EMEA", "APAC", "AMER"]:
+        lookups.append([value])
+    lookups["C5"], lookups["D5"], lookups["E5"] = "L1", "L2", "L3"
+    wb.defined_names["Levels"] = DefinedName("Levels", attr_text="LookupValues!$5:$5")
+
+    status = DataValidation(type="list", formula1='"Open,Closed"', allow_blank=True)
+    status.add("C2:C10")
+    level = DataValidation(type="list", formula1="Levels")
+    level.add("D2:D10")
+    ws.add_data_validation(status)
+    ws.add_data_validation(level)
+    path = tmp_path / "catalog.xlsx"
+    wb.save(path)
+
+    # openpyxl cannot write the x14 form Excel uses for cross-sheet lists, so add it to the sheet XML
+    patched = tmp_path / "catalog_x14.xlsx"
+    with zipfile.ZipFile(path) as src, zipfile.ZipFile(patched, "w", zipfile.ZIP_DEFLATED) as dst:
+        for info in src.infolist():
+            data = src.read(info)
+            if info.filename == "xl/worksheets/sheet1.xml":
+                data = data.replace(b"</worksheet>", X14_VALIDATION.encode() + b"</worksheet>")
+            dst.writestr(info, data)
+    return str(patched)
+
+
+@pytest.mark.parametrize("text, sheet, cell_range, external", [
+    ("$A$1:$B$2", None, "A1:B2", False),
+    ("LookupValues!$A:$A", "LookupValues", "A:A", False),
+    ("'My ''Sheet'''!$2:$2", "My 'Sheet'", "2:2", False),
+    ("=[1]Parameters!$A$19:$A$27", "Parameters", "A19:A27", True),
+])
+def test_parse_reference(text, sheet, cell_range, external):
+    assert ValidationCatalog.parse_reference(text) == {"sheet": sheet, "range": cell_range, "external": external}
+
+
+@pytest.mark.parametrize("text", ["SUM(A1:A3)", "OFFSET(A1,0,0,5)", "A1:", "Levels"])
+def test_parse_reference_rejects_non_ranges(text):
+    assert ValidationCatalog.parse_reference(text) is None
+
+
+def test_catalog_resolves_literal_named_and_x14_sources(workbook):
+    catalog = ValidationCatalog(workbook).build()
+
+    assert catalog["summary"]["validations"] == 3
+    assert catalog["summary"]["unresolved_lists"] == 0
+    assert ValidationCatalog.dropdown_for(catalog, "Estimate", "C5") == ["Open", "Closed"]
+    # Whole-row and whole-column sources stop at the used range of their sheet
+    assert ValidationCatalog.dropdown_for(catalog, "Estimate", "D3") == ["L1", "L2", "L3"]
+    assert ValidationCatalog.dropdown_for(catalog, "Estimate", "B2") == ["EMEA", "APAC", "AMER"]
+    assert ValidationCatalog.dropdown_for(catalog, "Estimate", "A2") is None
+
+
+def test_cet_structure_reports_catalog_validations(workbook):
+    analysis = cet_analyzer.analyze_cet_file(workbook)
+    rules = analysis["sheets"]["Estimate"]["structure"]["validation_rules"]
+
+    by_cells = {rule["cells"]: rule for rule in rules}
+    assert set(by_cells) == {"C2:C10", "D2:D10", "B2:B10"}
+    assert by_cells["B2:B10"]["formula1"] == "LookupValues!$A:$A"
+    assert by_cells["B2:B10"]["values"] == ["EMEA", "APAC", "AMER"]
+    assert by_cells["D2:D10"]["values"] == ["L1", "L2", "L3"]